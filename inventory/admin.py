@@ -1,6 +1,15 @@
 # inventory/admin.py
-from django.contrib import admin
-from .models import Product, Party, Transaction, UserProfile, Stock, DraftTransaction
+import json
+
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from .models import Product, Party, Transaction, UserProfile, Stock, DraftTransaction, Payment, PaymentAllocation
 
 admin.site.site_header = 'Medicine Inventory Management System'
 admin.site.site_title = 'MIMS'
@@ -12,26 +21,170 @@ admin.site.index_title = 'Admin Panel'
 # admin.site.register(UserProfile)
 # admin.site.register(Stock)
 
+class EstimatedCountPaginator(Paginator):
+    """
+    Changelist paginator for large tables. On PostgreSQL the planner's row
+    estimate is used instead of COUNT(*) once it exceeds
+    ADMIN_EXACT_COUNT_LIMIT; smaller results and other databases are counted.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if queryset.query.is_empty():
+            return 0
+        estimate = self.estimate(queryset)
+        if estimate is not None and estimate > settings.ADMIN_EXACT_COUNT_LIMIT:
+            return estimate
+        return super().count
+
+    @staticmethod
+    def estimate(queryset):
+        if connections[queryset.db].vendor != 'postgresql':
+            return None
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        # psycopg hands Django the parsed plan, which it dumps without the outer list
+        if isinstance(plan, list):
+            plan = plan[0]
+        return int(plan['Plan']['Plan Rows'])
+
+
+class InputFilter(admin.SimpleListFilter):
+    """
+    Sidebar filter with a text box, for columns with too many values to list
+    (party names, companies). Subclasses set ``lookup``, the queryset lookup
+    the typed value is matched with.
+    """
+    template = 'admin/inventory/input_filter.html'
+    lookup = None
+
+    def lookups(self, request, model_admin):
+        # Never empty, or the filter is not shown
+        return ((None, None),)
+
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        # Every other parameter of the page, search (q) and ordering (o) included
+        all_choice['query_parts'] = [
+            (name, value)
+            for name, values in changelist.filter_params.items() if name != self.parameter_name
+            for value in values
+        ]
+        yield all_choice
+
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if value:
+            return queryset.filter(**{self.lookup: value})
+        return queryset
+
+
+class AutocompleteFilter(InputFilter):
+    """
+    Sidebar filter on a foreign key with the admin's select2 autocomplete,
+    which searches the related model's admin page by page instead of listing
+    every row. Subclasses set ``field_name``; the related admin needs
+    ``search_fields``. Use with AutocompleteFilterAdmin, which loads the
+    widget's scripts.
+    """
+    template = 'admin/inventory/autocomplete_filter.html'
+    field_name = None
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        self.field = model._meta.get_field(self.field_name)
+        self.admin_site = model_admin.admin_site
+
+    def choices(self, changelist):
+        for choice in super().choices(changelist):
+            widget = AutocompleteSelect(self.field, self.admin_site, attrs={'onchange': 'this.form.submit()'})
+            form_field = forms.ModelChoiceField(
+                self.field.remote_field.model._default_manager.all(), widget=widget, required=False
+            )
+            choice['widget'] = form_field.widget.render(self.parameter_name, self.value())
+            yield choice
+
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if not value:
+            return queryset
+        try:
+            return queryset.filter(**{self.field.attname: int(value)})
+        except ValueError:
+            raise IncorrectLookupParameters(f'{self.parameter_name} must be an id')
+
+
+class UserFilter(AutocompleteFilter):
+    title = 'admin'
+    parameter_name = 'user__id__exact'
+    field_name = 'user'
+
+
+class StaffAdminFilter(AutocompleteFilter):
+    title = 'admin'
+    parameter_name = 'admin__id__exact'
+    field_name = 'admin'
+
+
+class PartyNameFilter(InputFilter):
+    title = 'name'
+    parameter_name = 'name'
+    lookup = 'name__istartswith'
+
+
+class CompanyFilter(InputFilter):
+    title = 'company'
+    parameter_name = 'company'
+    lookup = 'company__istartswith'
+
+
+class ProductCompanyFilter(CompanyFilter):
+    lookup = 'product__company__istartswith'
+
+
+class AutocompleteFilterAdmin(admin.ModelAdmin):
+    """Loads the select2 scripts and styles of the AutocompleteFilters in ``list_filter``"""
+
+    @property
+    def media(self):
+        media = super().media
+        if any(isinstance(spec, type) and issubclass(spec, AutocompleteFilter) for spec in self.list_filter):
+            # The widget's media doesn't depend on its field
+            media += AutocompleteSelect(None, self.admin_site).media
+        return media
+
+
+class LargeTableAdmin(AutocompleteFilterAdmin):
+    """Changelist settings for tables with millions of rows"""
+    paginator = EstimatedCountPaginator
+    # Skip the second, unfiltered COUNT(*) behind "x of y selected"
+    show_full_result_count = False
+
+
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(LargeTableAdmin):
     list_display = ('id', 'medicine_name', 'company', 'price', 'unit_price')
     search_fields = ('medicine_name', 'company')
-    list_filter = ('company',)
+    list_filter = (CompanyFilter,)
 
 @admin.register(Party)
-class PartyAdmin(admin.ModelAdmin):
+class PartyAdmin(LargeTableAdmin):
     list_display = ('id', 'name', 'email', 'phone', 'user','associated_user')
     search_fields = ('name', 'email', 'phone', 'user__username')
-    list_filter = ('name', 'user')
+    list_filter = (PartyNameFilter, UserFilter)
+    list_select_related = ('user', 'associated_user')
+    autocomplete_fields = ('user', 'associated_user')
 
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(LargeTableAdmin):
     list_display = ('id', 'party', 'user', 'date_at', 'total_amount', 'payment_in', 'due_amount', 'payment_status', 'type')
     search_fields = ('party__name', 'type', 'user__username')
-    list_filter = ('payment_status', 'type', 'user')
+    list_filter = ('payment_status', 'type', UserFilter)
+    list_select_related = ('party', 'user')
+    autocomplete_fields = ('party', 'user', 'created_by')
 
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(AutocompleteFilterAdmin):
     list_display = ('id', 'user_id', 'user', 'user_type', 'get_admin_username', 'is_premium', 'get_email')
     search_fields = (
         'user__username', 
@@ -42,10 +195,28 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_filter = (
         'is_premium',
         'user_type', 
-        'admin',
+        StaffAdminFilter,
     )
+    autocomplete_fields = ('user', 'admin')
     ordering = ('-is_premium', 'user_type', 'user__username')
     list_editable = ('is_premium',)  # Allow editing premium status directly from list view
+    actions = ['make_premium', 'remove_premium']
+
+    def set_premium(self, request, queryset, is_premium):
+        queryset.set_premium(is_premium)
+        skipped = queryset.exclude(user_type='admin').count()
+        if skipped:
+            self.message_user(
+                request, f"{skipped} staff profile(s) skipped, staff follow their admin's status", messages.WARNING
+            )
+
+    @admin.action(description='Make premium (admins, with their staff)')
+    def make_premium(self, request, queryset):
+        self.set_premium(request, queryset, True)
+
+    @admin.action(description='Remove premium (admins, with their staff)')
+    def remove_premium(self, request, queryset):
+        self.set_premium(request, queryset, False)
     
     def get_email(self, obj):
         return obj.user.email
@@ -66,13 +237,31 @@ class UserProfileAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('user', 'admin')
 
 @admin.register(Stock)
-class StockAdmin(admin.ModelAdmin):
+class StockAdmin(LargeTableAdmin):
     list_display = ('id', 'product', 'quantity', 'user')
     search_fields = ('product__medicine_name', 'user__username')
-    list_filter = ('product__company', 'user')
+    list_filter = (ProductCompanyFilter, UserFilter)
+    list_select_related = ('product', 'user')
+    autocomplete_fields = ('product', 'user')
 
 @admin.register(DraftTransaction)
-class DraftTransactionAdmin(admin.ModelAdmin):
+class DraftTransactionAdmin(LargeTableAdmin):
     list_display = ('id', 'party', 'user', 'total_amount', 'created_at', 'updated_at')
     search_fields = ('party__name', 'user__username')
-    list_filter = ('user',)
\ No newline at end of file
+    list_filter = (UserFilter,)
+    list_select_related = ('party', 'user')
+    autocomplete_fields = ('party', 'user', 'created_by')
+
+class PaymentAllocationInline(admin.TabularInline):
+    model = PaymentAllocation
+    autocomplete_fields = ('transaction',)
+    extra = 0
+
+@admin.register(Payment)
+class PaymentAdmin(LargeTableAdmin):
+    list_display = ('id', 'party', 'user', 'type', 'amount', 'unallocated_amount', 'created_at')
+    search_fields = ('party__name', 'user__username')
+    list_filter = ('type', UserFilter)
+    list_select_related = ('party', 'user')
+    autocomplete_fields = ('party', 'user', 'created_by')
+    inlines = [PaymentAllocationInline]
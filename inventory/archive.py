@@ -0,0 +1,90 @@
+# inventory/archive.py
+from django.db import transaction
+from django.db.models import Count, Max
+
+from .models import (
+    ArchivedTransaction, ArchivedTransactionItem, PartyCarryForward, Transaction, TransactionItem
+)
+from .signals import changes_unlogged
+from .summaries import SUMMARY_PREFIX, financial_summary_aggregates
+
+TRANSACTION_FIELDS = [
+    'id', 'party_id', 'type', 'total_amount', 'payment_in', 'due_amount',
+    'payment_status', 'user_id', 'created_by_id', 'date_at'
+]
+ITEM_FIELDS = ['id', 'transaction_id', 'stock_id', 'quantity', 'price', 'subtotal']
+
+
+def archivable_transactions(tenant_id, cutoff):
+    """Completed transactions of the tenant dated before ``cutoff``"""
+    return Transaction.objects.filter(user_id=tenant_id, date_at__lt=cutoff, payment_status='completed')
+
+
+def move_to_archive(ids):
+    """
+    Move the transactions ``ids`` and their items to the archive tables,
+    keeping their ids. The carry-forward totals are left to the caller.
+    Archiving is not a delete for sync clients, so none is logged.
+    """
+    batch = Transaction.objects.filter(id__in=ids)
+    ArchivedTransaction.objects.bulk_create(
+        ArchivedTransaction(**row) for row in batch.values(*TRANSACTION_FIELDS)
+    )
+    ArchivedTransactionItem.objects.bulk_create(
+        ArchivedTransactionItem(**row)
+        for row in TransactionItem.objects.filter(transaction_id__in=ids).values(*ITEM_FIELDS)
+    )
+    with changes_unlogged():
+        TransactionItem.objects.filter(transaction_id__in=ids).delete()
+        batch.delete()
+
+
+def archive_batch(tenant_id, cutoff, batch_size=1000):
+    """
+    Move up to ``batch_size`` archivable transactions and their items to the
+    archive tables and add them to their parties' carry-forward totals, in
+    one short transaction. Returns the number of transactions moved.
+    """
+    with transaction.atomic():
+        ids = list(
+            archivable_transactions(tenant_id, cutoff).select_for_update()
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+
+        batch = Transaction.objects.filter(id__in=ids)
+        totals = {
+            row['party']: row
+            for row in batch.values('party').annotate(
+                **financial_summary_aggregates(),
+                transaction_count=Count('id'),
+                archived_through=Max('date_at')
+            ).order_by()
+        }
+        carry_forwards = {
+            carry_forward.party_id: carry_forward
+            for carry_forward in PartyCarryForward.objects.select_for_update().filter(party_id__in=totals)
+        }
+        summary_fields = [field[len(SUMMARY_PREFIX):] for field in financial_summary_aggregates()]
+
+        to_create, to_update = [], []
+        for party_id, row in totals.items():
+            carry_forward = carry_forwards.get(party_id)
+            if carry_forward is None:
+                carry_forward = PartyCarryForward(party_id=party_id, archived_through=row['archived_through'])
+                to_create.append(carry_forward)
+            else:
+                carry_forward.archived_through = max(carry_forward.archived_through, row['archived_through'])
+                to_update.append(carry_forward)
+            for field in summary_fields:
+                setattr(carry_forward, field, getattr(carry_forward, field) + (row[SUMMARY_PREFIX + field] or 0))
+            carry_forward.transaction_count += row['transaction_count']
+
+        PartyCarryForward.objects.bulk_create(to_create)
+        PartyCarryForward.objects.bulk_update(
+            to_update, summary_fields + ['transaction_count', 'archived_through']
+        )
+
+        move_to_archive(ids)
+    return len(ids)
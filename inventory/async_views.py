@@ -0,0 +1,172 @@
+# inventory/async_views.py
+import asyncio
+import math
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+from . import events
+from .authentication import TenantJWTAuthentication, has_tenant_claims
+from .models import Party, Product, Stock, UserProfile
+from .permissions import get_tenant_id
+from .renderers import FastJSONRenderer
+from .routers import replica_reads
+from .serializers import PartySerializer, ProductSerializer, StockSerializer, UserProfileSerializer
+from .singleflight import acoalesce
+from .summaries import adashboard_statistics, financial_summary_aggregates
+from .throttling import throttle_wait
+
+User = get_user_model()
+
+# Async, read-only counterparts of the busiest GET endpoints. They hold no
+# thread while waiting on the database, so one ASGI worker can serve many slow
+# clients. Writes stay on the synchronous DRF views.
+
+
+def api_response(data, status=200):
+    # Same JSON as the DRF views
+    return HttpResponse(
+        FastJSONRenderer().render(data),
+        status=status,
+        content_type='application/json'
+    )
+
+
+async def aauthenticate(request):
+    """
+    Async equivalent of ``TenantJWTAuthentication.authenticate`` for GET
+    requests, returns None if no token was sent.
+    """
+    authentication = TenantJWTAuthentication()
+    header = authentication.get_header(request)
+    if header is None:
+        return None
+    raw_token = authentication.get_raw_token(header)
+    if raw_token is None:
+        return None
+
+    validated_token = authentication.get_validated_token(raw_token)
+    if has_tenant_claims(validated_token):
+        return authentication.get_stateless_user(validated_token)
+
+    # Token issued without tenant claims
+    user_id = authentication.get_user_id(validated_token)
+    try:
+        user = await User.objects.select_related(
+            'userprofile', 'userprofile__admin'
+        ).aget(**{api_settings.USER_ID_FIELD: user_id})
+    except User.DoesNotExist:
+        raise AuthenticationFailed("User not found")
+
+    if not user.is_active:
+        raise AuthenticationFailed("User is inactive")
+    return user
+
+
+def async_api_view(view):
+    """Authenticate the request and serve its reads from a replica"""
+    @require_GET
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            user = await aauthenticate(request)
+        except (AuthenticationFailed, InvalidToken, TokenError) as e:
+            return api_response({'error': str(e)}, status=401)
+        if user is None:
+            return api_response(
+                {'error': 'Authentication credentials were not provided.'},
+                status=401
+            )
+
+        try:
+            profile = user.userprofile
+        except UserProfile.DoesNotExist:
+            return api_response({'error': 'User profile not found'}, status=403)
+
+        request.user = user
+        tenant_id = get_tenant_id(user)
+        wait = throttle_wait(tenant_id, 'read', profile.is_premium)
+        if wait:
+            response = api_response({'error': 'Request was throttled.'}, status=429)
+            response['Retry-After'] = str(math.ceil(wait))
+            return response
+        with replica_reads(tenant_id):
+            return await view(request, profile, tenant_id, *args, **kwargs)
+    return wrapper
+
+
+@async_api_view
+async def product_catalogue(request, profile, tenant_id):
+    if profile.user_type == 'admin':
+        queryset = Product.objects.all()
+    else:
+        queryset = Product.objects.filter(stock__user=request.user)
+    products = [product async for product in queryset]
+    return api_response(ProductSerializer(products, many=True).data)
+
+
+@async_api_view
+async def stock_list(request, profile, tenant_id):
+    stocks = [stock async for stock in Stock.objects.filter(user_id=tenant_id)]
+    return api_response(StockSerializer(stocks, many=True).data)
+
+
+@async_api_view
+async def party_detail(request, profile, tenant_id, pk):
+    queryset = Party.objects.select_related('carry_forward').annotate(**financial_summary_aggregates('transaction__'))
+
+    async def fetch():
+        try:
+            return PartySerializer(await queryset.aget(pk=pk, user_id=tenant_id)).data
+        except Party.DoesNotExist:
+            return None
+
+    data = await acoalesce(tenant_id, ('party', pk), fetch)
+    if data is None:
+        return api_response({'error': 'Party not found'}, status=404)
+    return api_response(data)
+
+
+@async_api_view
+async def dashboard(request, profile, tenant_id):
+    # The authenticated profile may come from the token claims, load the real one
+    profile = await UserProfile.objects.select_related('user', 'admin').aget(user=request.user)
+    data = UserProfileSerializer(profile).data
+    data['statistics'] = await adashboard_statistics(profile)
+    return api_response(data)
+
+
+async def event_stream(tenant_id):
+    subscription = events.hub.subscribe(tenant_id)
+    try:
+        yield b'retry: 5000\n\n'
+        while True:
+            try:
+                name, data = await asyncio.wait_for(subscription.queue.get(), settings.STOCK_EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield b': keepalive\n\n'
+                continue
+            yield b'event: ' + name.encode() + b'\ndata: ' + data + b'\n\n'
+    finally:
+        events.hub.unsubscribe(subscription)
+
+
+@async_api_view
+async def stock_events(request, profile, tenant_id):
+    """Server-sent events with the tenant's stock quantities as they change"""
+    # A WSGI server would collect the endless stream into memory instead of sending it
+    if not isinstance(request, ASGIRequest):
+        return api_response({'error': 'Live stock events are only served over ASGI'}, status=501)
+    if tenant_id is None:
+        return api_response({'error': 'Staff user does not have an associated admin.'}, status=400)
+    response = StreamingHttpResponse(event_stream(tenant_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Don't let nginx buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,98 @@
+# inventory/authentication.py
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import UserProfile
+
+TENANT_CLAIMS = ('user_type', 'admin_id', 'is_premium')
+
+
+class TenantRefreshToken(RefreshToken):
+    """
+    Refresh token carrying the user's tenant claims. Access tokens derived from
+    it copy the claims, so requests can be authorized without loading the
+    user and profile.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.set_tenant_claims(user)
+        return token
+
+    def set_tenant_claims(self, user):
+        try:
+            profile = user.userprofile
+        except UserProfile.DoesNotExist:
+            return
+        self['user_type'] = profile.user_type
+        self['admin_id'] = profile.admin_id
+        self['is_premium'] = profile.is_premium
+
+
+def has_tenant_claims(validated_token):
+    return all(claim in validated_token for claim in TENANT_CLAIMS)
+
+
+class TenantJWTAuthentication(JWTAuthentication):
+    """
+    Safe requests are authenticated from the token claims alone: the user and
+    profile are built in memory, no query is made. Other requests, and tokens
+    issued without tenant claims, load the user from the database as usual.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+
+        if request.method in SAFE_METHODS and has_tenant_claims(validated_token):
+            return self.get_stateless_user(validated_token), validated_token
+        return self.get_user(validated_token), validated_token
+
+    def get_user_id(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+        # The claim is a string, keep model equality (obj.user == request.user) working
+        return self.user_model._meta.get_field(api_settings.USER_ID_FIELD).to_python(user_id)
+
+    def get_stateless_user(self, validated_token):
+        user = self.user_model(**{api_settings.USER_ID_FIELD: self.get_user_id(validated_token)})
+        admin_id = validated_token['admin_id']
+        user.userprofile = UserProfile(
+            user=user,
+            user_type=validated_token['user_type'],
+            admin=self.user_model(pk=admin_id) if admin_id else None,
+            is_premium=validated_token['is_premium']
+        )
+        return user
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        try:
+            user = self.user_model.objects.select_related(
+                'userprofile', 'userprofile__admin'
+            ).get(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
+
+        return user
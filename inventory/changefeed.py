@@ -0,0 +1,65 @@
+# inventory/changefeed.py
+"""
+Change feed behind ``/api/sync/``: writes to the synced models append a
+ChangeLog row, from model signals (inventory/signals.py) for single saves and
+deletes, and through ``ChangeLog.objects.record()`` in the bulk and F() update
+paths, which bypass signals.
+
+Cursors are ChangeLog sequences, handed out in commit order after each write
+commits, so a client never moves past a change that becomes visible later.
+"""
+from django.db.models import Q
+
+from .models import ChangeLog, ChangeLogSequence, Party, Product, Stock, Transaction
+
+SYNC_MODELS = {
+    'product': Product,
+    'stock': Stock,
+    'party': Party,
+    'transaction': Transaction,
+}
+
+
+def tenant_of(instance):
+    return None if isinstance(instance, Product) else instance.user_id
+
+
+def sequence_state():
+    return ChangeLogSequence.objects.values_list('last', 'pruned_through').first() or (0, 0)
+
+
+def latest_cursor():
+    return sequence_state()[0]
+
+
+def cursor_expired(since):
+    """Whether changes after ``since`` were already pruned from the log"""
+    return since < sequence_state()[1]
+
+
+def pending_changes(tenant_id, since):
+    return ChangeLog.objects.filter(
+        Q(tenant_id=tenant_id) | Q(tenant__isnull=True), sequence__gt=since
+    ).order_by('sequence')
+
+
+def changes_since(tenant_id, since, limit):
+    """
+    The tenant's changes after ``since``, at most ``limit`` log rows, as
+    ``({model: {'upserts': ids, 'deletes': ids}}, cursor, has_more)``.
+    """
+    rows = list(pending_changes(tenant_id, since).values_list('sequence', 'model', 'object_id', 'operation')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # The last operation on an object within the page wins
+    latest = {}
+    for _, model, object_id, operation in rows:
+        latest[model, object_id] = operation
+
+    changes = {name: {'upserts': [], 'deletes': []} for name in SYNC_MODELS}
+    for (model, object_id), operation in latest.items():
+        changes[model]['upserts' if operation == ChangeLog.UPSERT else 'deletes'].append(object_id)
+
+    cursor = rows[-1][0] if rows else since
+    return changes, cursor, has_more
@@ -0,0 +1,179 @@
+# inventory/events.py
+"""
+Live stock events for ``GET /api/stock/events/``.
+
+Committed stock changes are published to an in-process hub, which hands them
+to the asyncio queue of every open stream of the tenant. With several worker
+processes, ``STOCK_EVENTS_BROKER`` relays events between them; without one a
+stream only sees changes made by its own process.
+"""
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .renderers import FastJSONRenderer
+
+logger = logging.getLogger(__name__)
+
+# Tells a client that fell behind to reload its stock
+RESYNC = ('resync', b'{}')
+
+
+class Subscription:
+    def __init__(self, tenant_id, loop, maxsize):
+        self.tenant_id = tenant_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+
+    def put(self, event):
+        # Runs on the subscriber's loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Drop the backlog rather than let a stalled client grow it
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class StockEventHub:
+    """Per-tenant fan-out of events to the streams of this process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = defaultdict(set)
+
+    def subscribe(self, tenant_id):
+        subscription = Subscription(tenant_id, asyncio.get_running_loop(), settings.STOCK_EVENTS_QUEUE_SIZE)
+        with self.lock:
+            self.subscriptions[tenant_id].add(subscription)
+        if broker is not None:
+            broker.start(self.dispatch)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.tenant_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.subscriptions.pop(subscription.tenant_id, None)
+
+    def has_subscribers(self, tenant_id):
+        return tenant_id in self.subscriptions
+
+    def dispatch(self, tenant_id, event):
+        """Queue ``event`` on every stream of the tenant, from any thread"""
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(tenant_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                # The stream's loop is closed, it unsubscribes on its way out
+                pass
+
+
+class CacheBroker:
+    """
+    Relays events between processes through the default cache: a sequence
+    counter plus one short-lived key per event, polled by a thread in each
+    process. A stand-in for a real message broker that works with any shared
+    cache (Redis, Memcached, the database cache).
+    """
+    SEQUENCE_KEY = 'stock-events:seq'
+    EVENT_KEY = 'stock-events:{}'
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self.thread = None
+        self.lock = threading.Lock()
+        self.waiting_for = None
+
+    def publish(self, tenant_id, event):
+        cache.add(self.SEQUENCE_KEY, 0, None)
+        sequence = cache.incr(self.SEQUENCE_KEY)
+        cache.set(self.EVENT_KEY.format(sequence), (self.origin, tenant_id, event), settings.STOCK_EVENTS_TTL)
+
+    def start(self, dispatch):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.listen, args=(dispatch,), name='stock-events', daemon=True)
+                self.thread.start()
+
+    def listen(self, dispatch):
+        last = cache.get(self.SEQUENCE_KEY) or 0
+        while True:
+            time.sleep(settings.STOCK_EVENTS_POLL_INTERVAL)
+            try:
+                last = self.poll(last, dispatch)
+            except Exception:
+                logger.exception('Polling stock events failed')
+
+    def poll(self, last, dispatch):
+        current = cache.get(self.SEQUENCE_KEY) or 0
+        if current <= last:
+            # The counter was reset (cache flush)
+            return current
+        sequences = range(max(last + 1, current - settings.STOCK_EVENTS_QUEUE_SIZE + 1), current + 1)
+        events = cache.get_many([self.EVENT_KEY.format(sequence) for sequence in sequences])
+        for sequence in sequences:
+            key = self.EVENT_KEY.format(sequence)
+            if key not in events:
+                # Counted but not written yet: wait one poll for it, then give up on it
+                if self.waiting_for != sequence:
+                    self.waiting_for = sequence
+                    return sequence - 1
+                continue
+            origin, tenant_id, event = events[key]
+            if origin != self.origin:
+                dispatch(tenant_id, event)
+        return current
+
+
+hub = StockEventHub()
+broker = import_string(settings.STOCK_EVENTS_BROKER)() if settings.STOCK_EVENTS_BROKER else None
+
+
+def send_stock_changes(tenant_id, stock_ids):
+    from .models import Stock
+
+    rows = {
+        row['id']: row
+        for row in Stock.objects.filter(pk__in=stock_ids).values('id', 'product_id', 'quantity', 'reserved_quantity')
+    }
+    changes = []
+    for stock_id in sorted(stock_ids):
+        row = rows.get(stock_id)
+        if row is None:
+            changes.append({'id': stock_id, 'deleted': True})
+        else:
+            changes.append({
+                'id': stock_id,
+                'product': row['product_id'],
+                'quantity': row['quantity'],
+                'reserved_quantity': row['reserved_quantity'],
+                'available': row['quantity'] - row['reserved_quantity'],
+            })
+
+    event = ('stock', FastJSONRenderer().render(changes))
+    hub.dispatch(tenant_id, event)
+    if broker is not None:
+        broker.publish(tenant_id, event)
+
+
+def publish_stock_changes(tenant_id, stock_ids):
+    """Push the quantities of ``stock_ids`` to the tenant's streams when the current transaction commits"""
+    if tenant_id is None or not stock_ids:
+        return
+    if broker is None and not hub.has_subscribers(tenant_id):
+        return
+    stock_ids = set(stock_ids)
+    transaction.on_commit(lambda: send_stock_changes(tenant_id, stock_ids))
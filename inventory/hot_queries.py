@@ -0,0 +1,191 @@
+# inventory/hot_queries.py
+"""
+Registry of the querysets the API runs on every request, used by the
+``index_advisor`` management command to catch full table scans.
+
+Each entry is a function taking the tenant (an admin ``User``) and returning
+the queryset to explain. Register with ``@hot_query(name)``, passing
+``allow_scan=True`` for queries that read a whole table by design.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import DraftTransaction, Party, PartyBalanceCheckpoint, Payment, Product, ProductSalesRank, Stock, Transaction, UserProfile
+from .archive import archivable_transactions
+from .changefeed import latest_cursor, pending_changes
+from .reports import aging_aggregates, slow_movers
+from .reservations import expired_reservations
+
+HOT_QUERIES = {}
+
+
+def hot_query(name, allow_scan=False):
+    def decorator(func):
+        HOT_QUERIES[name] = (func, allow_scan)
+        return func
+    return decorator
+
+
+def sample_party_id(tenant):
+    return Party.objects.filter(user=tenant).values_list('pk', flat=True).first() or 0
+
+
+@hot_query('product-catalogue', allow_scan=True)
+def product_catalogue(tenant):
+    return Product.objects.all()
+
+
+@hot_query('party-list')
+def party_list(tenant):
+    return Party.objects.filter(user=tenant)
+
+
+@hot_query('party-list-by-name')
+def party_list_by_name(tenant):
+    return Party.objects.filter(user=tenant).order_by('name')
+
+
+@hot_query('party-import-phones')
+def party_import_phones(tenant):
+    return Party.objects.filter(user=tenant, phone__in=['01700000000']).values_list('phone', flat=True)
+
+
+@hot_query('party-import-emails')
+def party_import_emails(tenant):
+    return Party.objects.filter(user=tenant, email__in=['a@example.com']).values_list('email', flat=True)
+
+
+@hot_query('party-financial-summary')
+def party_financial_summary(tenant):
+    return Transaction.objects.filter(party_id=sample_party_id(tenant), type='sale')
+
+
+@hot_query('party-statement')
+def party_statement_page(tenant):
+    return Transaction.objects.filter(party_id=sample_party_id(tenant)).order_by('date_at', 'id')
+
+
+@hot_query('party-statement-payments')
+def party_statement_payments(tenant):
+    return Payment.objects.filter(party_id=sample_party_id(tenant)).order_by('created_at')
+
+
+@hot_query('party-balance-checkpoint')
+def party_balance_checkpoint(tenant):
+    return PartyBalanceCheckpoint.objects.filter(party_id=sample_party_id(tenant), through__lte='2000-01-31').order_by('-through')
+
+
+@hot_query('party-opening-balance')
+def party_opening_balance(tenant):
+    return Transaction.objects.filter(party_id=sample_party_id(tenant), date_at__gt='2000-01-31', date_at__lt='2000-02-15')
+
+
+@hot_query('aging-report')
+def aging_report(tenant):
+    return Transaction.objects.filter(user=tenant, due_amount__gt=0).values('party_id').annotate(
+        **aging_aggregates(timezone.localdate())
+    ).order_by()
+
+
+@hot_query('archive-candidates')
+def archive_candidates(tenant):
+    return archivable_transactions(tenant.pk, timezone.localdate())
+
+
+@hot_query('stock-list')
+def stock_list(tenant):
+    return Stock.objects.filter(user=tenant)
+
+
+@hot_query('transaction-list')
+def transaction_list(tenant):
+    return Transaction.objects.filter(user=tenant)
+
+
+@hot_query('transaction-list-by-date')
+def transaction_list_by_date(tenant):
+    return Transaction.objects.filter(user=tenant).order_by('-date_at')
+
+
+def sample_range():
+    today = timezone.localdate()
+    return today - timedelta(days=30), today
+
+
+@hot_query('transaction-filter-date')
+def transaction_filter_date(tenant):
+    return Transaction.objects.filter(user=tenant, date_at__range=sample_range()).order_by('-date_at')
+
+
+@hot_query('transaction-filter-party')
+def transaction_filter_party(tenant):
+    return Transaction.objects.filter(
+        user=tenant, party_id=sample_party_id(tenant), date_at__range=sample_range()
+    ).order_by('-date_at')
+
+
+@hot_query('transaction-filter-type')
+def transaction_filter_type(tenant):
+    return Transaction.objects.filter(user=tenant, type='sale', date_at__range=sample_range()).order_by('-date_at')
+
+
+@hot_query('transaction-filter-status')
+def transaction_filter_status(tenant):
+    return Transaction.objects.filter(
+        user=tenant, payment_status='pending', date_at__range=sample_range()
+    ).order_by('-date_at')
+
+
+@hot_query('transaction-filter-type-status')
+def transaction_filter_type_status(tenant):
+    return Transaction.objects.filter(
+        user=tenant, type='sale', payment_status='pending', date_at__range=sample_range()
+    ).order_by('-date_at')
+
+
+@hot_query('transaction-filter-created-by')
+def transaction_filter_created_by(tenant):
+    return Transaction.objects.filter(
+        user=tenant, created_by=tenant, date_at__range=sample_range()
+    ).order_by('-date_at')
+
+
+@hot_query('staff-transactions')
+def staff_transactions(tenant):
+    return Transaction.objects.filter(created_by=tenant)
+
+
+@hot_query('staff-dashboard-count')
+def staff_dashboard_count(tenant):
+    return Transaction.objects.filter(user=tenant, created_by=tenant)
+
+
+@hot_query('draft-list')
+def draft_list(tenant):
+    return DraftTransaction.objects.filter(user=tenant).order_by('-created_at')
+
+
+@hot_query('expired-reservations')
+def expired_reservation_batch(tenant):
+    return expired_reservations()
+
+
+@hot_query('sync-changes')
+def sync_changes(tenant):
+    return pending_changes(tenant.pk, max(latest_cursor() - 500, 0))
+
+
+@hot_query('top-sellers')
+def top_sellers(tenant):
+    return ProductSalesRank.objects.filter(user=tenant, window=30, quantity__gt=0).order_by('-quantity')[:10]
+
+
+@hot_query('slow-movers')
+def slow_mover_list(tenant):
+    return slow_movers(tenant.pk, 30).order_by('sold_quantity')[:10]
+
+
+@hot_query('staff-list')
+def staff_list(tenant):
+    return UserProfile.objects.filter(admin=tenant)
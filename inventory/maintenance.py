@@ -0,0 +1,164 @@
+# inventory/maintenance.py
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import metrics
+from .models import ChangeLog, ChangeLogSequence, DraftTransaction, DraftTransactionItem, ProductSalesRank, StockReservation, UserProfile
+from .reservations import expired_reservations, release
+
+logger = logging.getLogger(__name__)
+
+CLEANUP_LOCK_KEY = 'draft-cleanup-lock'
+SALES_RANK_LOCK_KEY = 'sales-rank-lock'
+# Seconds after which the lock of a rebuild that died is given up
+SALES_RANK_LOCK_TIMEOUT = 600
+
+
+def expired_drafts(tenant_id, expiry_days, now=None):
+    cutoff = (now or timezone.now()) - timedelta(days=expiry_days)
+    return DraftTransaction.objects.filter(user_id=tenant_id, updated_at__lt=cutoff)
+
+
+def draft_expiries():
+    """(tenant id, expiry in days) of every admin"""
+    default = settings.DRAFT_EXPIRY_DAYS
+    for tenant_id, days in UserProfile.objects.filter(user_type='admin').values_list('user_id', 'draft_expiry_days'):
+        yield tenant_id, days or default
+
+
+def purge_expired_drafts(batch_size=None, now=None):
+    """
+    Delete expired drafts and their items, at most ``batch_size`` drafts per
+    transaction so no write lock is held for long.
+    Returns the numbers of drafts and items deleted.
+    """
+    batch_size = batch_size or settings.DRAFT_CLEANUP_BATCH_SIZE
+    now = now or timezone.now()
+    drafts = items = 0
+
+    for tenant_id, expiry_days in draft_expiries():
+        queryset = expired_drafts(tenant_id, expiry_days, now)
+        while True:
+            with transaction.atomic():
+                ids = list(queryset.values_list('id', flat=True)[:batch_size])
+                if not ids:
+                    break
+                release(StockReservation.objects.filter(draft_id__in=ids))
+                items += DraftTransactionItem.objects.filter(draft_transaction_id__in=ids).delete()[0]
+                drafts += DraftTransaction.objects.filter(id__in=ids).delete()[0]
+
+    metrics.increment('drafts_purged', drafts)
+    metrics.increment('draft_items_purged', items)
+    metrics.increment('draft_cleanup_runs')
+    metrics.set_value('draft_cleanup_last_run', now.isoformat())
+    return drafts, items
+
+
+def release_expired_reservations(batch_size=None, now=None):
+    """Release expired stock reservations, ``batch_size`` per transaction. Returns how many were released."""
+    batch_size = batch_size or settings.DRAFT_CLEANUP_BATCH_SIZE
+    now = now or timezone.now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            ids = list(expired_reservations(now).values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            released += release(StockReservation.objects.filter(id__in=ids))
+
+    metrics.increment('reservations_released', released)
+    return released
+
+
+def prune_changelog(batch_size=None, now=None):
+    """
+    Delete sync feed entries older than SYNC_RETENTION_DAYS, ``batch_size``
+    per statement. Also sequences entries whose write committed but whose
+    process died before sequencing them.
+    """
+    batch_size = batch_size or settings.DRAFT_CLEANUP_BATCH_SIZE
+    cutoff = (now or timezone.now()) - timedelta(days=settings.SYNC_RETENTION_DAYS)
+    ChangeLog.objects.sequence_committed()
+
+    pruned = 0
+    through = ChangeLog.objects.filter(created_at__lt=cutoff).aggregate(through=Max('sequence'))['through']
+    if through is not None:
+        # Expire the cursors first, so none is served a feed with a hole in it
+        ChangeLogSequence.objects.filter(pruned_through__lt=through).update(pruned_through=through)
+        while True:
+            ids = list(
+                ChangeLog.objects.filter(sequence__lte=through).order_by('sequence').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            pruned += ChangeLog.objects.filter(id__in=ids).delete()[0]
+
+    metrics.increment('changelog_pruned', pruned)
+    return pruned
+
+
+def rebuild_sales_ranks(today=None):
+    """
+    Rebuild the product rankings of every admin not yet rebuilt today.
+    Returns how many were rebuilt, None if another worker is rebuilding.
+    """
+    today = today or timezone.localdate()
+    # Rebuilds delete and recreate the rows, so only one may run at a time
+    if not cache.add(SALES_RANK_LOCK_KEY, True, SALES_RANK_LOCK_TIMEOUT):
+        return None
+    try:
+        tenants = UserProfile.objects.filter(user_type='admin').exclude(sales_ranked_on=today).values_list('user_id', flat=True)
+        rebuilt = 0
+        for tenant_id in tenants:
+            ProductSalesRank.objects.rebuild(tenant_id, today)
+            rebuilt += 1
+    finally:
+        cache.delete(SALES_RANK_LOCK_KEY)
+    return rebuilt
+
+
+class DraftCleaner(threading.Thread):
+    """
+    Releases expired reservations, purges expired drafts, prunes the sync feed
+    and rolls the product rankings over to the new day every ``interval``
+    seconds.
+    """
+
+    def __init__(self, interval):
+        super().__init__(name='draft-cleaner', daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            # With a shared cache only one worker cleans per interval
+            if not cache.add(CLEANUP_LOCK_KEY, True, self.interval):
+                continue
+            try:
+                release_expired_reservations()
+                purge_expired_drafts()
+                prune_changelog()
+                rebuild_sales_ranks()
+            except Exception:
+                logger.exception('Expired draft cleanup failed')
+
+    def stop(self):
+        self.stopped.set()
+
+
+_cleaner = None
+
+
+def start_draft_cleaner():
+    global _cleaner
+    if settings.DRAFT_CLEANUP_INTERVAL and _cleaner is None:
+        _cleaner = DraftCleaner(settings.DRAFT_CLEANUP_INTERVAL)
+        _cleaner.start()
+    return _cleaner
@@ -0,0 +1,47 @@
+# inventory/management/commands/archive_transactions.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from inventory.archive import archivable_transactions, archive_batch
+from inventory.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Move completed transactions older than a cutoff into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Archive transactions dated before this day (YYYY-MM-DD)')
+        parser.add_argument('--days', type=int, default=365, help='Archive transactions older than this many days')
+        parser.add_argument('--tenant', type=int, action='append', dest='tenants', help='Admin user id to archive for')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            cutoff = parse_date(options['before'])
+            if cutoff is None:
+                raise CommandError('--before must be a date (YYYY-MM-DD)')
+        else:
+            cutoff = timezone.localdate() - timedelta(days=options['days'])
+
+        tenants = options['tenants'] or UserProfile.objects.filter(
+            user_type='admin'
+        ).values_list('user_id', flat=True)
+
+        total = 0
+        for tenant_id in tenants:
+            if options['dry_run']:
+                archived = archivable_transactions(tenant_id, cutoff).count()
+            else:
+                archived = 0
+                while moved := archive_batch(tenant_id, cutoff, options['batch_size']):
+                    archived += moved
+            if archived:
+                self.stdout.write(f'{tenant_id}: {archived}')
+            total += archived
+
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {total} transactions dated before {cutoff}'))
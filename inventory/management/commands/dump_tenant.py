@@ -0,0 +1,23 @@
+# inventory/management/commands/dump_tenant.py
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.models import UserProfile
+from inventory.snapshot import dump_tenant
+
+
+class Command(BaseCommand):
+    help = "Write a tenant's products, stock, parties, payments, transactions and drafts to a compressed snapshot file"
+
+    def add_arguments(self, parser):
+        parser.add_argument('tenant', type=int, help='Admin user id')
+        parser.add_argument('path', help='Snapshot file to write, e.g. tenant-1.jsonl.gz')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows read and written at a time')
+
+    def handle(self, *args, **options):
+        if not UserProfile.objects.filter(user_id=options['tenant'], user_type='admin').exists():
+            raise CommandError(f"{options['tenant']} is not an admin user id")
+
+        counts = dump_tenant(options['tenant'], options['path'], options['chunk_size'])
+        for name, count in counts.items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(self.style.SUCCESS(f"Wrote {sum(counts.values())} rows to {options['path']}"))
@@ -0,0 +1,85 @@
+# inventory/management/commands/index_advisor.py
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from inventory.hot_queries import HOT_QUERIES
+from inventory.models import UserProfile
+
+# Plan lines that mean a whole table is read, per database vendor
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (\w+)\b(?! USING)'),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'mysql': re.compile(r'\bALL\b'),
+}
+# Sorting without an index, reported but not counted as a failure
+SORT_PATTERNS = {
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR ORDER BY'),
+    'postgresql': re.compile(r'\bSort\b'),
+}
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot querysets in inventory.hot_queries and flag full table scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='Admin user id to build the queries for')
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--query', action='append', dest='queries', help='Only explain these entries')
+        parser.add_argument(
+            '--fail-on-scan',
+            action='store_true',
+            help='Exit with an error if an unexpected full scan is found'
+        )
+
+    def handle(self, *args, **options):
+        tenant = self.get_tenant(options['tenant'])
+        vendor = connections[options['database']].vendor
+        scan_pattern = FULL_SCAN_PATTERNS.get(vendor)
+        sort_pattern = SORT_PATTERNS.get(vendor)
+        if scan_pattern is None:
+            raise CommandError(f'No plan patterns for the {vendor} backend')
+
+        names = options['queries'] or list(HOT_QUERIES)
+        unknown = set(names) - set(HOT_QUERIES)
+        if unknown:
+            raise CommandError(f"Unknown queries: {', '.join(sorted(unknown))}")
+
+        flagged = []
+        for name in names:
+            build, allow_scan = HOT_QUERIES[name]
+            plan = build(tenant).using(options['database']).explain()
+            scans = scan_pattern.findall(plan)
+
+            if scans and not allow_scan:
+                flagged.append(name)
+                self.stdout.write(self.style.ERROR(f'FULL SCAN  {name}'))
+            elif sort_pattern and sort_pattern.search(plan):
+                self.stdout.write(self.style.WARNING(f'SORT       {name}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'OK         {name}'))
+
+            if options['verbosity'] > 1 or (scans and not allow_scan):
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+
+        if flagged:
+            message = f"{len(flagged)} query(s) read a whole table: {', '.join(flagged)}"
+            if options['fail_on_scan']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+
+    def get_tenant(self, tenant_id):
+        if tenant_id is not None:
+            try:
+                return User.objects.get(pk=tenant_id)
+            except User.DoesNotExist:
+                raise CommandError(f'User {tenant_id} does not exist')
+
+        profile = UserProfile.objects.filter(user_type='admin').select_related('user').first()
+        if profile is None:
+            # The plan doesn't depend on the tenant existing
+            return User(pk=0)
+        return profile.user
@@ -0,0 +1,19 @@
+# inventory/management/commands/purge_expired_drafts.py
+from django.core.management.base import BaseCommand
+
+from inventory.maintenance import prune_changelog, purge_expired_drafts, release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = 'Release expired stock reservations, delete drafts not touched within their expiry and prune the sync feed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Drafts deleted per transaction')
+
+    def handle(self, *args, **options):
+        released = release_expired_reservations(options['batch_size'])
+        self.stdout.write(f'Released {released} expired stock reservations')
+        drafts, items = purge_expired_drafts(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {drafts} expired drafts and {items} draft items'))
+        pruned = prune_changelog(options['batch_size'])
+        self.stdout.write(f'Pruned {pruned} sync feed entries')
@@ -0,0 +1,14 @@
+# inventory/management/commands/rebuild_sales_ranks.py
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.maintenance import rebuild_sales_ranks
+
+
+class Command(BaseCommand):
+    help = 'Roll the product rankings of every admin over to today, for deployments without the draft cleaner'
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_sales_ranks()
+        if rebuilt is None:
+            raise CommandError('Another worker is rebuilding the product rankings')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the product rankings of {rebuilt} admins'))
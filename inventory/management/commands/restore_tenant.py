@@ -0,0 +1,27 @@
+# inventory/management/commands/restore_tenant.py
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.models import UserProfile
+from inventory.snapshot import restore_tenant
+
+
+class Command(BaseCommand):
+    help = 'Load a snapshot written by dump_tenant into a tenant, with new ids'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Snapshot file written by dump_tenant')
+        parser.add_argument('--tenant', type=int, required=True, help='Admin user id to load the data into')
+        parser.add_argument('--replace', action='store_true',
+                            help="Delete the tenant's parties, stock, payments, transactions and drafts first")
+
+    def handle(self, *args, **options):
+        if not UserProfile.objects.filter(user_id=options['tenant'], user_type='admin').exists():
+            raise CommandError(f"{options['tenant']} is not an admin user id")
+
+        try:
+            counts = restore_tenant(options['path'], options['tenant'], options['replace'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        for name, count in counts.items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(self.style.SUCCESS(f"Restored {sum(counts.values())} rows into tenant {options['tenant']}"))
@@ -0,0 +1,38 @@
+# inventory/metrics.py
+"""
+Operational counters kept in the default cache, so web workers and management
+commands report to the same place when the cache is shared (Redis, Memcached,
+database). With the local-memory cache every process only sees its own.
+"""
+from django.core.cache import cache
+
+METRICS_PREFIX = 'metrics:'
+METRIC_NAMES_KEY = 'metrics-names'
+
+
+def _register(name):
+    names = cache.get(METRIC_NAMES_KEY, set())
+    if name not in names:
+        cache.set(METRIC_NAMES_KEY, names | {name}, None)
+
+
+def increment(name, value=1):
+    key = METRICS_PREFIX + name
+    if cache.add(key, value, None):
+        _register(name)
+        return
+    try:
+        cache.incr(key, value)
+    except ValueError:  # Evicted in between
+        cache.set(key, value, None)
+
+
+def set_value(name, value):
+    cache.set(METRICS_PREFIX + name, value, None)
+    _register(name)
+
+
+def snapshot():
+    names = sorted(cache.get(METRIC_NAMES_KEY, set()))
+    values = cache.get_many([METRICS_PREFIX + name for name in names])
+    return {name: values.get(METRICS_PREFIX + name) for name in names}
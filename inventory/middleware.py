@@ -0,0 +1,17 @@
+# inventory/middleware.py
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+
+
+class LargeResponseGZipMiddleware(GZipMiddleware):
+    """
+    Compress only responses of at least ``GZIP_MIN_LENGTH`` bytes. Streaming
+    responses (e.g. event streams) are left alone, gzip would buffer them.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming:
+            return response
+        if len(response.content) < getattr(settings, 'GZIP_MIN_LENGTH', 1024):
+            return response
+        return super().process_response(request, response)
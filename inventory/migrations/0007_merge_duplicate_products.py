@@ -0,0 +1,61 @@
+from django.db import migrations
+from django.db.models import Count, Max, Min
+
+
+def merge_duplicate_products(apps, schema_editor):
+    """
+    Prepare the product natural key: blank out NULL ml values and merge
+    products sharing (medicine_name, ml, company) into the oldest one, with
+    the prices of the latest upload. Stock of the duplicates is moved over,
+    or added to the tenant's existing stock of the kept product.
+    """
+    Product = apps.get_model('inventory', 'Product')
+    Stock = apps.get_model('inventory', 'Stock')
+    TransactionItem = apps.get_model('inventory', 'TransactionItem')
+    DraftTransactionItem = apps.get_model('inventory', 'DraftTransactionItem')
+
+    Product.objects.filter(ml__isnull=True).update(ml='')
+
+    groups = (
+        Product.objects.values('medicine_name', 'ml', 'company')
+        .annotate(keep_id=Min('id'), latest_id=Max('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for group in groups.iterator():
+        kept = Product.objects.get(pk=group['keep_id'])
+        latest = Product.objects.get(pk=group['latest_id'])
+        kept.price = latest.price
+        kept.unit_price = latest.unit_price
+        kept.min_sale = latest.min_sale
+        kept.save(update_fields=['price', 'unit_price', 'min_sale'])
+
+        duplicates = Product.objects.filter(
+            medicine_name=group['medicine_name'],
+            ml=group['ml'],
+            company=group['company'],
+        ).exclude(pk=kept.pk)
+
+        for stock in Stock.objects.filter(product__in=duplicates):
+            kept_stock = Stock.objects.filter(product=kept, user_id=stock.user_id).first()
+            if kept_stock is None:
+                stock.product = kept
+                stock.save(update_fields=['product'])
+                continue
+            kept_stock.quantity += stock.quantity
+            kept_stock.save(update_fields=['quantity'])
+            TransactionItem.objects.filter(stock=stock).update(stock=kept_stock)
+            DraftTransactionItem.objects.filter(stock=stock).update(stock=kept_stock)
+            stock.delete()
+
+        duplicates.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.2 on 2026-10-19 12:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_merge_duplicate_products'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_name_idx',
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='ml',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('medicine_name', 'ml', 'company'), name='product_natural_key'),
+        ),
+    ]
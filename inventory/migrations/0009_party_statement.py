@@ -0,0 +1,32 @@
+# Generated by Django 5.1.2 on 2026-10-19 12:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_product_natural_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['party', 'date_at', 'id'], name='txn_party_date_idx'),
+        ),
+        migrations.CreateModel(
+            name='PartyBalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('through', models.DateField()),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('party', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_checkpoints', to='inventory.party')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('party', 'through'), name='unique_party_balance_checkpoint')],
+            },
+        ),
+    ]
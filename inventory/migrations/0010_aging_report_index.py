@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2026-10-19 12:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_party_statement'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('due_amount__gt', 0)), fields=['user', 'party', 'type', 'date_at', 'due_amount'], name='txn_open_due_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.1.2 on 2026-10-19 13:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_sales_days(apps, schema_editor):
+    """Day buckets for the sales made so far, the rankings are built on first use"""
+    TransactionItem = apps.get_model('inventory', 'TransactionItem')
+    ProductSalesDay = apps.get_model('inventory', 'ProductSalesDay')
+
+    rows = (
+        TransactionItem.objects.filter(transaction__type='sale')
+        .values('transaction__user_id', 'stock__product_id', 'transaction__date_at')
+        .annotate(total_quantity=Sum('quantity'), total_revenue=Sum('subtotal'))
+        .order_by()
+    )
+    days = []
+    for row in rows.iterator():
+        days.append(ProductSalesDay(
+            user_id=row['transaction__user_id'],
+            product_id=row['stock__product_id'],
+            day=row['transaction__date_at'],
+            quantity=row['total_quantity'],
+            revenue=row['total_revenue'],
+        ))
+        if len(days) == 1000:
+            ProductSalesDay.objects.bulk_create(days)
+            days = []
+    ProductSalesDay.objects.bulk_create(days)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0015_change_log'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='sales_ranked_on',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='ProductSalesDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventory.product')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'day', 'product'), name='sales_day_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSalesRank',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.PositiveSmallIntegerField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_ranks', to='inventory.product')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'window', 'quantity'], name='sales_rank_quantity_idx'), models.Index(fields=['user', 'window', 'revenue'], name='sales_rank_revenue_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'window', 'product'), name='sales_rank_unique')],
+            },
+        ),
+        migrations.RunPython(fill_sales_days, migrations.RunPython.noop),
+    ]
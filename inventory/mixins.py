@@ -0,0 +1,127 @@
+# inventory/mixins.py
+from django.conf import settings
+from django.db.models import Case, IntegerField, Value, When
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from .permissions import get_tenant_id
+from .routers import is_pinned, pin_to_primary, reset_replica, use_replica
+from .serializers import values_plan, values_representation
+from .singleflight import coalesce, forget
+
+
+class ReplicaReadMixin:
+    """
+    Serve safe requests from a read replica. Any other request pins the
+    tenant to the primary for ``REPLICA_PIN_SECONDS`` so that the next reads
+    see the write (read-your-writes).
+    """
+    _replica_token = None
+
+    def get_tenant_id(self):
+        user = self.request.user
+        if not user or not user.is_authenticated:
+            return None
+        return get_tenant_id(user)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            self._replica_token = use_replica(self.get_tenant_id())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self._replica_token is not None:
+            reset_replica(self._replica_token)
+            self._replica_token = None
+        elif request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(self.get_tenant_id())
+            forget(self.get_tenant_id())
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class BatchGetMixin:
+    """
+    ``?ids=3,1,2`` narrows a list to those ids, in the order requested, in the
+    same single query as the full list. Unknown ids are left out.
+    """
+
+    def get_requested_ids(self):
+        raw = self.request.query_params.get('ids')
+        if raw is None:
+            return None
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in raw.split(',') if pk.strip()))
+        except ValueError:
+            raise ValidationError({'ids': 'Must be a comma-separated list of ids.'})
+        if len(ids) > settings.BATCH_GET_MAX_IDS:
+            raise ValidationError({'ids': f'At most {settings.BATCH_GET_MAX_IDS} ids per request.'})
+        return ids
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        ids = self.get_requested_ids()
+        if ids is None:
+            return queryset
+        position = Case(
+            *[When(pk=pk, then=Value(index)) for index, pk in enumerate(ids)],
+            output_field=IntegerField()
+        )
+        return queryset.filter(pk__in=ids).order_by(position)
+
+
+class SingleFlightListMixin:
+    """
+    Concurrent identical list requests of a tenant share one response (see
+    ``singleflight``). Only for lists that are the same for every user of
+    the tenant. A tenant pinned to the primary after a write reads its own
+    list, since a shared one may predate the write in another worker.
+    """
+
+    def list(self, request, *args, **kwargs):
+        tenant_id = get_tenant_id(request.user)
+        if tenant_id is None or is_pinned(tenant_id):
+            return super().list(request, *args, **kwargs)
+        data = coalesce(
+            tenant_id, ('list', request.get_full_path()),
+            lambda: super(SingleFlightListMixin, self).list(request, *args, **kwargs).data
+        )
+        return Response(data)
+
+
+class SparseFieldsMixin:
+    """
+    Let the serializer's ``prepare_queryset`` adjust the queryset to the
+    fields requested with ``?fields=`` / ``?expand=``.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        many = lookup_url_kwarg not in self.kwargs
+        return self.get_serializer_class().prepare_queryset(queryset, self.request, many)
+
+
+class ValuesListMixin:
+    """
+    Render list responses from ``values_list()`` rows when every selected
+    field maps to a plain column, skipping model and serializer instances per
+    row. Anything else (nested or computed fields, pagination) falls back to
+    the regular serializer.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.get_serializer(many=True)
+        plan = values_plan(serializer.child)
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(values_representation(queryset, plan))
@@ -1,14 +1,114 @@
-from django.db import models
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Case, F, Max, Min, Q, Sum, Value, When
+from django.utils import timezone
 from django.contrib.auth.models import User  # Import the User model
 
+from . import events
+from .utils import batched
+
+
+class ProductQuerySet(models.QuerySet):
+    # Medicine names looked up per query
+    lookup_batch_size = 500
+
+    def by_natural_key(self, names):
+        """Products with any of the medicine ``names``, keyed by natural key."""
+        existing = {}
+        # Bounded IN lists, databases cap the number of query parameters
+        for batch in batched(sorted(names), self.lookup_batch_size):
+            existing.update((product.natural_key(), product) for product in self.filter(medicine_name__in=batch))
+        return existing
+
+    @staticmethod
+    def diff_catalogue(by_key, existing):
+        """Split keyed rows into new rows, changed products and an unchanged count."""
+        new_rows, changed_products, unchanged = {}, [], 0
+        for key, row in by_key.items():
+            product = existing.get(key)
+            if product is None:
+                new_rows[key] = row
+                continue
+            changed = False
+            for field in Product.SYNC_FIELDS:
+                if field in row and getattr(product, field) != row[field]:
+                    setattr(product, field, row[field])
+                    changed = True
+            if changed:
+                changed_products.append(product)
+            else:
+                unchanged += 1
+        return new_rows, changed_products, unchanged
+
+    def sync_catalogue(self, rows):
+        """
+        Upsert ``rows`` (dicts of Product fields) on the natural key
+        (medicine_name, ml, company). Only new and changed rows are written.
+        Returns the written products and the inserted/updated/unchanged counts.
+        """
+        # Last row wins when a key repeats within the upload
+        by_key = {}
+        for row in rows:
+            row = {**row, 'ml': row.get('ml') or ''}
+            by_key[tuple(row[field] for field in Product.NATURAL_KEY)] = row
+
+        new_rows, to_update, unchanged = self.diff_catalogue(by_key, self.by_natural_key({key[0] for key in by_key}))
+
+        with transaction.atomic():
+            if new_rows:
+                # Keys a concurrent import wrote since the lookup are updates, not inserts
+                written = self.by_natural_key({key[0] for key in new_rows})
+                new_rows, raced, raced_unchanged = self.diff_catalogue(new_rows, written)
+                to_update += raced
+                unchanged += raced_unchanged
+            to_create = [Product(**row) for row in new_rows.values()]
+            if to_create:
+                # Still an upsert, for keys written after the second look
+                self.bulk_create(
+                    to_create,
+                    update_conflicts=True,
+                    unique_fields=Product.NATURAL_KEY,
+                    update_fields=Product.SYNC_FIELDS
+                )
+            if to_update:
+                self.bulk_update(to_update, Product.SYNC_FIELDS)
+            ChangeLog.objects.record(Product, [product.pk for product in to_create + to_update])
+
+        counts = {'inserted': len(to_create), 'updated': len(to_update), 'unchanged': unchanged}
+        return to_create + to_update, counts
+
+
+class InsufficientStock(Exception):
+    def __init__(self, stock_id):
+        self.stock_id = stock_id
+        super().__init__(f'Not enough stock available for stock {stock_id}')
+
+
 class Product(models.Model):
+    # A product is identified by name, strength/volume and manufacturer
+    NATURAL_KEY = ('medicine_name', 'ml', 'company')
+    SYNC_FIELDS = ('price', 'unit_price', 'min_sale')
+
     medicine_name = models.CharField(max_length=255)
-    ml = models.CharField(max_length=50, null=True, blank=True)
+    ml = models.CharField(max_length=50, blank=True, default='')
     price = models.DecimalField(max_digits=10, decimal_places=2)
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
     company = models.CharField(max_length=255)
     min_sale = models.IntegerField()
 
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Also serves lookups by medicine_name
+            models.UniqueConstraint(fields=['medicine_name', 'ml', 'company'], name='product_natural_key'),
+        ]
+
+    def natural_key(self):
+        return tuple(getattr(self, field) for field in self.NATURAL_KEY)
+
     def __str__(self):
         return self.medicine_name
 
@@ -31,6 +131,14 @@ class Party(models.Model):
         related_name='as_party'
     )  # The authenticated user who is also a party, if applicable
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name'], name='party_user_name_idx'),
+            # Duplicate checks of party imports
+            models.Index(fields=['user', 'phone'], name='party_user_phone_idx'),
+            models.Index(fields=['user', 'email'], name='party_user_email_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -60,6 +168,29 @@ class BaseTransaction(models.Model):
 class Transaction(BaseTransaction):
     date_at = models.DateField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Tenant lists and date ranges
+            models.Index(fields=['user', 'date_at'], name='txn_user_date_idx'),
+            # Party summaries
+            models.Index(fields=['party', 'type'], name='txn_party_type_idx'),
+            # Party statements: opening balance range and keyset pages
+            models.Index(fields=['party', 'date_at', 'id'], name='txn_party_date_idx'),
+            # Aging report: covers the open transactions only
+            models.Index(
+                fields=['user', 'party', 'type', 'date_at', 'due_amount'],
+                condition=models.Q(due_amount__gt=0),
+                name='txn_open_due_idx'
+            ),
+            # Staff dashboard counts
+            models.Index(fields=['user', 'created_by'], name='txn_user_created_by_idx'),
+            # Filtered transaction lists: equality filters first, then the date range
+            models.Index(fields=['user', 'type', 'date_at'], name='txn_user_type_date_idx'),
+            models.Index(fields=['user', 'payment_status', 'date_at'], name='txn_user_status_date_idx'),
+            models.Index(fields=['user', 'type', 'payment_status', 'date_at'], name='txn_user_type_status_idx'),
+            models.Index(fields=['created_by', 'date_at'], name='txn_created_by_date_idx'),
+        ]
+
     # def save(self, *args, **kwargs):
     #     self.due_amount = self.total_amount - self.payment_in
     #     if self.due_amount <= 0:
@@ -71,12 +202,38 @@ class Transaction(BaseTransaction):
     #     super().save(*args, **kwargs)
 
     def update_stock(self):
-        for item in self.items.all():
+        """
+        Apply the items to the stock on hand. A sale only takes stock that no
+        draft has reserved and raises InsufficientStock otherwise, so callers
+        must run this inside a transaction and let it roll back.
+        """
+        quantities = {}
+        for stock_id, quantity in self.items.values_list('stock_id', 'quantity'):
+            quantities[stock_id] = quantities.get(stock_id, 0) + quantity
+        # Sorted so concurrent transactions lock stock rows in the same order
+        for stock_id, quantity in sorted(quantities.items()):
+            # Conditional F() updates, so concurrent movements aren't lost, as in reservations.py
             if self.type == 'sale':
-                item.stock.quantity -= item.quantity
-            else:  # purchase
-                item.stock.quantity += item.quantity
-            item.stock.save()
+                taken = Stock.objects.filter(
+                    pk=stock_id, quantity__gte=F('reserved_quantity') + quantity
+                ).update(quantity=F('quantity') - quantity)
+                if not taken:
+                    raise InsufficientStock(stock_id)
+            else:
+                Stock.objects.filter(pk=stock_id).update(quantity=F('quantity') + quantity)
+        ChangeLog.objects.record(Stock, sorted(quantities), self.user_id)
+
+    def record_sales(self, sign=1):
+        """Add the items of a sale to the product sales counters, ``sign=-1`` takes them back out"""
+        if self.type != 'sale':
+            return
+        totals = {
+            product_id: (sign * quantity, sign * revenue)
+            for product_id, quantity, revenue in self.items.values('stock__product_id').annotate(
+                total_quantity=Sum('quantity'), total_revenue=Sum('subtotal')
+            ).order_by().values_list('stock__product_id', 'total_quantity', 'total_revenue')
+        }
+        ProductSalesDay.objects.add(self.user_id, self.date_at, totals)
 
     def __str__(self):
         return f"Transaction {self.id} - {self.type}"
@@ -85,25 +242,99 @@ class DraftTransaction(BaseTransaction):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='draft_user_created_idx'),
+            # Expired draft cleanup
+            models.Index(fields=['user', 'updated_at'], name='draft_user_updated_idx'),
+        ]
+
     def __str__(self):
         return f"Draft Transaction {self.id} - {self.party.name}"
 
+class StockQuerySet(models.QuerySet):
+    def stock_take(self, user_id, counts):
+        """
+        Apply a stock-take for ``user_id``. ``counts`` maps a product id to
+        ``('set', quantity)`` for an absolute count or ``('adjust', delta)``.
+        Quantities never go below zero, as in Stock.save().
+        Returns the changed stocks with their variances and the counts of
+        created/updated/unchanged rows.
+        """
+        with transaction.atomic():
+            existing = {
+                stock.product_id: stock
+                for stock in self.select_for_update().filter(user_id=user_id, product_id__in=counts)
+            }
+
+            to_create, to_update, variances, unchanged = [], [], [], 0
+            for product_id, (mode, value) in counts.items():
+                stock = existing.get(product_id)
+                previous = stock.quantity if stock else 0
+                quantity = max(value if mode == 'set' else previous + value, 0)
+                if stock is None:
+                    stock = Stock(product_id=product_id, user_id=user_id, quantity=quantity)
+                    to_create.append(stock)
+                elif quantity != previous:
+                    stock.quantity = quantity
+                    to_update.append(stock)
+                else:
+                    unchanged += 1
+                    continue
+                variances.append((stock, previous))
+
+            if to_create:
+                self.bulk_create(to_create)
+            if to_update:
+                self.bulk_update(to_update, ['quantity'])
+            ChangeLog.objects.record(Stock, [stock.pk for stock, _ in variances], user_id)
+
+        counts = {'created': len(to_create), 'updated': len(to_update), 'unchanged': unchanged}
+        return variances, counts
+
+
 class Stock(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.IntegerField(default=0)
+    # Held by draft sales, only ever changed with F() updates (see inventory/reservations.py)
+    reserved_quantity = models.IntegerField(default=0)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    objects = StockQuerySet.as_manager()
+
     class Meta:
         unique_together = ['product', 'user']
 
     def __str__(self):
         return f"{self.product.medicine_name} - Stock: {self.quantity}"
 
+    @property
+    def available(self):
+        return self.quantity - self.reserved_quantity
+
     def save(self, *args, **kwargs):
         if self.quantity < 0:
             self.quantity = 0
+        if self.pk and not self._state.adding and kwargs.get('update_fields') is None:
+            # Don't write back a stale reserved_quantity
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'reserved_quantity'
+            ]
         super().save(*args, **kwargs)
 
+class UserProfileQuerySet(models.QuerySet):
+    def set_premium(self, is_premium):
+        """
+        Set the premium status of the admins among these profiles and of their
+        staff. Staff profiles are left out, they follow their admin's status.
+        Returns the number of admins updated.
+        """
+        with transaction.atomic():
+            admin_ids = list(self.filter(user_type='admin').values_list('user_id', flat=True))
+            UserProfile.objects.filter(Q(user_id__in=admin_ids) | Q(admin_id__in=admin_ids)).update(is_premium=is_premium)
+        return len(admin_ids)
+
 class UserProfile(models.Model):
     USER_TYPE_CHOICES = [
         ('admin', 'Admin'),
@@ -120,17 +351,49 @@ class UserProfile(models.Model):
         related_name='staff_members'
     )
     is_premium = models.BooleanField(default=False)
+    # Days an untouched draft is kept, settings.DRAFT_EXPIRY_DAYS when empty
+    draft_expiry_days = models.PositiveIntegerField(null=True, blank=True)
+    # Day the admin's ProductSalesRank rows were last rebuilt from the day buckets
+    sales_ranked_on = models.DateField(null=True, blank=True, editable=False)
+
+    objects = UserProfileQuerySet.as_manager()
+
+    # admin_id and is_premium as last loaded from or saved to the database
+    _saved_admin_id = None
+    _saved_premium = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_admin_id = instance.__dict__.get('admin_id')
+        instance._saved_premium = instance.__dict__.get('is_premium')
+        return instance
 
     def save(self, *args, **kwargs):
-        # If this is a staff profile and their admin is premium,
-        # automatically set this user as premium
-        if self.user_type == 'staff' and self.admin:
-            try:
-                admin_profile = UserProfile.objects.get(user=self.admin)
-                self.is_premium = admin_profile.is_premium
-            except UserProfile.DoesNotExist:
-                pass
-        super().save(*args, **kwargs)
+        # Staff take their admin's premium status. It's kept in sync from the
+        # admin side, so it is only looked up when the staff member gets an admin.
+        if self.user_type == 'staff' and self.admin_id and self.admin_id != self._saved_admin_id:
+            admin_premium = UserProfile.objects.filter(user_id=self.admin_id).values_list('is_premium', flat=True).first()
+            if admin_premium is not None:
+                self.is_premium = admin_premium
+
+        propagate = (
+            self.user_type == 'admin'
+            and not self._state.adding
+            and self.is_premium != self._saved_premium
+        )
+        if propagate:
+            # One UPDATE for all of the admin's staff, committed with the admin
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                UserProfile.objects.filter(admin_id=self.user_id).exclude(
+                    is_premium=self.is_premium
+                ).update(is_premium=self.is_premium)
+        else:
+            super().save(*args, **kwargs)
+
+        self._saved_admin_id = self.admin_id
+        self._saved_premium = self.is_premium
 
     def __str__(self):
         return f"{self.user.username} - {self.user_type}"
@@ -150,6 +413,165 @@ class TransactionItem(models.Model):
         self.subtotal = self.quantity * self.price
         super().save(*args, **kwargs)
 
+class PartyBalanceCheckpointQuerySet(models.QuerySet):
+    def forget(self, party_id, since=None):
+        """Drop the party's checkpoints covering entries dated ``since`` or later, all of them when None"""
+        checkpoints = self.filter(party_id=party_id)
+        if since is not None:
+            checkpoints = checkpoints.filter(through__gte=since)
+        checkpoints.delete()
+
+class PartyBalanceCheckpoint(models.Model):
+    """Statement balance of a party over its entries dated up to ``through``, the last day of a month"""
+    party = models.ForeignKey(Party, on_delete=models.CASCADE, related_name='balance_checkpoints')
+    through = models.DateField()
+    balance = models.DecimalField(max_digits=14, decimal_places=2)
+
+    objects = PartyBalanceCheckpointQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['party', 'through'], name='unique_party_balance_checkpoint'),
+        ]
+
+# Days covered by the rolling product rankings
+RANKING_WINDOWS = (7, 30, 90)
+
+
+def sales_increments(totals):
+    """F() increments adding ``{product_id: (quantity, revenue)}`` to counter rows"""
+    def increment(position, zero):
+        return Case(
+            *[When(product_id=product_id, then=Value(amounts[position])) for product_id, amounts in totals.items()],
+            default=Value(zero)
+        )
+    return {
+        'quantity': F('quantity') + increment(0, 0),
+        'revenue': F('revenue') + increment(1, Decimal('0')),
+    }
+
+
+class ProductSalesDayQuerySet(models.QuerySet):
+    def add(self, tenant_id, day, totals, today=None):
+        """
+        Add ``{product_id: (quantity, revenue)}`` to the tenant's counters of
+        ``day`` and to the rankings whose window covers that day.
+        """
+        if not totals:
+            return
+        totals = {product_id: (quantity, Decimal(revenue)) for product_id, (quantity, revenue) in totals.items()}
+        today = today or timezone.localdate()
+        windows = [window for window in RANKING_WINDOWS if day > today - timedelta(days=window)]
+        with transaction.atomic():
+            # Create missing rows first so that concurrent sales only ever increment
+            self.bulk_create(
+                [ProductSalesDay(user_id=tenant_id, product_id=product_id, day=day) for product_id in totals],
+                ignore_conflicts=True
+            )
+            self.filter(user_id=tenant_id, day=day, product_id__in=totals).update(**sales_increments(totals))
+            if windows:
+                ProductSalesRank.objects.bulk_create([
+                    ProductSalesRank(user_id=tenant_id, product_id=product_id, window=window)
+                    for window in windows for product_id in totals
+                ], ignore_conflicts=True)
+                ProductSalesRank.objects.filter(
+                    user_id=tenant_id, window__in=windows, product_id__in=totals
+                ).update(**sales_increments(totals))
+
+    def refill(self, tenant_id, batch_size=1000):
+        """Recount the tenant's day buckets from its sale items, e.g. after a bulk load"""
+        rows = (
+            TransactionItem.objects.filter(transaction__user_id=tenant_id, transaction__type='sale')
+            .values('stock__product_id', 'transaction__date_at')
+            .annotate(total_quantity=Sum('quantity'), total_revenue=Sum('subtotal'))
+            .order_by()
+        )
+        with transaction.atomic():
+            self.filter(user_id=tenant_id).delete()
+            days = (
+                ProductSalesDay(
+                    user_id=tenant_id, product_id=row['stock__product_id'], day=row['transaction__date_at'],
+                    quantity=row['total_quantity'], revenue=row['total_revenue']
+                )
+                for row in rows.iterator()
+            )
+            for batch in batched(days, batch_size):
+                self.bulk_create(batch)
+            # The cleaner rebuilds the rankings from the new buckets
+            UserProfile.objects.filter(user_id=tenant_id).update(sales_ranked_on=None)
+
+
+class ProductSalesDay(models.Model):
+    """Units and revenue of a product sold by a tenant on one day"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    day = models.DateField()
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    objects = ProductSalesDayQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day', 'product'], name='sales_day_unique'),
+        ]
+
+
+class ProductSalesRankQuerySet(models.QuerySet):
+    def rebuild(self, tenant_id, today=None):
+        """
+        Recompute the tenant's rankings from the day buckets inside each
+        window, which drops the days that aged out since the last rebuild.
+        """
+        today = today or timezone.localdate()
+        aggregates = {}
+        for window in RANKING_WINDOWS:
+            in_window = Q(day__gt=today - timedelta(days=window))
+            aggregates[f'quantity_{window}'] = Sum('quantity', filter=in_window)
+            aggregates[f'revenue_{window}'] = Sum('revenue', filter=in_window)
+
+        with transaction.atomic():
+            rows = ProductSalesDay.objects.filter(
+                user_id=tenant_id, day__gt=today - timedelta(days=max(RANKING_WINDOWS))
+            ).values('product_id').annotate(**aggregates).order_by()
+            ranks = [
+                ProductSalesRank(
+                    user_id=tenant_id, product_id=row['product_id'], window=window,
+                    quantity=row[f'quantity_{window}'], revenue=row[f'revenue_{window}']
+                )
+                for row in rows for window in RANKING_WINDOWS
+                if row[f'quantity_{window}'] is not None
+            ]
+            self.filter(user_id=tenant_id).delete()
+            self.bulk_create(ranks)
+            UserProfile.objects.filter(user_id=tenant_id).update(sales_ranked_on=today)
+        return len(ranks)
+
+
+class ProductSalesRank(models.Model):
+    """
+    Rolling sales of a product over the last ``window`` days, kept current by
+    ProductSalesDayQuerySet.add and rebuilt daily from the day buckets. The
+    indexes hand out the ranking in order.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='sales_ranks')
+    window = models.PositiveSmallIntegerField()
+    quantity = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    objects = ProductSalesRankQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'window', 'product'], name='sales_rank_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'window', 'quantity'], name='sales_rank_quantity_idx'),
+            models.Index(fields=['user', 'window', 'revenue'], name='sales_rank_revenue_idx'),
+        ]
+
+
 class DraftTransactionItem(models.Model):
     draft_transaction = models.ForeignKey(
         'DraftTransaction',
@@ -164,3 +586,234 @@ class DraftTransactionItem(models.Model):
     def save(self, *args, **kwargs):
         self.subtotal = self.quantity * self.price
         super().save(*args, **kwargs)
+
+class StockReservation(models.Model):
+    """Stock held for a draft sale until it is executed, deleted or expires"""
+    draft = models.ForeignKey(DraftTransaction, related_name='reservations', on_delete=models.CASCADE)
+    stock = models.ForeignKey(Stock, related_name='reservations', on_delete=models.CASCADE)
+    quantity = models.IntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at'], name='reservation_expires_idx'),
+        ]
+
+class PaymentQuerySet(models.QuerySet):
+    def allocate(self, party, type, amount, created_by, transactions=None, note=''):
+        """
+        Record a payment of ``amount`` from or to ``party`` and settle its open
+        invoices oldest first (or only ``transactions`` when given).
+        Whatever is left after the last open invoice stays on the payment as
+        ``unallocated_amount``.
+        """
+        invoices = Transaction.objects.filter(
+            party=party, type=Payment.INVOICE_TYPES[type], due_amount__gt=0
+        )
+        if transactions is not None:
+            invoices = invoices.filter(pk__in=transactions)
+
+        with transaction.atomic():
+            allocations, remaining, last_due = [], amount, None
+            open_invoices = invoices.select_for_update().order_by('date_at', 'id').values_list('id', 'due_amount')
+            for transaction_id, last_due in open_invoices.iterator():
+                allocations.append((transaction_id, min(last_due, remaining)))
+                remaining -= allocations[-1][1]
+                if not remaining:
+                    break
+
+            if allocations:
+                # Every invoice but the last one is paid off in full
+                last_id, last_amount = allocations[-1]
+                last_settled = last_amount == last_due
+                Transaction.objects.filter(pk__in=[pk for pk, _ in allocations]).update(
+                    payment_in=Case(
+                        When(pk=last_id, then=F('payment_in') + Value(last_amount)),
+                        default=F('payment_in') + F('due_amount')
+                    ),
+                    due_amount=Case(
+                        When(pk=last_id, then=F('due_amount') - Value(last_amount)),
+                        default=Value(Decimal('0'))
+                    ),
+                    payment_status=Case(
+                        When(pk=last_id, then=Value('completed' if last_settled else 'partial')),
+                        default=Value('completed')
+                    )
+                )
+                ChangeLog.objects.record(Transaction, [pk for pk, _ in allocations], party.user_id)
+
+            payment = self.create(
+                party=party,
+                user_id=party.user_id,
+                created_by=created_by,
+                type=type,
+                amount=amount,
+                unallocated_amount=remaining,
+                note=note
+            )
+            PaymentAllocation.objects.bulk_create([
+                PaymentAllocation(payment=payment, transaction_id=transaction_id, amount=allocated)
+                for transaction_id, allocated in allocations
+            ])
+        return payment
+
+class Payment(models.Model):
+    TYPE_CHOICES = [
+        ('received', 'Received'),
+        ('paid', 'Paid'),
+    ]
+    # Payments received settle sales, payments made settle purchases
+    INVOICE_TYPES = {'received': 'sale', 'paid': 'purchase'}
+    PAYMENT_TYPES = {invoice: payment for payment, invoice in INVOICE_TYPES.items()}
+
+    party = models.ForeignKey(Party, on_delete=models.CASCADE, related_name='payments')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='payments')
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='recorded_payments'
+    )
+    type = models.CharField(max_length=10, choices=TYPE_CHOICES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    unallocated_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = PaymentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['party', 'created_at'], name='payment_party_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Payment {self.id} - {self.party.name}: {self.amount}"
+
+class PaymentAllocation(models.Model):
+    payment = models.ForeignKey(Payment, related_name='allocations', on_delete=models.CASCADE)
+    # Archived transactions keep their id, so allocations outlive the hot row
+    transaction = models.ForeignKey(
+        Transaction,
+        related_name='allocations',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False
+    )
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+
+class ArchivedTransaction(BaseTransaction):
+    """Completed transaction moved out of the hot table by ``archive_transactions``"""
+    id = models.BigIntegerField(primary_key=True)  # Same id as the original transaction
+    date_at = models.DateField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['party', 'date_at', 'id'], name='archived_party_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Archived Transaction {self.id} - {self.type}"
+
+class ArchivedTransactionItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    transaction = models.ForeignKey(
+        ArchivedTransaction,
+        related_name='items',
+        on_delete=models.CASCADE
+    )
+    stock = models.ForeignKey(Stock, on_delete=models.CASCADE)
+    quantity = models.IntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2)
+
+class PartyCarryForward(models.Model):
+    """Totals of a party's archived transactions"""
+    party = models.OneToOneField(Party, on_delete=models.CASCADE, related_name='carry_forward')
+    total_sales = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_sales_payments = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_purchases = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_purchase_payments = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    transaction_count = models.IntegerField(default=0)
+    archived_through = models.DateField()  # Date of the newest archived transaction
+
+    @property
+    def balance(self):
+        return (self.total_sales - self.total_sales_payments) - (self.total_purchases - self.total_purchase_payments)
+
+class ChangeLogQuerySet(models.QuerySet):
+    def record(self, model, object_ids, tenant_id=None, operation='upsert'):
+        """
+        Log writes to ``object_ids`` of ``model`` for the sync feed. Stock
+        changes are also pushed to the live stock event streams once committed.
+        """
+        if model is Stock:
+            events.publish_stock_changes(tenant_id, object_ids)
+        rows = self.bulk_create([
+            ChangeLog(tenant_id=tenant_id, model=model._meta.model_name, object_id=pk, operation=operation)
+            for pk in object_ids
+        ])
+        # The rows join the feed once committed
+        transaction.on_commit(ChangeLog.objects.sequence_committed, using=self.db)
+        return rows
+
+    def sequence_committed(self):
+        """
+        Give the committed rows without a sequence the next sequence numbers,
+        in id order. The counter row stays locked until this commits, so
+        sequences become visible in increasing order: a sync cursor never
+        passes a change whose transaction is still open, however long it runs.
+        Returns how many rows were sequenced.
+        """
+        if not self.filter(sequence__isnull=True).exists():
+            return 0
+        with transaction.atomic(using=self.db):
+            counter, _ = ChangeLogSequence.objects.using(self.db).select_for_update().get_or_create(pk=1)
+            span = self.filter(sequence__isnull=True).aggregate(first=Min('id'), last=Max('id'))
+            if span['first'] is None:
+                return 0
+            # id + offset keeps the id order in one UPDATE. Ids sequenced
+            # earlier leave gaps, which cursors don't mind.
+            offset = counter.last + 1 - span['first']
+            sequenced = self.filter(
+                sequence__isnull=True, id__range=(span['first'], span['last'])
+            ).update(sequence=F('id') + offset)
+            counter.last = span['last'] + offset
+            counter.save(update_fields=['last'])
+        return sequenced
+
+class ChangeLogSequence(models.Model):
+    """Single row: the last sequence handed out and the last one pruned"""
+    last = models.BigIntegerField(default=0)
+    pruned_through = models.BigIntegerField(default=0)
+
+class ChangeLog(models.Model):
+    """
+    One row per write to a synced model (see inventory/changefeed.py). The
+    sequence, assigned in commit order, is the sync cursor handed to clients.
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    OPERATION_CHOICES = [
+        (UPSERT, 'Upsert'),
+        (DELETE, 'Delete'),
+    ]
+
+    # Empty for products, which all tenants share
+    tenant = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    operation = models.CharField(max_length=6, choices=OPERATION_CHOICES, default=UPSERT)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Empty until the write committed, see ChangeLogQuerySet.sequence_committed
+    sequence = models.BigIntegerField(null=True, blank=True, editable=False)
+
+    objects = ChangeLogQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['tenant', 'sequence'], name='changelog_tenant_seq_idx'),
+            models.Index(fields=['id'], condition=models.Q(sequence__isnull=True), name='changelog_unsequenced_idx'),
+            # Pruning
+            models.Index(fields=['created_at', 'sequence'], name='changelog_created_idx'),
+        ]
@@ -0,0 +1,144 @@
+# inventory/party_import.py
+"""
+Streaming party import from CSV or NDJSON (one JSON object per line). Rows
+are validated, checked for duplicates and inserted ``batch_size`` at a time,
+each batch in its own transaction, so memory use stays flat however long the
+file is.
+
+A row is a duplicate when a party of the tenant, or an earlier row, has the
+same phone or email. Duplicates and invalid rows are skipped and reported
+with their row number (the first row after a CSV header is row 1). A line
+that cannot be read at all (bad encoding, broken CSV quoting) stops the
+import after the rows before it.
+"""
+import codecs
+import csv
+import json
+
+from django.db import transaction
+
+from rest_framework import serializers
+
+from .models import ChangeLog, Party
+from .serializers import PartyImportSerializer
+from .utils import batched
+
+IMPORT_FIELDS = ('name', 'email', 'phone', 'address')
+
+# Stands in for an NDJSON line that isn't JSON
+INVALID_JSON = object()
+
+
+def csv_rows(file):
+    rows = csv.DictReader(codecs.iterdecode(file, 'utf-8-sig'))
+    missing = set(IMPORT_FIELDS) - set(rows.fieldnames or ())
+    if missing:
+        raise ValueError(f'Missing CSV columns: {", ".join(sorted(missing))}')
+    return rows
+
+
+def ndjson_rows(file):
+    for line in codecs.iterdecode(file, 'utf-8-sig'):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield INVALID_JSON
+
+
+class PartyImport:
+    def __init__(self, tenant_id, max_errors=1000):
+        self.tenant_id = tenant_id
+        # Rows past this many problems are counted but not listed
+        self.max_errors = max_errors
+        self.serializer = PartyImportSerializer()
+        self.counts = {'created': 0, 'duplicates': 0, 'invalid': 0}
+        self.errors = []
+
+    def report(self, row, errors):
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'row': row, 'errors': errors})
+
+    def validate(self, batch):
+        records = []
+        for row, data in batch:
+            if data is INVALID_JSON:
+                self.counts['invalid'] += 1
+                self.report(row, {'non_field_errors': ['Invalid JSON.']})
+                continue
+            try:
+                records.append((row, self.serializer.run_validation(data)))
+            except serializers.ValidationError as error:
+                self.counts['invalid'] += 1
+                self.report(row, error.detail)
+        return records
+
+    def existing_keys(self, records):
+        # One lookup per field, each on its own index
+        keys = set()
+        for field in ('phone', 'email'):
+            values = {record[field] for _, record in records}
+            keys |= {
+                (field, value) for value in Party.objects.filter(
+                    user_id=self.tenant_id, **{f'{field}__in': values}
+                ).values_list(field, flat=True)
+            }
+        return keys
+
+    def load(self, batch):
+        records = self.validate(batch)
+        if not records:
+            return
+        with transaction.atomic():
+            # Earlier batches are committed, so this also catches duplicates across batches
+            seen = self.existing_keys(records)
+            parties = []
+            for row, record in records:
+                duplicate = [field for field in ('phone', 'email') if (field, record[field]) in seen]
+                if duplicate:
+                    self.counts['duplicates'] += 1
+                    self.report(row, {field: [f'A party with this {field} already exists.'] for field in duplicate})
+                    continue
+                seen |= {('phone', record['phone']), ('email', record['email'])}
+                parties.append(Party(user_id=self.tenant_id, **record))
+            # bulk_create sends no post_save, log the changes for the sync feed here
+            created = Party.objects.bulk_create(parties)
+            ChangeLog.objects.record(Party, [party.pk for party in created], self.tenant_id)
+        self.counts['created'] += len(created)
+
+
+def read_rows(rows):
+    """
+    Yield (row number, row) until ``rows`` runs out or breaks. A broken line
+    or bad encoding ends the import; the error is yielded as the last row.
+    """
+    number = 0
+    iterator = iter(rows)
+    while True:
+        try:
+            data = next(iterator)
+        except StopIteration:
+            return
+        except (ValueError, csv.Error) as error:
+            yield number + 1, error
+            return
+        number += 1
+        yield number, data
+
+
+def import_parties(tenant_id, rows, batch_size=1000):
+    """
+    Import ``rows`` (dicts) as parties of the tenant. Returns (counts, errors,
+    failure), ``failure`` being the row number and message of a line that
+    could not be read, or None. The rows before it are imported.
+    """
+    party_import = PartyImport(tenant_id)
+    failure = None
+    for batch in batched(read_rows(rows), batch_size):
+        if isinstance(batch[-1][1], Exception):
+            row, error = batch.pop()
+            failure = {'row': row, 'error': str(error)}
+        party_import.load(batch)
+    # Invalid rows of a batch are reported before its duplicates
+    return party_import.counts, sorted(party_import.errors, key=lambda error: error['row']), failure
@@ -1,6 +1,17 @@
 from rest_framework import permissions
 from .models import UserProfile
 
+
+def get_tenant_id(user):
+    """Return the id of the admin who owns the data ``user`` works on."""
+    try:
+        profile = user.userprofile
+    except UserProfile.DoesNotExist:
+        return None
+    if profile.user_type == 'staff':
+        return profile.admin_id
+    return user.id
+
 class IsAdminOrStaffPermission(permissions.BasePermission):
     def has_permission(self, request, view):
         if not request.user.is_authenticated:
@@ -0,0 +1,349 @@
+# inventory/reports.py
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core import signing
+from django.db import connections
+from django.db.models import (
+    Case, CharField, DateField, DecimalField, ExpressionWrapper, F, FilteredRelation, OuterRef, Q, Subquery, Sum, Value, When
+)
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import ArchivedTransaction, PartyBalanceCheckpoint, Payment, PaymentAllocation, ProductSalesRank, Stock, Transaction, UserProfile
+
+STATEMENT_CURSOR_SALT = 'inventory.reports.statement'
+
+AMOUNT_FIELD = DecimalField(max_digits=12, decimal_places=2)
+DATE_FIELD = DateField()
+CENTS = Decimal('0.01')
+
+# Statement entries of one day list the invoices before the payments
+INVOICE, PAYMENT = 0, 1
+ENTRY_KINDS = {INVOICE: 'transaction', PAYMENT: 'payment'}
+
+
+def allocated():
+    """What payments have settled of a transaction since it was written"""
+    allocations = (
+        PaymentAllocation.objects.filter(transaction_id=OuterRef('id'))
+        .values('transaction_id').annotate(total=Sum('amount')).values('total')
+    )
+    return Coalesce(Subquery(allocations, output_field=AMOUNT_FIELD), Value(Decimal('0')), output_field=AMOUNT_FIELD)
+
+
+def invoice_change():
+    """
+    What a transaction added to the party's balance on its date: its total
+    less what was paid with it, but not the payments allocated to it later,
+    which are entries of their own. Positive balances are owed to us (unpaid
+    sales), negative ones by us (unpaid purchases), as in the ``net_balance``
+    of the financial summary.
+    """
+    due = F('total_amount') - F('payment_in') + allocated()
+    return Case(When(type='sale', then=due), default=-due, output_field=AMOUNT_FIELD)
+
+
+def payment_change():
+    """What a payment took off the party's balance, the part allocated to invoices"""
+    settled = F('amount') - F('unallocated_amount')
+    return Case(When(type='received', then=-settled), default=settled, output_field=AMOUNT_FIELD)
+
+
+def invoice_entries(model):
+    return model.objects.values(
+        kind=Value(INVOICE),
+        entry_id=F('id'),
+        entry_date=F('date_at'),
+        entry_type=F('type'),
+        entry_total=F('total_amount'),
+        entry_paid=ExpressionWrapper(F('payment_in') - allocated(), output_field=AMOUNT_FIELD),
+        entry_status=F('payment_status'),
+        entry_amount=invoice_change(),
+    )
+
+
+def payment_entries():
+    return Payment.objects.values(
+        kind=Value(PAYMENT),
+        entry_id=F('id'),
+        entry_date=TruncDate('created_at'),
+        entry_type=F('type'),
+        entry_total=F('amount'),
+        entry_paid=ExpressionWrapper(F('amount') - F('unallocated_amount'), output_field=AMOUNT_FIELD),
+        entry_status=Value(None, output_field=CharField()),
+        entry_amount=payment_change(),
+    )
+
+
+def reads_archive(party, start):
+    """Whether a statement from ``start`` reaches back into archived transactions"""
+    carry_forward = getattr(party, 'carry_forward', None)
+    return carry_forward is not None and (start is None or start <= carry_forward.archived_through)
+
+
+def balance_between(party, after, before):
+    """What the entries of ``party`` dated after ``after`` (from the first one when None) and before ``before`` add up to"""
+    def total(entries):
+        entries = entries.filter(party=party, entry_date__lt=before)
+        if after is not None:
+            entries = entries.filter(entry_date__gt=after)
+        return entries.aggregate(balance=Sum('entry_amount'))['balance'] or Decimal('0.00')
+
+    balance = total(invoice_entries(Transaction)) + total(payment_entries())
+    if reads_archive(party, after and after + timedelta(days=1)):
+        balance += total(invoice_entries(ArchivedTransaction))
+    return balance
+
+
+def month_end_before(day):
+    return day.replace(day=1) - timedelta(days=1)
+
+
+def balance_checkpoint(party, through):
+    """
+    Balance of ``party`` over its entries dated up to the month end
+    ``through``. Stored as a PartyBalanceCheckpoint and built from the latest
+    earlier one, so every month is summed once; writes dated on or before a
+    checkpoint drop it (see ``signals.forget_balances``).
+    """
+    latest = party.balance_checkpoints.filter(through__lte=through).order_by('-through').first()
+    if latest is not None and latest.through == through:
+        return latest.balance
+    balance = (latest.balance if latest else Decimal('0.00')) + balance_between(
+        party, latest and latest.through, through + timedelta(days=1)
+    )
+    PartyBalanceCheckpoint.objects.get_or_create(party=party, through=through, defaults={'balance': balance})
+    return balance
+
+
+def opening_balance(party, before):
+    """
+    Balance of ``party`` before the date ``before``: the checkpoint at the end
+    of the month before, plus the entries of ``before``'s month up to it.
+    Checkpoints are only kept for months that have ended.
+    """
+    if before is None:
+        return Decimal('0.00')
+    through = month_end_before(min(before, timezone.localdate()))
+    return balance_checkpoint(party, through) + balance_between(party, through, before)
+
+
+def running_balances(entries):
+    """
+    The rows of the ``entries`` union with ``running``, the window SUM of
+    their amounts in statement order. Django can't annotate a union, so the
+    window is put around its SQL.
+    """
+    connection = connections[entries.db]
+    sql, params = entries.query.sql_with_params()
+    order = ', '.join(connection.ops.quote_name(column) for column in ('entry_date', 'kind', 'entry_id'))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT *, SUM({connection.ops.quote_name("entry_amount")}) OVER '
+            f'(ORDER BY {order} ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) '
+            f'FROM ({sql}) statement_entries ORDER BY {order}',
+            params
+        )
+        columns = [column[0] for column in cursor.description[:-1]] + ['running']
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def as_amount(value):
+    # Raw rows skip Django's converters, SQLite returns sums as floats
+    return None if value is None else AMOUNT_FIELD.to_python(value).quantize(CENTS)
+
+
+def encode_statement_cursor(party, row, opening):
+    return signing.dumps(
+        [party.pk, row['date_at'].isoformat(), row['kind'], row['id'], str(row['balance']), str(opening)],
+        salt=STATEMENT_CURSOR_SALT
+    )
+
+
+def decode_statement_cursor(party, cursor):
+    """
+    Return (date, kind, id, balance) of the last entry served and the
+    statement's opening balance, or raise signing.BadSignature.
+    """
+    try:
+        party_id, date_at, kind, pk, balance, opening = signing.loads(cursor, salt=STATEMENT_CURSOR_SALT)
+    except ValueError:
+        raise signing.BadSignature('Malformed cursor')
+    if party_id != party.pk:
+        raise signing.BadSignature('Cursor belongs to another party')
+    return date_at, kind, pk, Decimal(balance), Decimal(opening)
+
+
+def party_statement(party, start=None, end=None, cursor=None, page_size=50):
+    """
+    One page of the statement of ``party`` with the running balance after
+    every entry. Entries are the party's transactions, at what they added to
+    the balance when written, and its payments on the day they were recorded,
+    in (date, invoices before payments, id) order. Later payments therefore
+    never rewrite the balance of an earlier page.
+
+    The running balance is a window sum over the page added to the balance the
+    page starts from: the opening balance for the first page, then the balance
+    carried in the cursor, so no page re-reads the entries before it. Archived
+    transactions are only read when the statement starts on or before the
+    party's archived_through date.
+    Returns (opening_balance, balance_forward, rows, next_cursor).
+    """
+    after = None
+    if cursor:
+        after_date, after_kind, after_id, carried, opening = decode_statement_cursor(party, cursor)
+        after = {
+            kind: Q(entry_date__gt=after_date) | Q(entry_date=after_date, entry_id__gt=after_id)
+            if kind == after_kind else Q(entry_date__gt=after_date) if kind < after_kind else Q(entry_date__gte=after_date)
+            for kind in ENTRY_KINDS
+        }
+    else:
+        opening = carried = opening_balance(party, start)
+
+    def entries(queryset, kind):
+        queryset = queryset.filter(party=party)
+        if start:
+            queryset = queryset.filter(entry_date__gte=start)
+        if end:
+            queryset = queryset.filter(entry_date__lte=end)
+        if after:
+            queryset = queryset.filter(after[kind])
+        return queryset
+
+    parts = [entries(invoice_entries(Transaction), INVOICE), entries(payment_entries(), PAYMENT)]
+    if reads_archive(party, start):
+        parts.append(entries(invoice_entries(ArchivedTransaction), INVOICE))
+    page = parts[0].union(*parts[1:], all=True).order_by('entry_date', 'kind', 'entry_id')[:page_size + 1]
+    rows = running_balances(page)
+
+    has_next = len(rows) > page_size
+    rows = [
+        {
+            'kind': row['kind'],
+            'entry': ENTRY_KINDS[row['kind']],
+            'id': row['entry_id'],
+            'date_at': DATE_FIELD.to_python(row['entry_date']),
+            'type': row['entry_type'],
+            'total_amount': as_amount(row['entry_total']),
+            'payment_in': as_amount(row['entry_paid']),
+            'payment_status': row['entry_status'],
+            'amount': as_amount(row['entry_amount']),
+            'balance': carried + as_amount(row['running']),
+        }
+        for row in rows[:page_size]
+    ]
+
+    next_cursor = encode_statement_cursor(party, rows[-1], opening) if has_next else None
+    return opening, carried, rows, next_cursor
+
+
+# (name, youngest age in days, oldest age in days)
+AGING_BUCKETS = (
+    ('days_0_30', 0, 30),
+    ('days_31_60', 31, 60),
+    ('days_61_90', 61, 90),
+    ('days_over_90', 91, None),
+)
+AGING_SIDES = (('they_owe_us', 'sale'), ('we_owe_them', 'purchase'))
+
+
+def aging_aggregates(as_of):
+    aggregates = {}
+    for side, transaction_type in AGING_SIDES:
+        for bucket, youngest, oldest in AGING_BUCKETS:
+            # Invoices dated after as_of are not due yet on that day
+            condition = Q(type=transaction_type, date_at__lte=as_of - timedelta(days=youngest))
+            if oldest is not None:
+                condition &= Q(date_at__gte=as_of - timedelta(days=oldest))
+            aggregates[f'{side}__{bucket}'] = Sum('due_amount', filter=condition)
+    return aggregates
+
+
+def aging_report(tenant_id, as_of=None):
+    """
+    Outstanding dues of every party of the tenant by age, from one grouped
+    query over the open transactions (txn_open_due_idx).
+    """
+    as_of = as_of or timezone.localdate()
+    rows = (
+        Transaction.objects.filter(user_id=tenant_id, due_amount__gt=0)
+        .values('party_id')
+        .annotate(party_name=F('party__name'), **aging_aggregates(as_of))
+        .order_by('party_name', 'party_id')
+    )
+
+    zero = Decimal('0.00')
+    totals = {side: dict.fromkeys([bucket for bucket, *_ in AGING_BUCKETS] + ['total'], zero) for side, _ in AGING_SIDES}
+    parties = []
+    for row in rows:
+        entry = {'party': {'id': row['party_id'], 'name': row['party_name']}}
+        for side, _ in AGING_SIDES:
+            buckets = {bucket: row[f'{side}__{bucket}'] or zero for bucket, *_ in AGING_BUCKETS}
+            buckets['total'] = sum(buckets.values(), zero)
+            for bucket, amount in buckets.items():
+                totals[side][bucket] += amount
+            entry[side] = buckets
+        parties.append(entry)
+
+    return {'as_of': as_of, 'totals': totals, 'parties': parties}
+
+
+RANKING_METRICS = ('quantity', 'revenue')
+
+
+def slow_movers(tenant_id, window):
+    """The tenant's stocked products with their sales over ``window`` days, unsold ones included"""
+    sales = FilteredRelation(
+        'product__sales_ranks',
+        condition=Q(product__sales_ranks__user_id=tenant_id, product__sales_ranks__window=window)
+    )
+    return (
+        Stock.objects.filter(user_id=tenant_id, quantity__gt=0)
+        .annotate(sales=sales)
+        .annotate(
+            sold_quantity=Coalesce(F('sales__quantity'), Value(0)),
+            sold_revenue=Coalesce(F('sales__revenue'), Value(Decimal('0')), output_field=AMOUNT_FIELD),
+        )
+    )
+
+
+def product_ranking(tenant_id, window, metric='quantity', limit=10):
+    """
+    Top sellers and slow movers of the tenant over the last ``window`` days,
+    read in order from the ProductSalesRank indexes. The counters are rebuilt
+    from the day buckets once a day by the cleaner, until then they are the
+    ones of the day they were last rebuilt on, plus the sales since.
+    """
+    ranked_on = UserProfile.objects.filter(user_id=tenant_id).values_list('sales_ranked_on', flat=True).first()
+
+    top = (
+        ProductSalesRank.objects.filter(user_id=tenant_id, window=window, **{f'{metric}__gt': 0})
+        .order_by(f'-{metric}', 'product_id')
+        .values('product_id', 'product__medicine_name', 'quantity', 'revenue')
+        [:limit]
+    )
+    slow = (
+        slow_movers(tenant_id, window)
+        .order_by(f'sold_{metric}', 'product_id')
+        .values('product_id', 'product__medicine_name', 'sold_quantity', 'sold_revenue', 'quantity')
+        [:limit]
+    )
+    return {
+        'as_of': ranked_on,
+        'window': window,
+        'metric': metric,
+        'top_sellers': [{
+            'product': row['product_id'],
+            'medicine_name': row['product__medicine_name'],
+            'quantity': row['quantity'],
+            'revenue': row['revenue'],
+        } for row in top],
+        'slow_movers': [{
+            'product': row['product_id'],
+            'medicine_name': row['product__medicine_name'],
+            'quantity': row['sold_quantity'],
+            'revenue': row['sold_revenue'],
+            'in_stock': row['quantity'],
+        } for row in slow],
+    }
@@ -0,0 +1,84 @@
+# inventory/reservations.py
+"""
+Stock reservations for draft sales. ``Stock.reserved_quantity`` is only
+changed here, with conditional F() updates, so two drafts can never hold more
+than the stock on hand and ``Stock.available`` stays a plain column read.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Case, F, Sum, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import ChangeLog, InsufficientStock, Stock, StockReservation
+
+
+def draft_quantities(draft):
+    quantities = defaultdict(int)
+    for stock_id, quantity in draft.items.values_list('stock_id', 'quantity'):
+        quantities[stock_id] += quantity
+    return quantities
+
+
+def reserve_draft(draft):
+    """
+    Reserve the stock of a draft sale. Must run inside a transaction, which is
+    left to roll back when InsufficientStock is raised.
+    """
+    if draft.type != 'sale':
+        return []
+    expires_at = timezone.now() + timedelta(hours=settings.STOCK_RESERVATION_HOURS)
+    reservations = []
+    # Sorted so concurrent drafts lock stock rows in the same order
+    for stock_id, quantity in sorted(draft_quantities(draft).items()):
+        reserved = Stock.objects.filter(
+            pk=stock_id, user_id=draft.user_id, quantity__gte=F('reserved_quantity') + quantity
+        ).update(reserved_quantity=F('reserved_quantity') + quantity)
+        if not reserved:
+            raise InsufficientStock(stock_id)
+        reservations.append(StockReservation(draft=draft, stock_id=stock_id, quantity=quantity, expires_at=expires_at))
+    ChangeLog.objects.record(Stock, [reservation.stock_id for reservation in reservations], draft.user_id)
+    return StockReservation.objects.bulk_create(reservations)
+
+
+def release(reservations):
+    """Give the stock held by ``reservations`` back and delete them. Returns how many were released."""
+    totals, tenants = {}, {}
+    for stock_id, tenant_id, total in reservations.values('stock', 'stock__user').annotate(
+        total=Sum('quantity')
+    ).order_by().values_list('stock', 'stock__user', 'total'):
+        totals[stock_id] = total
+        tenants.setdefault(tenant_id, []).append(stock_id)
+    if not totals:
+        return 0
+    Stock.objects.filter(pk__in=totals).update(
+        reserved_quantity=Greatest(
+            F('reserved_quantity') - Case(*[When(pk=pk, then=Value(total)) for pk, total in totals.items()]),
+            0
+        )
+    )
+    for tenant_id, stock_ids in tenants.items():
+        ChangeLog.objects.record(Stock, stock_ids, tenant_id)
+    return reservations.delete()[0]
+
+
+def consume_draft(draft):
+    """
+    Take the stock of a draft sale being executed: its reservations are
+    released and the quantities deducted, failing if the stock is no longer
+    available (e.g. after the reservation expired).
+    """
+    release(draft.reservations.all())
+    for stock_id, quantity in sorted(draft_quantities(draft).items()):
+        taken = Stock.objects.filter(
+            pk=stock_id, user_id=draft.user_id, quantity__gte=F('reserved_quantity') + quantity
+        ).update(quantity=F('quantity') - quantity)
+        if not taken:
+            raise InsufficientStock(stock_id)
+        ChangeLog.objects.record(Stock, [stock_id], draft.user_id)
+
+
+def expired_reservations(now=None):
+    return StockReservation.objects.filter(expires_at__lt=now or timezone.now())
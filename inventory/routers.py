@@ -0,0 +1,83 @@
+# inventory/routers.py
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Set while a safe (read-only) request is being served; only then may reads
+# leave the primary.
+_read_from_replica = ContextVar('read_from_replica', default=False)
+
+PIN_CACHE_KEY = 'replica-pin:{}'
+
+
+def get_replicas():
+    return [
+        alias for alias in getattr(settings, 'REPLICA_DATABASES', [])
+        if alias in settings.DATABASES
+    ]
+
+
+def pin_to_primary(tenant_id):
+    """Keep the tenant's reads on the primary so it sees its own writes."""
+    if tenant_id is None:
+        return
+    cache.set(
+        PIN_CACHE_KEY.format(tenant_id),
+        True,
+        getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+    )
+
+
+def is_pinned(tenant_id):
+    if tenant_id is None:
+        return False
+    return cache.get(PIN_CACHE_KEY.format(tenant_id)) is not None
+
+
+def use_replica(tenant_id):
+    """Route reads in the current context to a replica, returns a reset token."""
+    enabled = bool(get_replicas()) and not is_pinned(tenant_id)
+    return _read_from_replica.set(enabled)
+
+
+def reset_replica(token):
+    _read_from_replica.reset(token)
+
+
+@contextmanager
+def replica_reads(tenant_id):
+    token = use_replica(tenant_id)
+    try:
+        yield
+    finally:
+        reset_replica(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes always go to ``default``. Reads go to one of
+    ``settings.REPLICA_DATABASES`` when the current context opted in through
+    ``replica_reads`` / ``ReplicaReadMixin``, otherwise Django's default
+    routing applies.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _read_from_replica.get():
+            replicas = get_replicas()
+            if replicas:
+                return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Allow `migrate --database replica` to build a local replica file
+        return None
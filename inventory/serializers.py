@@ -1,57 +1,224 @@
 # inventory/serializers.py
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings as api_settings_drf
 from django.contrib.auth.models import User
-from .models import Product, Party, Transaction,Stock, TransactionItem, DraftTransaction, DraftTransactionItem,UserProfile
+from .models import Product, Party, Transaction,Stock, TransactionItem, DraftTransaction, DraftTransactionItem,UserProfile, Payment, PaymentAllocation
 from django.contrib.auth.password_validation import validate_password
 from decimal import Decimal
+from django.core.exceptions import FieldDoesNotExist
 from django.db import transaction
+from django.db.models import F
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from .authentication import TenantRefreshToken
+from .permissions import get_tenant_id
+from .reservations import InsufficientStock, release, reserve_draft
+from .summaries import build_financial_summary, financial_summary_aggregates, party_financial_totals
+
+def query_param_set(request, name):
+    value = request.query_params.get(name, '')
+    return {field.strip() for field in value.split(',') if field.strip()}
+
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets for GET requests: ``?fields=a,b`` limits the response to
+    the given fields and ``?expand=x`` opts into ``Meta.expandable_fields``.
+    Requests giving neither get every field, as before these existed.
+
+    ``expandable_fields`` maps a field name to either None, for a costly field
+    that list responses selecting fields leave out unless expanded, or a
+    callable returning the field to render in its place when expanded.
+    ``Meta.field_querysets`` maps a field name to the queryset tweak it needs,
+    see ``prepare_queryset``.
+    """
+
+    @classmethod
+    def field_selection(cls, request):
+        """The requested (fields, expand), (None, None) for writes and requests selecting neither"""
+        if request is None or request.method not in SAFE_METHODS:
+            return None, None
+        requested, expand = query_param_set(request, 'fields'), query_param_set(request, 'expand')
+        if not requested and not expand:
+            return None, None
+        return requested, expand
+
+    @classmethod
+    def is_rendered(cls, name, requested, expand, many):
+        if requested and name not in requested:
+            return False
+        expandable = getattr(cls.Meta, 'expandable_fields', {})
+        if many and name in expandable and expandable[name] is None:
+            return name in expand or name in requested
+        return True
+
+    @classmethod
+    def prepare_queryset(cls, queryset, request, many):
+        """Only join, prefetch and annotate what the response will render"""
+        if request is None or request.method not in SAFE_METHODS:
+            return queryset
+        requested, expand = cls.field_selection(request)
+
+        expandable = getattr(cls.Meta, 'expandable_fields', {})
+        for name, prepare in getattr(cls.Meta, 'field_querysets', {}).items():
+            if requested is not None and not cls.is_rendered(name, requested, expand, many):
+                continue
+            # Replaced fields only need their queryset once expanded
+            if expandable.get(name) and name not in (expand or ()):
+                continue
+            queryset = prepare(queryset)
+        return queryset
+
+    def get_fields(self):
+        fields = super().get_fields()
+
+        # Nested serializers render in full
+        many = isinstance(self.parent, serializers.ListSerializer)
+        if self.parent is not None and not (many and self.parent.parent is None):
+            return fields
+
+        requested, expand = self.field_selection(self.context.get('request'))
+        if requested is None:
+            return fields
+
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        for name in list(fields):
+            if not self.is_rendered(name, requested, expand, many):
+                fields.pop(name)
+            elif expandable.get(name) and name in expand:
+                fields[name] = expandable[name]()
+        return fields
+
+
+# Fields whose to_representation is the identity for the values the
+# database returns
+PASSTHROUGH_FIELDS = (
+    serializers.CharField,
+    serializers.BooleanField,
+    serializers.ChoiceField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+_values_plans = {}
+
+
+def decimal_to_string(value):
+    return format(value, 'f')
+
+
+def value_converter(field):
+    """Precompute how a column value becomes the field's representation"""
+    if isinstance(field, serializers.IntegerField):
+        # BigIntegerField may be configured to render as a string
+        if getattr(field, 'coerce_to_string', getattr(api_settings_drf, 'COERCE_BIGINT_TO_STRING', False)):
+            return field.to_representation
+        return None
+    if isinstance(field, PASSTHROUGH_FIELDS):
+        return None
+    if (isinstance(field, serializers.DecimalField)
+            and getattr(field, 'coerce_to_string', api_settings_drf.COERCE_DECIMAL_TO_STRING)
+            and not field.localize and not getattr(field, 'normalize_output', False)):
+        # The database backend already quantizes to the model's decimal_places
+        return decimal_to_string
+    return field.to_representation
+
+
+def values_plan(serializer):
+    """
+    Column plan for ``values_representation``: a list of
+    ``(name, source, converter)`` for the serializer's fields, or None when a
+    field can't be read from a plain column (method fields, nested
+    serializers, dotted sources, ...) or from an expression given in
+    ``Meta.values_expressions``. Plans are cached per serializer class and
+    field selection.
+    """
+    fields = serializer.fields
+    # Field types are part of the key, ?expand= swaps a field for a serializer under the same name
+    key = (type(serializer), tuple((name, type(field)) for name, field in fields.items()))
+    if key in _values_plans:
+        return _values_plans[key]
+
+    model = serializer.Meta.model
+    plan = []
+    for name, field in fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, (serializers.SerializerMethodField, serializers.BaseSerializer)):
+            plan = None
+            break
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            # Model properties the database can compute, see Meta.values_expressions
+            expression = getattr(serializer.Meta, 'values_expressions', {}).get(field.source)
+            if expression is None:
+                plan = None
+                break
+            plan.append((name, expression, value_converter(field)))
+            continue
+        if not model_field.concrete:
+            plan = None
+            break
+        plan.append((name, field.source, value_converter(field)))
+
+    _values_plans[key] = plan
+    return plan
+
+
+def values_representation(queryset, plan):
+    """
+    Build the same list of dicts a ``ModelSerializer`` would, straight from
+    ``values_list()`` rows, without instantiating models.
+    """
+    names = [name for name, source, converter in plan]
+    converters = [
+        (index, converter)
+        for index, (name, source, converter) in enumerate(plan)
+        if converter is not None
+    ]
+
+    data = []
+    for row in queryset.values_list(*[source for name, source, converter in plan]).iterator(chunk_size=2000):
+        if converters:
+            row = list(row)
+            for index, converter in converters:
+                if row[index] is not None:
+                    row[index] = converter(row[index])
+        data.append(dict(zip(names, row)))
+    return data
+
 
 class BulkProductSerializer(serializers.ListSerializer):
     def create(self, validated_data):
-        products = [Product(**item) for item in validated_data]
-        return Product.objects.bulk_create(products)
+        # Upsert on the natural key; sync_counts reports what was written
+        products, self.sync_counts = Product.objects.sync_catalogue(validated_data)
+        return products
+
+class ProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    ml = serializers.CharField(max_length=50, required=False, allow_blank=True, allow_null=True, default='')
 
-class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = ['id', 'medicine_name', 'ml', 'price', 'unit_price', 'company', 'min_sale']
         list_serializer_class = BulkProductSerializer
 
+    def get_validators(self):
+        # Bulk rows are upserted on the natural key, a single product is an insert
+        if isinstance(self.parent, BulkProductSerializer):
+            return []
+        return super().get_validators()
+
+    def validate_ml(self, value):
+        return value or ''
 
 
-class PartySerializer(serializers.ModelSerializer):
+class PartySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     financial_summary = serializers.SerializerMethodField()
 
     def get_financial_summary(self, obj):
-        transactions = Transaction.objects.filter(party=obj)
-        
-        summary = {
-            'total_sales': 0,
-            'total_sales_payments': 0,
-            'total_sales_due': 0,
-            'total_purchases': 0,
-            'total_purchase_payments': 0,
-            'total_purchase_due': 0,
-            'they_owe_us': 0,
-            'we_owe_them': 0,
-            'net_balance': 0
-        }
-
-        for trans in transactions:
-            if trans.type == 'sale':
-                summary['total_sales'] += trans.total_amount
-                summary['total_sales_payments'] += trans.payment_in
-                summary['total_sales_due'] += (trans.total_amount - trans.payment_in)
-            else:  # purchase
-                summary['total_purchases'] += trans.total_amount
-                summary['total_purchase_payments'] += trans.payment_in
-                summary['total_purchase_due'] += (trans.total_amount - trans.payment_in)
-
-        summary['they_owe_us'] = summary['total_sales_due']
-        summary['we_owe_them'] = summary['total_purchase_due']
-        summary['net_balance'] = (summary['they_owe_us'] - summary['we_owe_them'])
-
-        return summary
+        return build_financial_summary(party_financial_totals(obj))
 
     associated_user = serializers.PrimaryKeyRelatedField(
         queryset=User.objects.all(),
@@ -63,6 +230,12 @@ class PartySerializer(serializers.ModelSerializer):
         model = Party
         fields = ['id', 'name', 'email', 'phone', 'address', 'associated_user', 'user', 'financial_summary']
         read_only_fields = ('user',)
+        expandable_fields = {'financial_summary': None}
+        field_querysets = {
+            'financial_summary': lambda queryset: queryset.select_related('carry_forward').annotate(
+                **financial_summary_aggregates('transaction__')
+            )
+        }
 
     def validate(self, data):
         user = self.context['request'].user
@@ -80,6 +253,13 @@ class PartySerializer(serializers.ModelSerializer):
 
         return data
 
+class PartyImportSerializer(serializers.ModelSerializer):
+    """One row of a party import, validated without touching the database"""
+
+    class Meta:
+        model = Party
+        fields = ['name', 'email', 'phone', 'address']
+
 class TransactionItemSerializer(serializers.ModelSerializer):
     stock = serializers.PrimaryKeyRelatedField(queryset=Stock.objects.all())
     
@@ -87,7 +267,7 @@ class TransactionItemSerializer(serializers.ModelSerializer):
         model = TransactionItem
         fields = ['stock', 'quantity']
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     items = TransactionItemSerializer(many=True)
     
     class Meta:
@@ -95,6 +275,10 @@ class TransactionSerializer(serializers.ModelSerializer):
         fields = ['id', 'party', 'type', 'items', 'payment_in', 'total_amount', 
                  'due_amount', 'payment_status', 'created_by', 'user', 'date_at']
         read_only_fields = ('date_at', 'created_by', 'user')
+        expandable_fields = {'items': None}
+        field_querysets = {
+            'items': lambda queryset: queryset.prefetch_related('items')
+        }
         extra_kwargs = {
             'party': {'required': True},
             'type': {'required': True},
@@ -156,6 +340,7 @@ class TransactionSerializer(serializers.ModelSerializer):
             
             # Call update_stock() after creating all items
             transaction_instance.update_stock()
+            transaction_instance.record_sales()
             
             return transaction_instance
 
@@ -193,11 +378,126 @@ class TransactionSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
-class StockSerializer(serializers.ModelSerializer):
+class StockSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    available = serializers.IntegerField(read_only=True)
+
     class Meta:
         model = Stock
         fields = '__all__'
-        read_only_fields = ('user',)
+        read_only_fields = ('user', 'reserved_quantity')
+        values_expressions = {'available': F('quantity') - F('reserved_quantity')}
+        # ?expand=product renders the product instead of its id
+        expandable_fields = {'product': lambda: ProductSerializer(read_only=True)}
+        field_querysets = {
+            'product': lambda queryset: queryset.select_related('product')
+        }
+
+class PaymentAllocationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PaymentAllocation
+        fields = ['transaction', 'amount']
+
+class PaymentSerializer(serializers.ModelSerializer):
+    allocations = PaymentAllocationSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Payment
+        fields = ['id', 'party', 'type', 'amount', 'unallocated_amount', 'note',
+                 'allocations', 'created_by', 'created_at']
+        read_only_fields = ('party', 'unallocated_amount', 'created_by', 'created_at')
+        extra_kwargs = {
+            'amount': {'min_value': Decimal('0.01')}
+        }
+
+    def create(self, validated_data):
+        return Payment.objects.allocate(**validated_data)
+
+class StockTakeItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(required=False, min_value=0)
+    delta = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        if ('quantity' in data) == ('delta' in data):
+            raise serializers.ValidationError("Provide either an absolute quantity or a delta.")
+        return data
+
+class StockTakeSerializer(serializers.Serializer):
+    items = StockTakeItemSerializer(many=True, allow_empty=False)
+
+    def validate_items(self, items):
+        product_ids = [item['product'] for item in items]
+        if len(set(product_ids)) != len(product_ids):
+            raise serializers.ValidationError("Each product may appear only once.")
+
+        found = set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+        missing = [pk for pk in product_ids if pk not in found]
+        if missing:
+            raise serializers.ValidationError(f"Products not found: {missing}")
+        return items
+
+    def save(self, user_id):
+        counts = {
+            item['product']: ('set', item['quantity']) if 'quantity' in item else ('adjust', item['delta'])
+            for item in self.validated_data['items']
+        }
+        return Stock.objects.stock_take(user_id, counts)
+
+class StatementEntrySerializer(serializers.Serializer):
+    entry = serializers.CharField()
+    id = serializers.IntegerField()
+    date = serializers.DateField(source='date_at')
+    type = serializers.CharField()
+    total_amount = serializers.DecimalField(max_digits=None, decimal_places=2)
+    payment_in = serializers.DecimalField(max_digits=None, decimal_places=2)
+    payment_status = serializers.CharField(allow_null=True)
+    amount = serializers.DecimalField(max_digits=None, decimal_places=2)
+    balance = serializers.DecimalField(max_digits=None, decimal_places=2)
+
+class PartyStatementSerializer(serializers.Serializer):
+    party = serializers.DictField()
+    start = serializers.DateField(allow_null=True)
+    end = serializers.DateField(allow_null=True)
+    opening_balance = serializers.DecimalField(max_digits=None, decimal_places=2)
+    balance_forward = serializers.DecimalField(max_digits=None, decimal_places=2)
+    closing_balance = serializers.DecimalField(max_digits=None, decimal_places=2)
+    next = serializers.CharField(allow_null=True)
+    results = StatementEntrySerializer(many=True)
+
+class AgingBucketsSerializer(serializers.Serializer):
+    days_0_30 = serializers.DecimalField(max_digits=None, decimal_places=2)
+    days_31_60 = serializers.DecimalField(max_digits=None, decimal_places=2)
+    days_61_90 = serializers.DecimalField(max_digits=None, decimal_places=2)
+    days_over_90 = serializers.DecimalField(max_digits=None, decimal_places=2)
+    total = serializers.DecimalField(max_digits=None, decimal_places=2)
+
+class AgingSidesSerializer(serializers.Serializer):
+    they_owe_us = AgingBucketsSerializer()
+    we_owe_them = AgingBucketsSerializer()
+
+class AgingPartySerializer(AgingSidesSerializer):
+    party = serializers.DictField()
+
+class AgingReportSerializer(serializers.Serializer):
+    as_of = serializers.DateField()
+    totals = AgingSidesSerializer()
+    parties = AgingPartySerializer(many=True)
+
+class ProductRankSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    medicine_name = serializers.CharField()
+    quantity = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=None, decimal_places=2)
+
+class SlowMoverSerializer(ProductRankSerializer):
+    in_stock = serializers.IntegerField()
+
+class ProductRankingSerializer(serializers.Serializer):
+    as_of = serializers.DateField(allow_null=True)
+    window = serializers.IntegerField()
+    metric = serializers.CharField()
+    top_sellers = ProductRankSerializer(many=True)
+    slow_movers = SlowMoverSerializer(many=True)
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
@@ -239,6 +539,43 @@ class DraftTransactionSerializer(serializers.ModelSerializer):
         read_only_fields = ('created_at', 'updated_at', 'total_amount', 'due_amount', 
                           'payment_status', 'created_by', 'user')
 
+    def validate(self, data):
+        # A draft sale reserves its stock, so another tenant's must not be named
+        tenant_id = get_tenant_id(self.context['request'].user)
+
+        if 'party' in data and data['party'].user_id != tenant_id:
+            raise serializers.ValidationError(
+                {"party": "You can only create drafts for your own parties"}
+            )
+
+        for item in data.get('items', []):
+            stock = item['stock']
+            if stock.user_id != tenant_id:
+                raise serializers.ValidationError(
+                    {"items": f"Stock {stock.product.medicine_name} does not belong to you"}
+                )
+
+        return data
+
+    def create_items(self, draft_transaction, items_data):
+        for item in items_data:
+            DraftTransactionItem.objects.create(
+                draft_transaction=draft_transaction,
+                stock=item['stock'],
+                quantity=item['quantity'],
+                price=item['stock'].product.price,
+                subtotal=item['stock'].product.price * item['quantity']
+            )
+
+    def reserve(self, draft_transaction):
+        try:
+            reserve_draft(draft_transaction)
+        except InsufficientStock as e:
+            stock = Stock.objects.select_related('product').get(pk=e.stock_id)
+            raise serializers.ValidationError(
+                {"items": f"Only {stock.available} of {stock.product.medicine_name} available"}
+            )
+
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         
@@ -251,22 +588,39 @@ class DraftTransactionSerializer(serializers.ModelSerializer):
         # Calculate total_amount based on items
         total_amount = sum(item['quantity'] * item['stock'].product.price for item in items_data)
         validated_data['total_amount'] = total_amount
+        validated_data['due_amount'] = total_amount - validated_data.get('payment_in', 0)
         
-        # Create the draft transaction
-        draft_transaction = DraftTransaction.objects.create(user=user, **validated_data)
-        
-        # Create draft transaction items
-        for item in items_data:
-            DraftTransactionItem.objects.create(
-                draft_transaction=draft_transaction,
-                stock=item['stock'],
-                quantity=item['quantity'],
-                price=item['stock'].product.price,
-                subtotal=item['stock'].product.price * item['quantity']
-            )
+        with transaction.atomic():
+            # Create the draft transaction
+            draft_transaction = DraftTransaction.objects.create(user=user, **validated_data)
+            
+            # Create draft transaction items
+            self.create_items(draft_transaction, items_data)
+
+            # Hold the stock of a draft sale until it is executed or expires
+            self.reserve(draft_transaction)
         
         return draft_transaction
 
+    def update(self, instance, validated_data):
+        items_data = validated_data.pop('items', None)
+
+        with transaction.atomic():
+            release(instance.reservations.all())
+
+            if items_data is not None:
+                instance.items.all().delete()
+                self.create_items(instance, items_data)
+                instance.total_amount = sum(item['quantity'] * item['stock'].product.price for item in items_data)
+
+            for field in validated_data:
+                setattr(instance, field, validated_data[field])
+            instance.due_amount = instance.total_amount - instance.payment_in
+            instance.save()
+
+            self.reserve(instance)
+        return instance
+
 class UserProfileSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username')
     email = serializers.CharField(source='user.email')
@@ -276,5 +630,49 @@ class UserProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserProfile
         fields = ['id', 'username', 'email', 'user_type', 'is_premium', 
-                 'admin_email', 'admin_username']
-        read_only_fields = ['user_type', 'is_premium']
\ No newline at end of file
+                 'admin_email', 'admin_username', 'draft_expiry_days']
+        read_only_fields = ['user_type', 'is_premium']
+
+    def validate_draft_expiry_days(self, value):
+        if self.instance and self.instance.user_type != 'admin':
+            raise serializers.ValidationError("Only admins can set the draft expiry.")
+        if value == 0:
+            raise serializers.ValidationError("Drafts must be kept for at least one day.")
+        return value
+
+class TenantTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = TenantRefreshToken
+
+
+class TenantTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = TenantRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        user = User.objects.select_related('userprofile').filter(
+            **{api_settings.USER_ID_FIELD: user_id}
+        ).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(
+                self.error_messages['no_active_account'],
+                'no_active_account',
+            )
+
+        # Re-stamp the claims so profile changes (premium, admin) reach the client
+        refresh.set_tenant_claims(user)
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+
+            data['refresh'] = str(refresh)
+
+        return data
@@ -0,0 +1,49 @@
+# inventory/signals.py
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import post_delete, post_save
+
+from .changefeed import SYNC_MODELS, tenant_of
+from .models import ChangeLog, PartyBalanceCheckpoint, Payment, Transaction
+
+# Set while rows are moved rather than changed, e.g. into the archive tables
+_unlogged = ContextVar('changes_unlogged', default=False)
+
+
+@contextmanager
+def changes_unlogged():
+    """Don't log the saves and deletes in this block to the sync feed"""
+    token = _unlogged.set(True)
+    try:
+        yield
+    finally:
+        _unlogged.reset(token)
+
+
+def record_save(sender, instance, raw=False, **kwargs):
+    if not raw and not _unlogged.get():
+        ChangeLog.objects.record(sender, [instance.pk], tenant_of(instance))
+
+
+def record_delete(sender, instance, **kwargs):
+    if not _unlogged.get():
+        ChangeLog.objects.record(sender, [instance.pk], tenant_of(instance), ChangeLog.DELETE)
+
+
+def forget_balances(sender, instance, created=False, **kwargs):
+    """Statement checkpoints covering a changed transaction's date, or any for a deleted payment, no longer hold"""
+    # New transactions are dated today, after every checkpoint, and moved ones keep their balance
+    if created or _unlogged.get():
+        return
+    since = instance.date_at if sender is Transaction else None
+    PartyBalanceCheckpoint.objects.forget(instance.party_id, since)
+
+
+def connect_signals():
+    for model in SYNC_MODELS.values():
+        post_save.connect(record_save, sender=model, dispatch_uid=f'changefeed-save-{model.__name__}')
+        post_delete.connect(record_delete, sender=model, dispatch_uid=f'changefeed-delete-{model.__name__}')
+    post_save.connect(forget_balances, sender=Transaction, dispatch_uid='checkpoints-save-Transaction')
+    post_delete.connect(forget_balances, sender=Transaction, dispatch_uid='checkpoints-delete-Transaction')
+    post_delete.connect(forget_balances, sender=Payment, dispatch_uid='checkpoints-delete-Payment')
@@ -0,0 +1,126 @@
+# inventory/singleflight.py
+"""
+Single-flight for expensive computed reads (dashboard statistics, financial
+summaries, reports): concurrent calls for the same tenant and key wait on the
+first one's computation instead of repeating it, and its result is shared
+for SINGLE_FLIGHT_TTL seconds after it finished.
+
+Results are kept in process memory and must not be modified by the callers.
+A successful write by the tenant forgets its results in this process, other
+workers may serve them until the TTL runs out.
+"""
+import asyncio
+import threading
+import time
+
+from django.conf import settings
+
+from . import metrics
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.expires = None
+
+    def stale(self, now):
+        return self.done.is_set() and (self.error is not None or self.expires <= now)
+
+
+class AsyncFlight:
+    def __init__(self, task, ttl):
+        self.task = task
+        self.loop = task.get_loop()
+        self.expires = None
+        task.add_done_callback(lambda task: setattr(self, 'expires', time.monotonic() + ttl))
+
+    def stale(self, now):
+        if not self.task.done():
+            return False
+        if self.task.cancelled() or self.task.exception() is not None:
+            return True
+        return self.expires is not None and self.expires <= now
+
+
+class SingleFlight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    def prune(self, now):
+        # Called with the lock held
+        for key in [key for key, flight in self.flights.items() if flight.stale(now)]:
+            del self.flights[key]
+
+    def do(self, tenant_id, key, func, ttl=None):
+        """Return ``func()``, or the result of the same call in flight or finished within ``ttl`` seconds"""
+        ttl = settings.SINGLE_FLIGHT_TTL if ttl is None else ttl
+        key = ('sync', tenant_id, key)
+        now = time.monotonic()
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None or flight.stale(now)
+            if leader:
+                self.prune(now)
+                flight = self.flights[key] = Flight()
+
+        if leader:
+            try:
+                flight.result = func()
+            except BaseException as error:
+                flight.error = error
+                raise
+            finally:
+                flight.expires = time.monotonic() + ttl
+                flight.done.set()
+            return flight.result
+
+        metrics.increment('single_flight_shared')
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    async def ado(self, tenant_id, key, func, ttl=None):
+        """Async ``do``, ``func`` returns an awaitable. Flights are shared within one event loop."""
+        ttl = settings.SINGLE_FLIGHT_TTL if ttl is None else ttl
+        key = ('async', tenant_id, key)
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None or flight.stale(now) or flight.loop is not loop
+            if leader:
+                self.prune(now)
+                # A task of its own, so a caller going away doesn't cancel it for the others
+                flight = self.flights[key] = AsyncFlight(loop.create_task(func()), ttl)
+
+        if not leader:
+            metrics.increment('single_flight_shared')
+        return await asyncio.shield(flight.task)
+
+    def forget(self, tenant_id):
+        """
+        Drop the tenant's results, e.g. after it wrote something. Calls in
+        flight still get theirs, later ones compute anew.
+        """
+        with self.lock:
+            for key in [key for key in self.flights if key[1] == tenant_id]:
+                del self.flights[key]
+
+
+flights = SingleFlight()
+
+
+def coalesce(tenant_id, key, func, ttl=None):
+    return flights.do(tenant_id, key, func, ttl)
+
+
+async def acoalesce(tenant_id, key, func, ttl=None):
+    return await flights.ado(tenant_id, key, func, ttl)
+
+
+def forget(tenant_id):
+    flights.forget(tenant_id)
@@ -0,0 +1,439 @@
+# inventory/snapshot.py
+"""
+Tenant snapshots: one tenant's products, stock, parties, payments,
+transactions (archived ones and their carry-forward totals included) and
+drafts in a gzip-compressed file of JSON lines, written and read in chunks so
+memory use does not grow with the tenant.
+
+The first line is a header with the column names of every section. Each
+following line is ``[section, rows]`` with up to ``chunk_size`` rows as
+lists. Items and payment allocations follow the chunk of transactions (or
+drafts) they belong to, so restoring only keeps the key map of one chunk of
+them. Products are matched by their natural key on restore, everything else
+gets new ids; the old and new ids are staged in a temporary table, read back
+one chunk at a time.
+"""
+import gzip
+import json
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .archive import move_to_archive
+from .models import (
+    ArchivedTransaction, ArchivedTransactionItem, ChangeLog, DraftTransaction, DraftTransactionItem, Party,
+    PartyBalanceCheckpoint, PartyCarryForward, Payment, PaymentAllocation, Product, ProductSalesDay, Stock,
+    StockReservation, Transaction, TransactionItem, UserProfile
+)
+from .utils import batched
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib json module
+    orjson = None
+
+FORMAT = 'mims-tenant-snapshot'
+VERSION = 2
+# Version 1 had no payments, archived transactions or carry-forwards
+READABLE_VERSIONS = (1, 2)
+
+SECTIONS = {
+    'product': (Product, ['id', 'medicine_name', 'ml', 'price', 'unit_price', 'company', 'min_sale']),
+    'party': (Party, ['id', 'name', 'email', 'phone', 'address', 'associated_user_id']),
+    # Reservations are not part of a snapshot, restored stock has none
+    'stock': (Stock, ['id', 'product_id', 'quantity']),
+    'payment': (Payment, ['id', 'party_id', 'type', 'amount', 'unallocated_amount', 'note', 'created_by_id', 'created_at']),
+    'transaction': (Transaction, [
+        'id', 'party_id', 'type', 'total_amount', 'payment_in', 'due_amount', 'payment_status',
+        'created_by_id', 'date_at'
+    ]),
+    'transaction_item': (TransactionItem, ['transaction_id', 'stock_id', 'quantity', 'price', 'subtotal']),
+    # Allocations follow the chunk of transactions (or archived transactions) they settle
+    'payment_allocation': (PaymentAllocation, ['payment_id', 'transaction_id', 'amount']),
+    'archived_transaction': (ArchivedTransaction, [
+        'id', 'party_id', 'type', 'total_amount', 'payment_in', 'due_amount', 'payment_status',
+        'created_by_id', 'date_at'
+    ]),
+    'archived_transaction_item': (ArchivedTransactionItem, ['transaction_id', 'stock_id', 'quantity', 'price', 'subtotal']),
+    'carry_forward': (PartyCarryForward, [
+        'id', 'party_id', 'total_sales', 'total_sales_payments', 'total_purchases', 'total_purchase_payments',
+        'transaction_count', 'archived_through'
+    ]),
+    'draft': (DraftTransaction, [
+        'id', 'party_id', 'type', 'total_amount', 'payment_in', 'due_amount', 'payment_status',
+        'created_by_id', 'created_at', 'updated_at'
+    ]),
+    'draft_item': (DraftTransactionItem, ['draft_transaction_id', 'stock_id', 'quantity', 'price', 'subtotal']),
+}
+
+
+def dumps(value):
+    # Decimals as strings, so amounts survive exactly
+    if orjson is not None:
+        return orjson.dumps(value, default=str) + b'\n'
+    return json.dumps(value, default=str, separators=(',', ':')).encode() + b'\n'
+
+
+def loads(line):
+    return orjson.loads(line) if orjson is not None else json.loads(line)
+
+
+def keyset_chunks(queryset, fields, chunk_size):
+    """``values_list`` rows of ``fields`` (id first) in chunks, paging on the id"""
+    last_id = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_id).order_by('pk').values_list(*fields)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def dump_tenant(tenant_id, path, chunk_size=5000):
+    """Write the tenant's snapshot to ``path``. Returns the rows written per section."""
+    counts = dict.fromkeys(SECTIONS, 0)
+
+    def write_section(out, name, rows):
+        out.write(dumps([name, rows]))
+        counts[name] += len(rows)
+
+    with gzip.open(path, 'wb', compresslevel=6) as out:
+        out.write(dumps({
+            'format': FORMAT,
+            'version': VERSION,
+            'tenant': tenant_id,
+            'created_at': datetime.now(dt_timezone.utc).isoformat(),
+            'fields': {name: fields for name, (model, fields) in SECTIONS.items()},
+        }))
+
+        products = Product.objects.filter(stock__user_id=tenant_id)
+        for rows in keyset_chunks(products, SECTIONS['product'][1], chunk_size):
+            write_section(out, 'product', rows)
+        for name in ('party', 'stock', 'payment'):
+            model, fields = SECTIONS[name]
+            for rows in keyset_chunks(model.objects.filter(user_id=tenant_id), fields, chunk_size):
+                write_section(out, name, rows)
+
+        allocations = PaymentAllocation.objects.filter(payment__user_id=tenant_id)
+        for name, item_name, parent_field in (
+            ('transaction', 'transaction_item', 'transaction_id'),
+            ('archived_transaction', 'archived_transaction_item', 'transaction_id'),
+            ('draft', 'draft_item', 'draft_transaction_id'),
+        ):
+            model, fields = SECTIONS[name]
+            item_model, item_fields = SECTIONS[item_name]
+            for rows in keyset_chunks(model.objects.filter(user_id=tenant_id), fields, chunk_size):
+                write_section(out, name, rows)
+                ids = [row[0] for row in rows]
+                items = list(
+                    item_model.objects.filter(**{f'{parent_field}__in': ids}).order_by('pk').values_list(*item_fields)
+                )
+                if items:
+                    write_section(out, item_name, items)
+                if name != 'draft':
+                    settled = list(
+                        allocations.filter(transaction_id__in=ids).order_by('pk')
+                        .values_list(*SECTIONS['payment_allocation'][1])
+                    )
+                    if settled:
+                        write_section(out, 'payment_allocation', settled)
+
+        carry_forwards = PartyCarryForward.objects.filter(party__user_id=tenant_id)
+        for rows in keyset_chunks(carry_forwards, SECTIONS['carry_forward'][1], chunk_size):
+            write_section(out, 'carry_forward', rows)
+    return counts
+
+
+@contextmanager
+def keep_auto_dates(*models):
+    """Let bulk_create write the dumped values of auto_now(_add) fields instead of now"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class IdMap:
+    """
+    Old to new ids of the restored rows per section, in a temporary table
+    rather than in memory. Created and dropped inside the restore's
+    transaction, so a failed restore leaves nothing behind.
+    """
+    table = 'snapshot_id_map'
+    # Old ids looked up per query, databases cap the number of query parameters
+    lookup_batch_size = 500
+
+    def __init__(self):
+        self.name = connection.ops.quote_name(self.table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {self.name} ('
+                'section varchar(32) NOT NULL, old_id bigint NOT NULL, new_id bigint NOT NULL, '
+                'PRIMARY KEY (section, old_id))'
+            )
+
+    def add(self, section, old_ids, new_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.name} (section, old_id, new_id) VALUES (%s, %s, %s)',
+                [(section, old_id, new_id) for old_id, new_id in zip(old_ids, new_ids)]
+            )
+
+    def get(self, section, old_ids):
+        """The new ids of ``old_ids`` as a dict"""
+        found = {}
+        with connection.cursor() as cursor:
+            for batch in batched(sorted(set(old_ids)), self.lookup_batch_size):
+                cursor.execute(
+                    f'SELECT old_id, new_id FROM {self.name} '
+                    f'WHERE section = %s AND old_id IN ({", ".join(["%s"] * len(batch))})',
+                    [section, *batch]
+                )
+                found.update(cursor.fetchall())
+        return found
+
+    def drop(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE {self.name}')
+
+
+class TenantRestore:
+    """
+    Loads a snapshot into the tenant ``tenant_id``, giving every row a new id,
+    and logs the restored parties, stock and transactions to the sync feed.
+    """
+
+    def __init__(self, tenant_id, fields):
+        self.tenant_id = tenant_id
+        self.fields = fields
+        self.converters = {
+            name: [SECTIONS[name][0]._meta.get_field(field).to_python for field in fields[name]]
+            for name in fields
+        }
+        self.ids = IdMap()
+        # Ids of the transactions (or drafts) of the last chunk, their items come next
+        self.parents = {}
+        # Archived transactions are restored as transactions, for fresh ids from
+        # the same sequence, and moved to the archive once their chunk is complete
+        self.to_archive = []
+        # Users that may stay the creator of a restored transaction
+        self.tenant_users = {tenant_id} | set(
+            UserProfile.objects.filter(admin_id=tenant_id).values_list('user_id', flat=True)
+        )
+        self.counts = dict.fromkeys(SECTIONS, 0)
+
+    def records(self, name, rows):
+        fields, converters = self.fields[name], self.converters[name]
+        for row in rows:
+            yield {field: convert(value) for field, convert, value in zip(fields, converters, row)}
+
+    def load(self, name, rows):
+        if name not in ('archived_transaction_item', 'payment_allocation'):
+            self.archive_pending()
+        getattr(self, f'load_{name}')(rows)
+        self.counts[name] += len(rows)
+
+    def finish(self):
+        self.archive_pending()
+        self.ids.drop()
+
+    def archive_pending(self):
+        if self.to_archive:
+            move_to_archive(self.to_archive)
+            self.to_archive = []
+
+    def load_product(self, rows):
+        records = list(self.records('product', rows))
+        names = {record['medicine_name'] for record in records}
+        existing = {product.natural_key(): product.pk for product in Product.objects.filter(medicine_name__in=names)}
+        missing = [
+            Product(**{field: value for field, value in record.items() if field != 'id'})
+            for record in records if tuple(record[field] for field in Product.NATURAL_KEY) not in existing
+        ]
+        if missing:
+            # The ids of ignored conflicts aren't returned, read them all back
+            Product.objects.bulk_create(missing, ignore_conflicts=True)
+            known = set(existing.values())
+            existing = {product.natural_key(): product.pk for product in Product.objects.filter(medicine_name__in=names)}
+            ChangeLog.objects.record(Product, sorted(set(existing.values()) - known))
+        self.ids.add(
+            'product', [record['id'] for record in records],
+            [existing[tuple(record[field] for field in Product.NATURAL_KEY)] for record in records]
+        )
+
+    def load_party(self, rows):
+        records = list(self.records('party', rows))
+        users = {record['associated_user_id'] for record in records} - {None}
+        # A user can only be the associated user of one party
+        free_users = set(User.objects.filter(id__in=users).values_list('id', flat=True)) - set(
+            Party.objects.filter(associated_user_id__in=users).values_list('associated_user_id', flat=True)
+        )
+        old_ids = [record.pop('id') for record in records]
+        for record in records:
+            if record['associated_user_id'] not in free_users:
+                record['associated_user_id'] = None
+        parties = Party.objects.bulk_create([Party(**record, user_id=self.tenant_id) for record in records])
+        self.ids.add('party', old_ids, [party.pk for party in parties])
+        ChangeLog.objects.record(Party, [party.pk for party in parties], self.tenant_id)
+
+    def load_stock(self, rows):
+        records = list(self.records('stock', rows))
+        old_ids = [record.pop('id') for record in records]
+        products = self.ids.get('product', [record['product_id'] for record in records])
+        stocks = Stock.objects.bulk_create([
+            Stock(product_id=products[record['product_id']], quantity=record['quantity'], user_id=self.tenant_id)
+            for record in records
+        ])
+        self.ids.add('stock', old_ids, [stock.pk for stock in stocks])
+        ChangeLog.objects.record(Stock, [stock.pk for stock in stocks], self.tenant_id)
+
+    def creator(self, user_id):
+        return user_id if user_id in self.tenant_users else None
+
+    def load_payment(self, rows):
+        records = list(self.records('payment', rows))
+        old_ids = [record.pop('id') for record in records]
+        parties = self.ids.get('party', [record['party_id'] for record in records])
+        for record in records:
+            record['party_id'] = parties[record['party_id']]
+            record['created_by_id'] = self.creator(record['created_by_id'])
+        payments = Payment.objects.bulk_create([Payment(**record, user_id=self.tenant_id) for record in records])
+        self.ids.add('payment', old_ids, [payment.pk for payment in payments])
+
+    def load_parents(self, name, rows, model=None):
+        model = model or SECTIONS[name][0]
+        records = list(self.records(name, rows))
+        old_ids = [record.pop('id') for record in records]
+        parties = self.ids.get('party', [record['party_id'] for record in records])
+        for record in records:
+            record['party_id'] = parties[record['party_id']]
+            record['created_by_id'] = self.creator(record['created_by_id'])
+        created = model.objects.bulk_create([model(**record, user_id=self.tenant_id) for record in records])
+        self.parents = dict(zip(old_ids, (instance.pk for instance in created)))
+        return list(self.parents.values())
+
+    def load_items(self, name, parent_field, rows, model=None):
+        model = model or SECTIONS[name][0]
+        records = list(self.records(name, rows))
+        stocks = self.ids.get('stock', [record['stock_id'] for record in records])
+        for record in records:
+            record[parent_field] = self.parents[record[parent_field]]
+            record['stock_id'] = stocks[record['stock_id']]
+        model.objects.bulk_create([model(**record) for record in records])
+
+    def load_transaction(self, rows):
+        ids = self.load_parents('transaction', rows)
+        ChangeLog.objects.record(Transaction, ids, self.tenant_id)
+
+    def load_transaction_item(self, rows):
+        self.load_items('transaction_item', 'transaction_id', rows)
+
+    def load_payment_allocation(self, rows):
+        records = list(self.records('payment_allocation', rows))
+        payments = self.ids.get('payment', [record['payment_id'] for record in records])
+        PaymentAllocation.objects.bulk_create([
+            PaymentAllocation(
+                payment_id=payments[record['payment_id']],
+                transaction_id=self.parents[record['transaction_id']],
+                amount=record['amount']
+            )
+            for record in records
+        ])
+
+    def load_archived_transaction(self, rows):
+        self.to_archive = self.load_parents('archived_transaction', rows, model=Transaction)
+
+    def load_archived_transaction_item(self, rows):
+        self.load_items('archived_transaction_item', 'transaction_id', rows, model=TransactionItem)
+
+    def load_carry_forward(self, rows):
+        records = list(self.records('carry_forward', rows))
+        parties = self.ids.get('party', [record['party_id'] for record in records])
+        for record in records:
+            del record['id']
+            record['party_id'] = parties[record['party_id']]
+        PartyCarryForward.objects.bulk_create([PartyCarryForward(**record) for record in records])
+
+    def load_draft(self, rows):
+        self.load_parents('draft', rows)
+
+    def load_draft_item(self, rows):
+        self.load_items('draft_item', 'draft_transaction_id', rows)
+
+
+def tenant_has_data(tenant_id):
+    return any(
+        model.objects.filter(user_id=tenant_id).exists()
+        for model in (Party, Stock, Payment, Transaction, ArchivedTransaction, DraftTransaction)
+    )
+
+
+def clear_tenant(tenant_id, chunk_size=5000):
+    """
+    Delete the tenant's drafts, transactions, payments, stock and parties.
+    Sync clients get a delete logged per party, stock and transaction, written
+    in chunks; the rows themselves go in one DELETE per table, without being
+    loaded or sent through the per-row delete signals.
+    """
+    for model in (Transaction, Stock, Party):
+        for rows in keyset_chunks(model.objects.filter(user_id=tenant_id), ['id'], chunk_size):
+            ChangeLog.objects.record(model, [row[0] for row in rows], tenant_id, ChangeLog.DELETE)
+
+    # Children first: a raw delete does not cascade
+    for queryset in (
+        StockReservation.objects.filter(Q(draft__user_id=tenant_id) | Q(stock__user_id=tenant_id)),
+        DraftTransactionItem.objects.filter(draft_transaction__user_id=tenant_id),
+        DraftTransaction.objects.filter(user_id=tenant_id),
+        PaymentAllocation.objects.filter(payment__user_id=tenant_id),
+        Payment.objects.filter(user_id=tenant_id),
+        ArchivedTransactionItem.objects.filter(transaction__user_id=tenant_id),
+        ArchivedTransaction.objects.filter(user_id=tenant_id),
+        PartyCarryForward.objects.filter(party__user_id=tenant_id),
+        PartyBalanceCheckpoint.objects.filter(party__user_id=tenant_id),
+        TransactionItem.objects.filter(transaction__user_id=tenant_id),
+        Transaction.objects.filter(user_id=tenant_id),
+        Stock.objects.filter(user_id=tenant_id),
+        Party.objects.filter(user_id=tenant_id),
+    ):
+        queryset._raw_delete(queryset.db)
+
+
+def read_header(lines):
+    header = loads(next(lines))
+    if header.get('format') != FORMAT or header.get('version') not in READABLE_VERSIONS:
+        raise ValueError('Not a tenant snapshot this version can read')
+    return header
+
+
+def restore_tenant(path, tenant_id, replace=False):
+    """
+    Load the snapshot at ``path`` into ``tenant_id`` in one transaction.
+    The tenant must have no data, unless ``replace`` deletes it first.
+    Returns the rows restored per section.
+    """
+    with gzip.open(path, 'rb') as lines, transaction.atomic():
+        header = read_header(lines)
+        if replace:
+            clear_tenant(tenant_id)
+        elif tenant_has_data(tenant_id):
+            raise ValueError(f'Tenant {tenant_id} already has data')
+
+        restore = TenantRestore(tenant_id, header['fields'])
+        with keep_auto_dates(Transaction, DraftTransaction, Payment):
+            for line in lines:
+                name, rows = loads(line)
+                restore.load(name, rows)
+            restore.finish()
+        ProductSalesDay.objects.refill(tenant_id)
+    return restore.counts
@@ -0,0 +1,111 @@
+# inventory/summaries.py
+from asgiref.sync import sync_to_async
+from django.db.models import Q, Sum
+
+from .models import Party, Product, Transaction, UserProfile
+from .singleflight import acoalesce, coalesce
+
+SUMMARY_PREFIX = 'summary_'
+
+
+def financial_summary_aggregates(prefix=''):
+    """
+    Aggregates behind ``PartySerializer.financial_summary``. ``prefix`` is the
+    lookup path to the transactions, e.g. ``'transaction__'`` when annotating
+    parties.
+    """
+    sale = Q(**{f'{prefix}type': 'sale'})
+    purchase = Q(**{f'{prefix}type': 'purchase'})
+    return {
+        f'{SUMMARY_PREFIX}total_sales': Sum(f'{prefix}total_amount', filter=sale),
+        f'{SUMMARY_PREFIX}total_sales_payments': Sum(f'{prefix}payment_in', filter=sale),
+        f'{SUMMARY_PREFIX}total_purchases': Sum(f'{prefix}total_amount', filter=purchase),
+        f'{SUMMARY_PREFIX}total_purchase_payments': Sum(f'{prefix}payment_in', filter=purchase),
+    }
+
+
+def build_financial_summary(totals):
+    """Turn the aggregated totals into the ``financial_summary`` payload"""
+    total_sales = totals[f'{SUMMARY_PREFIX}total_sales'] or 0
+    total_sales_payments = totals[f'{SUMMARY_PREFIX}total_sales_payments'] or 0
+    total_purchases = totals[f'{SUMMARY_PREFIX}total_purchases'] or 0
+    total_purchase_payments = totals[f'{SUMMARY_PREFIX}total_purchase_payments'] or 0
+
+    total_sales_due = total_sales - total_sales_payments
+    total_purchase_due = total_purchases - total_purchase_payments
+
+    return {
+        'total_sales': total_sales,
+        'total_sales_payments': total_sales_payments,
+        'total_sales_due': total_sales_due,
+        'total_purchases': total_purchases,
+        'total_purchase_payments': total_purchase_payments,
+        'total_purchase_due': total_purchase_due,
+        'they_owe_us': total_sales_due,
+        'we_owe_them': total_purchase_due,
+        'net_balance': total_sales_due - total_purchase_due
+    }
+
+
+SUMMARY_FIELDS = tuple(financial_summary_aggregates())
+
+
+def with_carry_forward(totals, party):
+    """Add the totals of the party's archived transactions, if any"""
+    carry_forward = getattr(party, 'carry_forward', None)
+    if carry_forward is None:
+        return totals
+    return {
+        field: (value or 0) + getattr(carry_forward, field[len(SUMMARY_PREFIX):])
+        for field, value in totals.items()
+    }
+
+
+def party_financial_totals(party):
+    # Parties annotated with financial_summary_aggregates('transaction__') carry their totals
+    if hasattr(party, SUMMARY_FIELDS[0]):
+        totals = {field: getattr(party, field) for field in SUMMARY_FIELDS}
+    else:
+        totals = coalesce(
+            party.user_id, ('party-summary', party.pk),
+            lambda: Transaction.objects.filter(party=party).aggregate(**financial_summary_aggregates())
+        )
+    return with_carry_forward(totals, party)
+
+
+def _statistics_querysets(profile):
+    user = profile.user
+    if profile.user_type == 'admin':
+        return {
+            'total_products': Product.objects.all(),
+            'total_parties': Party.objects.filter(user=user),
+            'total_transactions': Transaction.objects.filter(user=user),
+            'total_staff': UserProfile.objects.filter(admin=user)
+        }
+    return {
+        'transactions_created': Transaction.objects.filter(
+            user_id=profile.admin_id,
+            created_by=user
+        )
+    }
+
+
+def _tenant_of(profile):
+    return profile.user_id if profile.user_type == 'admin' else profile.admin_id
+
+
+def _count_statistics(profile):
+    return {key: queryset.count() for key, queryset in _statistics_querysets(profile).items()}
+
+
+def dashboard_statistics(profile):
+    """Counts shown on the ``/me/`` dashboard"""
+    return coalesce(_tenant_of(profile), ('statistics', profile.user_id), lambda: _count_statistics(profile))
+
+
+async def adashboard_statistics(profile):
+    # The counts run one after another: Django sends async ORM calls to a single
+    # thread-sensitive executor, so gathering acount() calls would not overlap
+    # them. Counting in one executor call saves a thread handoff per query.
+    count = sync_to_async(_count_statistics)
+    return await acoalesce(_tenant_of(profile), ('statistics', profile.user_id), lambda: count(profile))
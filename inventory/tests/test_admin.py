@@ -0,0 +1,49 @@
+# inventory/tests/test_admin.py
+from django.contrib.auth.models import User
+from django.test import Client
+
+from .utils import TenantTestCase, make_admin, make_party
+
+
+class AdminFilterTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = make_admin('other')
+        make_party(self.admin, 'Acme')
+        make_party(self.other, 'Beta')
+        self.browser = Client()
+        self.browser.force_login(User.objects.create_superuser('root', 'root@example.com', 'pw12345!'))
+
+    def test_autocomplete_filter_by_admin(self):
+        response = self.browser.get('/admin/inventory/party/', {'user__id__exact': self.other.pk, 'q': 'e', 'o': '2'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([party.name for party in response.context['cl'].result_list], ['Beta'])
+        content = response.content.decode()
+        # The select2 widget, its scripts, and the search and ordering kept in its form
+        self.assertIn('admin-autocomplete', content)
+        self.assertIn('admin/js/autocomplete.js', content)
+        self.assertIn('<input type="hidden" name="q" value="e">', content)
+        self.assertIn('<input type="hidden" name="o" value="2">', content)
+        self.assertIn(f'<option value="{self.other.pk}" selected>other</option>', content)
+
+    def test_autocomplete_search(self):
+        response = self.browser.get('/admin/autocomplete/', {
+            'app_label': 'inventory', 'model_name': 'party', 'field_name': 'user', 'term': 'oth'
+        })
+        self.assertEqual([result['text'] for result in response.json()['results']], ['other'])
+
+    def test_invalid_filter_value(self):
+        response = self.browser.get('/admin/inventory/party/', {'user__id__exact': 'abc'})
+        self.assertRedirects(response, '/admin/inventory/party/?e=1', fetch_redirect_response=False)
+
+    def test_input_filter_keeps_query_string(self):
+        response = self.browser.get('/admin/inventory/product/', {'company': 'Bex', 'q': 'napa', 'o': '-1'})
+        content = response.content.decode()
+        self.assertIn('<input type="hidden" name="q" value="napa">', content)
+        self.assertIn('<input type="hidden" name="o" value="-1">', content)
+        self.assertIn('<input type="text" name="company" value="Bex">', content)
+
+    def test_change_forms_use_autocomplete(self):
+        party = make_party(self.admin, 'Gamma')
+        response = self.browser.get(f'/admin/inventory/party/{party.pk}/change/')
+        self.assertContains(response, 'data-field-name="user"')
@@ -0,0 +1,69 @@
+# inventory/tests/test_aging.py
+from datetime import date, timedelta
+from decimal import Decimal
+
+from .utils import TenantTestCase, client_for, make_admin, make_party, make_sale, make_stock
+
+
+class AgingReportTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.as_of = date(2025, 6, 30)
+        self.stock = make_stock(self.admin, price='10.00')
+        self.beta = make_party(self.admin, 'Beta')
+        self.alpha = make_party(self.admin, 'Alpha')
+
+    def sale(self, party, quantity, age, **kwargs):
+        return make_sale(party, self.stock, quantity, self.as_of - timedelta(days=age), **kwargs)
+
+    def report(self, **params):
+        response = self.client.get('/api/me/reports/aging/', {'as_of': self.as_of.isoformat(), **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_dues_fall_into_buckets_by_age(self):
+        self.sale(self.alpha, 1, 0)
+        self.sale(self.alpha, 2, 30)
+        self.sale(self.alpha, 3, 31, paid='10')
+        self.sale(self.alpha, 4, 90)
+        self.sale(self.alpha, 5, 91)
+        self.sale(self.alpha, 6, 400, type='purchase')
+
+        alpha, = self.report()['parties']
+        self.assertEqual(alpha['party'], {'id': self.alpha.pk, 'name': 'Alpha'})
+        self.assertEqual(alpha['they_owe_us'], {
+            'days_0_30': '30.00', 'days_31_60': '20.00', 'days_61_90': '40.00', 'days_over_90': '50.00', 'total': '140.00'
+        })
+        self.assertEqual(alpha['we_owe_them']['days_over_90'], '60.00')
+        self.assertEqual(alpha['we_owe_them']['total'], '60.00')
+
+    def test_parties_are_ordered_by_name_and_totals_added_up(self):
+        self.sale(self.beta, 1, 10)
+        self.sale(self.alpha, 2, 45)
+        self.sale(self.alpha, 1, 5, type='purchase')
+
+        report = self.report()
+        self.assertEqual([row['party']['name'] for row in report['parties']], ['Alpha', 'Beta'])
+        self.assertEqual(report['totals']['they_owe_us']['days_0_30'], '10.00')
+        self.assertEqual(report['totals']['they_owe_us']['days_31_60'], '20.00')
+        self.assertEqual(report['totals']['they_owe_us']['total'], '30.00')
+        self.assertEqual(report['totals']['we_owe_them']['total'], '10.00')
+
+    def test_settled_future_and_other_tenants_transactions_are_left_out(self):
+        self.sale(self.alpha, 1, 5, paid='10')
+        self.sale(self.alpha, 1, -1)
+        other = make_admin('other')
+        make_sale(make_party(other), make_stock(other), 1, self.as_of)
+
+        report = self.report()
+        self.assertEqual(report['parties'][0]['they_owe_us']['total'], '0.00')
+        self.assertEqual(len(report['parties']), 1)
+        self.assertEqual(report['totals']['they_owe_us']['total'], '0.00')
+
+    def test_staff_see_their_admins_report(self):
+        self.sale(self.alpha, 1, 5)
+        response = client_for(self.staff).get('/api/me/reports/aging/', {'as_of': self.as_of.isoformat()})
+        self.assertEqual(Decimal(response.data['totals']['they_owe_us']['total']), Decimal('10.00'))
+
+    def test_as_of_must_be_a_date(self):
+        self.assertEqual(self.client.get('/api/me/reports/aging/', {'as_of': 'June'}).status_code, 400)
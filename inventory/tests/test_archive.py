@@ -0,0 +1,73 @@
+# inventory/tests/test_archive.py
+from datetime import date
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+
+from inventory.archive import archive_batch
+from inventory.models import ArchivedTransaction, ChangeLog, PartyCarryForward, Transaction
+
+from .utils import TenantTestCase, make_party, make_sale, make_stock
+
+
+class ArchiveTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.party = make_party(self.admin)
+        self.stock = make_stock(self.admin, price='10.00')
+        self.old = [
+            make_sale(self.party, self.stock, 1, date(2020, 1, 1), paid='10'),
+            make_sale(self.party, self.stock, 2, date(2020, 3, 1), paid='20', type='purchase'),
+        ]
+        self.open = make_sale(self.party, self.stock, 3, date(2020, 2, 1), paid='10')
+        self.recent = make_sale(self.party, self.stock, 4, date(2024, 1, 1), paid='40')
+
+    def summary(self):
+        response = self.client.get(f'/api/me/parties/{self.party.pk}/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['financial_summary']
+
+    def test_moves_completed_transactions_before_the_cutoff(self):
+        before = self.summary()
+        self.assertEqual(archive_batch(self.admin.pk, date(2021, 1, 1)), 2)
+
+        self.assertEqual(
+            set(Transaction.objects.values_list('id', flat=True)), {self.open.pk, self.recent.pk}
+        )
+        archived = ArchivedTransaction.objects.filter(user=self.admin).order_by('date_at')
+        self.assertEqual([row.pk for row in archived], [sale.pk for sale in self.old])
+        self.assertEqual([row.items.get().quantity for row in archived], [1, 2])
+
+        carry_forward = PartyCarryForward.objects.get(party=self.party)
+        self.assertEqual(carry_forward.transaction_count, 2)
+        self.assertEqual(carry_forward.archived_through, date(2020, 3, 1))
+        self.assertEqual((carry_forward.total_sales, carry_forward.total_purchases), (10, 20))
+        # The party's totals don't change, and sync clients see no deletes
+        self.assertEqual(self.summary(), before)
+        listed, = self.client.get('/api/me/parties/', {'expand': 'financial_summary'}).data
+        self.assertEqual(listed['financial_summary'], before)
+        self.assertFalse(ChangeLog.objects.filter(operation='delete').exists())
+
+    def test_batches_add_to_the_carry_forward(self):
+        self.assertEqual(archive_batch(self.admin.pk, date(2021, 1, 1), batch_size=1), 1)
+        self.assertEqual(archive_batch(self.admin.pk, date(2021, 1, 1), batch_size=1), 1)
+        self.assertEqual(archive_batch(self.admin.pk, date(2021, 1, 1), batch_size=1), 0)
+
+        carry_forward = PartyCarryForward.objects.get(party=self.party)
+        self.assertEqual(carry_forward.transaction_count, 2)
+        self.assertEqual(carry_forward.archived_through, date(2020, 3, 1))
+        self.assertEqual((carry_forward.total_sales, carry_forward.total_purchase_payments), (10, 20))
+        self.assertEqual(carry_forward.balance, 0)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('archive_transactions', before='2021-01-01', dry_run=True, stdout=out)
+        self.assertIn('Would archive 2 transactions', out.getvalue())
+        self.assertEqual(Transaction.objects.count(), 4)
+
+        call_command('archive_transactions', before='2025-01-01', tenants=[self.admin.pk], batch_size=1, stdout=out)
+        self.assertIn('Archived 3 transactions', out.getvalue())
+        self.assertEqual(list(Transaction.objects.values_list('id', flat=True)), [self.open.pk])
+
+        with self.assertRaises(CommandError):
+            call_command('archive_transactions', before='January', stdout=out)
@@ -0,0 +1,51 @@
+# inventory/tests/test_async_views.py
+import json
+
+from inventory.authentication import TenantRefreshToken
+
+from .utils import TenantTestCase, make_admin, make_party, make_stock
+
+
+def bearer(user):
+    return {'Authorization': f'Bearer {TenantRefreshToken.for_user(user).access_token}'}
+
+
+class AsyncViewTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.stock = make_stock(self.admin, quantity=5)
+        self.party = make_party(self.admin)
+        other = make_admin('other')
+        make_stock(other, medicine_name='Ace')
+        # Tokens are issued from the database, which async tests may not touch directly
+        self.admin_headers, self.staff_headers, self.other_headers = map(bearer, (self.admin, self.staff, other))
+
+    async def get(self, url, headers):
+        response = await self.async_client.get(url, headers=headers)
+        return response.status_code, json.loads(response.content)
+
+    async def test_stock_list_of_the_tenant(self):
+        status, data = await self.get('/api/async/stock/', self.staff_headers)
+        self.assertEqual(status, 200)
+        self.assertEqual([(row['id'], row['quantity']) for row in data], [(self.stock.pk, 5)])
+
+    async def test_party_detail_of_the_tenant_only(self):
+        status, data = await self.get(f'/api/async/parties/{self.party.pk}/', self.admin_headers)
+        self.assertEqual((status, data['name']), (200, 'Party'))
+        status, _ = await self.get(f'/api/async/parties/{self.party.pk}/', self.other_headers)
+        self.assertEqual(status, 404)
+
+    async def test_dashboard(self):
+        status, data = await self.get('/api/async/me/', self.admin_headers)
+        self.assertEqual(status, 200)
+        self.assertEqual(data['statistics'], {
+            'total_products': 2, 'total_parties': 1, 'total_transactions': 0, 'total_staff': 1
+        })
+
+    async def test_requires_a_token(self):
+        response = await self.async_client.get('/api/async/stock/')
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get('/api/async/stock/', headers={'Authorization': 'Bearer nonsense'})
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.post('/api/async/stock/', headers=self.admin_headers)
+        self.assertEqual(response.status_code, 405)
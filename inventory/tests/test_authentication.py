@@ -0,0 +1,44 @@
+# inventory/tests/test_authentication.py
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .utils import TenantTestCase, make_stock
+
+
+class TenantJWTAuthenticationTests(TenantTestCase):
+    def login(self, username):
+        response = APIClient().post('/api/token/', {'username': username, 'password': 'pw12345!'})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_tokens_carry_tenant_claims(self):
+        tokens = self.login('staff')
+        access = AccessToken(tokens['access'])
+        self.assertEqual((access['user_type'], access['admin_id'], access['is_premium']), ('staff', self.admin.pk, False))
+
+        refreshed = APIClient().post('/api/token/refresh/', {'refresh': tokens['refresh']}).data
+        self.assertEqual(AccessToken(refreshed['access'])['admin_id'], self.admin.pk)
+
+    def test_safe_requests_make_no_user_query(self):
+        stock = make_stock(self.admin)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.login('staff')['access']}")
+        with self.assertNumQueries(1):
+            response = client.get('/api/stock/')
+        self.assertEqual([row['id'] for row in response.data], [stock.pk])
+
+    def test_tokens_without_claims_load_the_user(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.staff).access_token}')
+        with self.assertNumQueries(2):
+            response = client.get('/api/stock/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_writes_check_the_user(self):
+        access = self.login('admin')['access']
+        self.admin.is_active = False
+        self.admin.save()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        response = client.post('/api/me/parties/', {'name': 'Acme'})
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,39 @@
+# inventory/tests/test_batch_get.py
+from django.test import override_settings
+
+from .utils import TenantTestCase, make_admin, make_party, make_stock
+
+
+class BatchGetTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.stocks = [make_stock(self.admin, medicine_name=name) for name in ('Napa', 'Ace', 'Fexo')]
+        self.parties = [make_party(self.admin, name) for name in ('Alpha', 'Beta')]
+        self.theirs = make_stock(make_admin('other'), medicine_name='Seclo')
+
+    def ids(self, url, ids, **params):
+        response = self.client.get(url, {'ids': ','.join(map(str, ids)), **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row['id'] for row in response.data]
+
+    def test_rows_come_back_in_the_requested_order(self):
+        napa, ace, fexo = self.stocks
+        with self.assertNumQueries(1):
+            self.assertEqual(self.ids('/api/stock/', [fexo.pk, napa.pk, fexo.pk]), [fexo.pk, napa.pk])
+        alpha, beta = self.parties
+        self.assertEqual(self.ids('/api/me/parties/', [beta.pk, alpha.pk]), [beta.pk, alpha.pk])
+        self.assertEqual(self.ids('/api/products/', [ace.product_id, napa.product_id]), [ace.product_id, napa.product_id])
+
+    def test_unknown_and_other_tenants_ids_are_left_out(self):
+        self.assertEqual(self.ids('/api/stock/', [self.theirs.pk, 999, self.stocks[1].pk]), [self.stocks[1].pk])
+
+    def test_expanded_rows(self):
+        napa, ace, _ = self.stocks
+        self.client.get('/api/stock/')
+        response = self.client.get('/api/stock/', {'ids': f'{ace.pk},{napa.pk}', 'expand': 'product'})
+        self.assertEqual([row['product']['medicine_name'] for row in response.data], ['Ace', 'Napa'])
+
+    @override_settings(BATCH_GET_MAX_IDS=2)
+    def test_invalid_ids(self):
+        self.assertEqual(self.client.get('/api/stock/', {'ids': '1,x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/stock/', {'ids': '1,2,3'}).status_code, 400)
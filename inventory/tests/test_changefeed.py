@@ -0,0 +1,110 @@
+# inventory/tests/test_changefeed.py
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from inventory.changefeed import latest_cursor
+from inventory.maintenance import prune_changelog
+from inventory.models import ChangeLog, Party
+
+from .utils import TenantTestCase, make_admin, make_party, make_sale, make_stock
+
+
+class ChangeFeedTests(TenantTestCase):
+    def sync(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        response = self.client.get('/api/sync/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def party_ids(self, feed):
+        return [party['id'] for party in feed['changes']['party']['upserts']]
+
+    def test_committed_writes_are_synced(self):
+        cursor = self.sync()['cursor']
+        with self.captureOnCommitCallbacks(execute=True):
+            party = make_party(self.admin)
+        feed = self.sync(cursor)
+        self.assertEqual(self.party_ids(feed), [party.pk])
+        self.assertEqual(self.sync(feed['cursor'])['changes']['party'], {'upserts': [], 'deletes': []})
+
+    def test_open_transaction_is_not_synced_yet(self):
+        cursor = self.sync()['cursor']
+        with self.captureOnCommitCallbacks() as callbacks:
+            party = make_party(self.admin)
+        # Written but not committed: no sequence yet, the cursor stays put
+        self.assertEqual(latest_cursor(), cursor)
+        self.assertEqual(self.party_ids(self.sync(cursor)), [])
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.party_ids(self.sync(cursor)), [party.pk])
+
+    def test_long_transaction_committing_late_is_not_skipped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_party(self.admin, 'First')
+        cursor = self.sync()['cursor']
+
+        # The long transaction takes its log id first...
+        placeholder = ChangeLog.objects.create(model='party', object_id=0)
+        late_id = placeholder.pk
+        placeholder.delete()
+        # ...then a short write commits and is synced
+        with self.captureOnCommitCallbacks(execute=True):
+            short = make_party(self.admin, 'Short')
+        feed = self.sync(cursor)
+        self.assertEqual(self.party_ids(feed), [short.pk])
+        self.assertGreater(ChangeLog.objects.get(object_id=short.pk, model='party').pk, late_id)
+
+        # ...and only now the long transaction commits, with the lower id
+        late = Party.objects.bulk_create([Party(user=self.admin, name='Late', email='l@example.com', phone='1', address='x')])[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            ChangeLog.objects.bulk_create([ChangeLog(id=late_id, tenant=self.admin, model='party', object_id=late.pk)])
+            transaction.on_commit(ChangeLog.objects.sequence_committed)
+        self.assertEqual(self.party_ids(self.sync(feed['cursor'])), [late.pk])
+
+    def test_other_tenants_changes_are_left_out(self):
+        other = make_admin('other')
+        cursor = self.sync()['cursor']
+        with self.captureOnCommitCallbacks(execute=True):
+            make_party(other)
+        self.assertEqual(self.party_ids(self.sync(cursor)), [])
+
+    def test_last_operation_on_an_object_wins(self):
+        cursor = self.sync()['cursor']
+        with self.captureOnCommitCallbacks(execute=True):
+            party = make_party(self.admin)
+            party_id = party.pk
+            party.delete()
+        changes = self.sync(cursor)['changes']['party']
+        self.assertEqual(changes, {'upserts': [], 'deletes': [party_id]})
+
+    def test_pages_with_has_more(self):
+        cursor = self.sync()['cursor']
+        with self.captureOnCommitCallbacks(execute=True):
+            parties = [make_party(self.admin, f'P{i}') for i in range(3)]
+        first = self.sync(cursor, limit=2)
+        self.assertTrue(first['has_more'])
+        second = self.sync(first['cursor'], limit=2)
+        self.assertFalse(second['has_more'])
+        self.assertEqual(self.party_ids(first) + self.party_ids(second), [party.pk for party in parties])
+
+    def test_pruned_cursor_is_gone(self):
+        cursor = self.sync()['cursor']
+        with self.captureOnCommitCallbacks(execute=True):
+            make_party(self.admin)
+        newest = self.sync(cursor)['cursor']
+        ChangeLog.objects.update(created_at=timezone.now() - timedelta(days=60))
+
+        self.assertEqual(prune_changelog(), 1)
+        self.assertEqual(self.client.get('/api/sync/', {'since': cursor}).status_code, 410)
+        self.sync(newest)
+
+    def test_transactions_are_synced_with_their_items(self):
+        cursor = self.sync()['cursor']
+        with self.captureOnCommitCallbacks(execute=True):
+            make_sale(make_party(self.admin), make_stock(self.admin), 2, timezone.localdate())
+        transaction, = self.sync(cursor)['changes']['transaction']['upserts']
+        self.assertEqual([item['quantity'] for item in transaction['items']], [2])
@@ -0,0 +1,81 @@
+# inventory/tests/test_draft_expiry.py
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from inventory import metrics
+from inventory.maintenance import purge_expired_drafts
+from inventory.models import DraftTransaction, DraftTransactionItem, Stock
+from inventory.reservations import reserve_draft
+
+from .utils import TenantTestCase, client_for, make_admin, make_party, make_stock
+
+
+@override_settings(DRAFT_EXPIRY_DAYS=30)
+class DraftExpiryTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+        self.party = make_party(self.admin)
+        self.stock = make_stock(self.admin, quantity=10)
+
+    def draft(self, age, user=None, party=None, stock=None):
+        draft = DraftTransaction.objects.create(
+            party=party or self.party, user=user or self.admin, type='sale', total_amount=0, due_amount=0
+        )
+        DraftTransactionItem.objects.create(draft_transaction=draft, stock=stock or self.stock, quantity=2, price=10, subtotal=0)
+        DraftTransaction.objects.filter(pk=draft.pk).update(updated_at=self.now - timedelta(days=age))
+        return draft
+
+    def test_purges_drafts_untouched_past_the_expiry(self):
+        expired = [self.draft(31), self.draft(45)]
+        reserve_draft(expired[0])
+        kept = self.draft(29)
+
+        self.assertEqual(purge_expired_drafts(batch_size=1, now=self.now), (2, 2))
+        self.assertEqual(list(DraftTransaction.objects.values_list('id', flat=True)), [kept.pk])
+        self.assertEqual(DraftTransactionItem.objects.count(), 1)
+        # Their reservations go with them
+        self.assertEqual(Stock.objects.get(pk=self.stock.pk).reserved_quantity, 0)
+
+        counters = metrics.snapshot()
+        self.assertEqual((counters['drafts_purged'], counters['draft_items_purged']), (2, 2))
+        self.assertEqual(counters['draft_cleanup_runs'], 1)
+        self.assertEqual(counters['draft_cleanup_last_run'], self.now.isoformat())
+
+    def test_admins_set_their_own_expiry(self):
+        self.admin.userprofile.draft_expiry_days = 7
+        self.admin.userprofile.save()
+        other = make_admin('other')
+        mine, theirs = self.draft(8), self.draft(8, other, make_party(other), make_stock(other))
+
+        purge_expired_drafts(now=self.now)
+        self.assertFalse(DraftTransaction.objects.filter(pk=mine.pk).exists())
+        self.assertTrue(DraftTransaction.objects.filter(pk=theirs.pk).exists())
+
+    def test_command(self):
+        self.draft(31)
+        out = StringIO()
+        call_command('purge_expired_drafts', stdout=out)
+        self.assertIn('Deleted 1 expired drafts and 1 draft items', out.getvalue())
+        self.assertFalse(DraftTransaction.objects.exists())
+
+    def test_setting_the_expiry(self):
+        response = self.client.patch('/api/me/', {'draft_expiry_days': 7}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['draft_expiry_days'], 7)
+        self.assertEqual(self.client.patch('/api/me/', {'draft_expiry_days': 0}, format='json').status_code, 400)
+        self.assertEqual(client_for(self.staff).patch('/api/me/', {'draft_expiry_days': 7}, format='json').status_code, 400)
+
+    def test_metrics_are_for_django_staff_only(self):
+        metrics.increment('drafts_purged', 3)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 302)
+
+        self.admin.is_staff = True
+        self.admin.save()
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get('/api/metrics/').json()['drafts_purged'], 3)
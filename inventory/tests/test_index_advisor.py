@@ -0,0 +1,36 @@
+# inventory/tests/test_index_advisor.py
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+
+from inventory.hot_queries import HOT_QUERIES
+from inventory.models import Party
+
+from .utils import TenantTestCase, make_party
+
+
+class IndexAdvisorTests(TenantTestCase):
+    def advise(self, *args):
+        out = StringIO()
+        call_command('index_advisor', *args, stdout=out)
+        return out.getvalue()
+
+    def test_hot_queries_use_indexes(self):
+        make_party(self.admin)
+        output = self.advise('--fail-on-scan', '--tenant', self.admin.pk)
+        self.assertEqual(output.count('\n'), len(HOT_QUERIES))
+        self.assertNotIn('FULL SCAN', output)
+
+    def test_flags_a_full_scan(self):
+        HOT_QUERIES['unindexed'] = (lambda tenant: Party.objects.filter(address='Dhaka'), False)
+        self.addCleanup(HOT_QUERIES.pop, 'unindexed')
+        output = self.advise('--query', 'unindexed')
+        self.assertIn('FULL SCAN  unindexed', output)
+        with self.assertRaisesMessage(CommandError, 'read a whole table: unindexed'):
+            self.advise('--query', 'unindexed', '--fail-on-scan')
+
+    def test_unknown_query_or_tenant(self):
+        with self.assertRaisesMessage(CommandError, 'Unknown queries: nope'):
+            self.advise('--query', 'nope')
+        with self.assertRaisesMessage(CommandError, 'User 999 does not exist'):
+            self.advise('--tenant', '999')
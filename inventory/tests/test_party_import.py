@@ -0,0 +1,64 @@
+# inventory/tests/test_party_import.py
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from inventory.models import ChangeLog, Party
+from inventory.views import PartyImportView
+
+from .utils import TenantTestCase, client_for, make_party, make_staff
+
+URL = '/api/parties/import/'
+
+
+def party_line(number):
+    return f'Party {number},p{number}@example.com,0171000000{number},Dhaka\n'.encode()
+
+
+class PartyImportTests(TenantTestCase):
+    def post(self, name, content):
+        return self.client.post(URL, {'file': SimpleUploadedFile(name, content)}, format='multipart')
+
+    def test_csv_skips_duplicates_and_invalid_rows(self):
+        make_party(self.admin, 'Known', phone='01710000001')
+        content = b'name,email,phone,address\n' + party_line(1) + party_line(2) + party_line(2) + b',bad,,\n'
+        response = self.post('parties.csv', content)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(
+            (response.data['created'], response.data['duplicates'], response.data['invalid']), (1, 2, 1)
+        )
+        self.assertEqual([error['row'] for error in response.data['errors']], [1, 3, 4])
+        created = Party.objects.get(name='Party 2')
+        self.assertTrue(ChangeLog.objects.filter(model='party', object_id=created.pk).exists())
+
+    def test_ndjson(self):
+        content = b'{"name": "A", "email": "a@example.com", "phone": "017", "address": "Dhaka"}\n\nnot json\n'
+        response = self.post('parties.ndjson', content)
+        self.assertEqual((response.data['created'], response.data['invalid']), (1, 1))
+        self.assertEqual(response.data['errors'][0]['row'], 2)
+
+    @mock.patch.object(PartyImportView, 'batch_size', 2)
+    def test_unreadable_line_reports_partial_import(self):
+        content = (
+            b'name,email,phone,address\n' + party_line(1) + party_line(2) + party_line(3)
+            + b'Bad \xff\xfe,x@example.com,017,Dhaka\n' + party_line(5)
+        )
+        response = self.post('parties.csv', content)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((response.data['created'], response.data['failed_row']), (3, 4))
+        self.assertIn('Row 4', response.data['error'])
+        self.assertEqual(Party.objects.filter(user=self.admin).count(), 3)
+
+    def test_missing_columns(self):
+        response = self.post('parties.csv', b'name,email\nA,a@example.com\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('phone', response.data['error'])
+        self.assertFalse(Party.objects.exists())
+
+    def test_staff_without_an_admin(self):
+        staff = make_staff(None, 'orphan')
+        response = client_for(staff).post(URL, {
+            'file': SimpleUploadedFile('parties.csv', b'name,email,phone,address\n' + party_line(1))
+        }, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Party.objects.exists())
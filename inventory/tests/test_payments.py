@@ -0,0 +1,64 @@
+# inventory/tests/test_payments.py
+from datetime import timedelta
+from decimal import Decimal
+
+from django.utils import timezone
+
+from inventory.models import Payment, PaymentAllocation, Transaction
+
+from .utils import TenantTestCase, client_for, make_admin, make_party, make_sale, make_stock
+
+
+class PaymentTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        today = timezone.localdate()
+        self.party = make_party(self.admin)
+        stock = make_stock(self.admin)
+        self.older = make_sale(self.party, stock, 5, today - timedelta(days=2))
+        self.newer = make_sale(self.party, stock, 10, today, paid='20.00')
+        self.purchase = make_sale(self.party, stock, 1, today, type='purchase')
+
+    def due(self, sale):
+        return Transaction.objects.values_list('due_amount', 'payment_status').get(pk=sale.pk)
+
+    def test_party_payment_settles_oldest_first(self):
+        response = self.client.post(
+            f'/api/me/parties/{self.party.pk}/payments/', {'type': 'received', 'amount': '150.00'}, format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['unallocated_amount'], '20.00')
+        self.assertEqual(self.due(self.older), (Decimal('0.00'), 'completed'))
+        self.assertEqual(self.due(self.newer), (Decimal('0.00'), 'completed'))
+        self.assertEqual(self.due(self.purchase), (Decimal('10.00'), 'pending'))
+        self.assertEqual(
+            sorted(PaymentAllocation.objects.values_list('transaction_id', 'amount')),
+            [(self.older.pk, Decimal('50.00')), (self.newer.pk, Decimal('80.00'))]
+        )
+
+    def test_complete_payment_partially(self):
+        response = client_for(self.staff).post(
+            f'/api/transactions/{self.newer.pk}/complete-payment/', {'additional_payment': '30.00'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.due(self.newer), (Decimal('50.00'), 'partial'))
+        self.assertEqual(self.due(self.older), (Decimal('50.00'), 'pending'))
+        payment = Payment.objects.get()
+        self.assertEqual((payment.type, payment.created_by), ('received', self.staff))
+
+    def test_complete_payment_rejects_overpayment(self):
+        url = f'/api/transactions/{self.older.pk}/complete-payment/'
+        for amount in ('50.01', '0', '-5', 'abc'):
+            response = self.client.post(url, {'additional_payment': amount}, format='json')
+            self.assertEqual(response.status_code, 400, amount)
+        self.assertFalse(Payment.objects.exists())
+
+        self.assertEqual(self.client.post(url, {'additional_payment': '50.00'}, format='json').status_code, 200)
+        response = self.client.post(url, {'additional_payment': '1.00'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_complete_payment_of_another_tenant(self):
+        other = client_for(make_admin('other'))
+        response = other.post(f'/api/transactions/{self.older.pk}/complete-payment/', {'additional_payment': '1'})
+        self.assertEqual(response.status_code, 404)
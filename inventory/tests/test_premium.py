@@ -0,0 +1,84 @@
+# inventory/tests/test_premium.py
+from django.contrib.auth.models import User
+from django.test import Client
+from rest_framework.test import APIClient
+
+from inventory.models import UserProfile
+
+from .utils import TenantTestCase, make_admin, make_staff
+
+
+class PremiumPropagationTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_staff = make_staff(self.admin, 'staff2')
+        self.other = make_admin('other', premium=True)
+
+    def premium(self, *users):
+        return [UserProfile.objects.get(user=user).is_premium for user in users]
+
+    def test_admin_save_updates_its_staff(self):
+        profile = UserProfile.objects.get(user=self.admin)
+        profile.is_premium = True
+        # The admin's UPDATE and one for all of the staff, in a savepoint
+        with self.assertNumQueries(4):
+            profile.save()
+        self.assertEqual(self.premium(self.staff, self.other_staff), [True, True])
+
+        with self.assertNumQueries(1):
+            profile.save()
+
+    def test_staff_take_their_admins_status_only_when_assigned(self):
+        profile = UserProfile.objects.get(user=self.staff)
+        with self.assertNumQueries(1):
+            profile.save()
+
+        profile.admin = self.other
+        profile.save()
+        self.assertEqual(self.premium(self.staff), [True])
+
+    def test_set_premium(self):
+        UserProfile.objects.filter(user__in=[self.admin, self.other]).set_premium(True)
+        self.assertEqual(self.premium(self.admin, self.staff, self.other_staff), [True, True, True])
+
+        UserProfile.objects.filter(user=self.other).set_premium(False)
+        self.assertEqual(self.premium(self.admin, self.staff, self.other), [True, True, False])
+
+    def test_admin_action(self):
+        browser = Client()
+        browser.force_login(User.objects.create_superuser('root', 'root@example.com', 'pw12345!'))
+        response = browser.post('/admin/inventory/userprofile/', {
+            'action': 'make_premium',
+            '_selected_action': [UserProfile.objects.get(user=self.admin).pk],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.premium(self.admin, self.staff, self.other_staff), [True, True, True])
+
+        # Staff rows are skipped, they keep their admin's status
+        response = browser.post('/admin/inventory/userprofile/', {
+            'action': 'remove_premium',
+            '_selected_action': [UserProfile.objects.get(user=self.staff).pk],
+        }, follow=True)
+        self.assertEqual(self.premium(self.admin, self.staff), [True, True])
+        self.assertIn('1 staff profile(s) skipped', response.content.decode())
+
+    def test_set_premium_leaves_staff_rows_out(self):
+        UserProfile.objects.filter(user__in=[self.staff, self.other_staff]).set_premium(True)
+        self.assertEqual(self.premium(self.admin, self.staff, self.other_staff), [False, False, False])
+
+    def test_registered_staff_take_their_admins_status(self):
+        client = APIClient()
+        response = client.post('/api/register/', {
+            'username': 'new', 'email': 'new@example.com', 'password': 'Str0ng-pass!', 'user_type': 'staff',
+            'admin_id': self.other.pk
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(self.premium(User.objects.get(username='new')), [True])
+
+    def test_registering_with_an_invalid_admin_leaves_no_user(self):
+        response = APIClient().post('/api/register/', {
+            'username': 'new', 'email': 'new@example.com', 'password': 'Str0ng-pass!', 'user_type': 'staff',
+            'admin_id': self.staff.pk
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(User.objects.filter(username='new').exists())
@@ -0,0 +1,93 @@
+# inventory/tests/test_product_upload.py
+from decimal import Decimal
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from inventory.models import Product, ProductQuerySet
+from inventory.views import ProductCSVUploadView
+
+from .utils import TenantTestCase
+
+URL = '/api/products/csv-upload/'
+HEADER = 'medicine_name,ml,price,unit_price,company,min_sale\n'
+
+
+def upload(*rows):
+    return SimpleUploadedFile('catalogue.csv', (HEADER + ''.join(f'{row}\n' for row in rows)).encode())
+
+
+class ProductCSVUploadTests(TenantTestCase):
+    def post(self, *rows):
+        return self.client.post(URL, {'file': upload(*rows)}, format='multipart')
+
+    def test_reupload_only_writes_changes(self):
+        response = self.post('Napa,,10.00,1.00,Beximco,1', 'Ace,5,8.00,0.80,Square,1')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['inserted'], len(response.data['products'])), (2, 2))
+
+        response = self.post('Napa,,12.00,1.20,Beximco,1', 'Ace,5,8.00,0.80,Square,1')
+        self.assertEqual((response.data['updated'], response.data['unchanged']), (1, 1))
+        self.assertEqual([product['medicine_name'] for product in response.data['products']], ['Napa'])
+        self.assertEqual(Product.objects.count(), 2)
+
+    @mock.patch.object(ProductCSVUploadView, 'batch_size', 2)
+    def test_batches_before_a_bad_row_stay_committed(self):
+        response = self.post(
+            'Napa,,10.00,1.00,Beximco,1', 'Ace,5,8.00,0.80,Square,1',
+            'Fexo,,abc,1.00,Square,1', 'Sergel,,5.00,0.50,Healthcare,1'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['inserted'], 2)
+        self.assertEqual(set(Product.objects.values_list('medicine_name', flat=True)), {'Napa', 'Ace'})
+
+
+class ProductCreateTests(TenantTestCase):
+    def test_a_duplicate_key_is_rejected(self):
+        product = {'medicine_name': 'Napa', 'price': '10.00', 'unit_price': '1.00', 'company': 'Beximco', 'min_sale': 1}
+        self.assertEqual(self.client.post('/api/products/', product, format='json').status_code, 201)
+        response = self.client.post('/api/products/', {**product, 'price': '12.00'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post('/api/products/bulk/', product, format='json').status_code, 400)
+        self.assertEqual(Product.objects.get().price, Decimal('10.00'))
+
+        # A list is still synced
+        response = self.client.post('/api/products/bulk/', [{**product, 'price': '12.00'}], format='json')
+        self.assertEqual((response.status_code, response.data['updated']), (201, 1))
+
+
+class SyncCatalogueTests(TenantTestCase):
+    def rows(self, *names, price='1.00'):
+        return [
+            {'medicine_name': name, 'ml': '', 'price': Decimal(price), 'unit_price': Decimal('1.00'),
+             'company': 'Acme', 'min_sale': 1}
+            for name in names
+        ]
+
+    def test_rows_a_concurrent_import_wrote_first_are_not_inserts(self):
+        lookup = ProductQuerySet.by_natural_key
+
+        def concurrent_import(queryset, names):
+            existing = lookup(queryset, names)
+            if not existing:
+                Product.objects.bulk_create(Product(**row) for row in self.rows('A', price='2.00') + self.rows('B'))
+            return existing
+
+        with mock.patch.object(ProductQuerySet, 'by_natural_key', concurrent_import):
+            products, counts = Product.objects.sync_catalogue(self.rows('A', 'B', 'C'))
+        self.assertEqual(counts, {'inserted': 1, 'updated': 1, 'unchanged': 1})
+        self.assertEqual(sorted(product.medicine_name for product in products), ['A', 'C'])
+        self.assertEqual(Product.objects.get(medicine_name='A').price, Decimal('1.00'))
+
+    @mock.patch('inventory.models.ProductQuerySet.lookup_batch_size', 2)
+    def test_lookup_is_chunked(self):
+        rows = self.rows(*'ABCDE')
+        Product.objects.sync_catalogue(rows)
+        rows[4] = {**rows[4], 'price': Decimal('2.00')}
+        with CaptureQueriesContext(connection) as queries:
+            _, counts = Product.objects.sync_catalogue(rows)
+        self.assertEqual(counts, {'inserted': 0, 'updated': 1, 'unchanged': 4})
+        lookups = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        self.assertEqual([sql.count("'", sql.index(' IN (')) // 2 for sql in lookups], [2, 2, 1])
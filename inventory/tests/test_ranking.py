@@ -0,0 +1,52 @@
+# inventory/tests/test_ranking.py
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+
+from inventory.maintenance import SALES_RANK_LOCK_KEY, rebuild_sales_ranks
+from inventory.models import ProductSalesDay, UserProfile
+
+from .utils import TenantTestCase, make_stock
+
+URL = '/api/me/reports/product-ranking/'
+
+
+class ProductRankingTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate()
+        self.yesterday = self.today - timedelta(days=1)
+        self.stock = make_stock(self.admin)
+        ProductSalesDay.objects.add(self.admin.pk, self.yesterday, {self.stock.product_id: (3, '30.00')}, self.yesterday)
+        rebuild_sales_ranks(self.yesterday)
+
+    def ranked_on(self):
+        return UserProfile.objects.get(user=self.admin).sales_ranked_on
+
+    def test_get_serves_last_ranks_without_rebuilding(self):
+        response = self.client.get(URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['as_of'], self.yesterday.isoformat())
+        self.assertEqual(response.data['top_sellers'][0]['quantity'], 3)
+        self.assertEqual(self.ranked_on(), self.yesterday)
+
+    def test_rebuild_rolls_over_to_today(self):
+        self.assertEqual(rebuild_sales_ranks(), 1)
+        self.assertEqual(rebuild_sales_ranks(), 0)
+        self.assertEqual(self.ranked_on(), self.today)
+        response = self.client.get(URL, {'window': 7})
+        self.assertEqual(response.data['as_of'], self.today.isoformat())
+
+    def test_rebuild_skipped_while_locked(self):
+        cache.add(SALES_RANK_LOCK_KEY, True)
+        self.assertIsNone(rebuild_sales_ranks())
+        with self.assertRaises(CommandError):
+            call_command('rebuild_sales_ranks', stdout=StringIO())
+        self.assertEqual(self.ranked_on(), self.yesterday)
+
+        cache.delete(SALES_RANK_LOCK_KEY)
+        call_command('rebuild_sales_ranks', stdout=StringIO())
+        self.assertEqual(self.ranked_on(), self.today)
@@ -0,0 +1,45 @@
+# inventory/tests/test_routers.py
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from inventory.models import Party
+from inventory.routers import PrimaryReplicaRouter, is_pinned, pin_to_primary, replica_reads
+
+from .utils import TenantTestCase
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'routers'}})
+@mock.patch('inventory.routers.get_replicas', return_value=['replica'])
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    router = PrimaryReplicaRouter()
+
+    def test_reads_use_the_replica_only_when_opted_in(self, get_replicas):
+        self.assertIsNone(self.router.db_for_read(Party))
+        with replica_reads(1):
+            self.assertEqual(self.router.db_for_read(Party), 'replica')
+            self.assertEqual(self.router.db_for_write(Party), 'default')
+        self.assertIsNone(self.router.db_for_read(Party))
+
+    def test_pinned_tenant_reads_the_primary(self, get_replicas):
+        pin_to_primary(2)
+        with replica_reads(2):
+            self.assertIsNone(self.router.db_for_read(Party))
+        with replica_reads(3):
+            self.assertEqual(self.router.db_for_read(Party), 'replica')
+
+
+class ReplicaReadMixinTests(TenantTestCase):
+    def test_successful_writes_pin_the_tenant(self):
+        self.client.get('/api/me/parties/')
+        self.assertFalse(is_pinned(self.admin.pk))
+
+        response = self.client.post('/api/me/parties/', {'name': 'Acme'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(is_pinned(self.admin.pk))
+
+        response = self.client.post(
+            '/api/me/parties/', {'name': 'Acme', 'email': 'a@example.com', 'phone': '017', 'address': 'Dhaka'}
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertTrue(is_pinned(self.admin.pk))
@@ -0,0 +1,40 @@
+# inventory/tests/test_single_flight.py
+from django.test import override_settings
+
+from inventory import singleflight
+from inventory.models import Party
+from inventory.routers import pin_to_primary
+
+from .utils import TenantTestCase, make_party
+
+URL = '/api/me/parties/'
+
+
+@override_settings(SINGLE_FLIGHT_TTL=60)
+class SharedPartyListTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        singleflight.forget(self.admin.pk)
+        self.addCleanup(singleflight.forget, self.admin.pk)
+        make_party(self.admin, 'Acme')
+
+    def names(self):
+        return [party['name'] for party in self.client.get(URL).data]
+
+    def test_identical_lists_share_a_result(self):
+        self.assertEqual(self.names(), ['Acme'])
+        # Written by another worker: this one keeps serving its result until the TTL
+        Party.objects.create(user=self.admin, name='Beta', email='b@example.com', phone='018', address='Dhaka')
+        self.assertEqual(self.names(), ['Acme'])
+
+    def test_pinned_tenant_reads_its_own_list(self):
+        self.assertEqual(self.names(), ['Acme'])
+        Party.objects.create(user=self.admin, name='Beta', email='b@example.com', phone='018', address='Dhaka')
+        pin_to_primary(self.admin.pk)
+        self.assertEqual(self.names(), ['Acme', 'Beta'])
+
+    def test_write_forgets_results_in_this_worker(self):
+        self.assertEqual(self.names(), ['Acme'])
+        response = self.client.post(URL, {'name': 'Beta', 'email': 'b@example.com', 'phone': '018', 'address': 'Dhaka'})
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(sorted(self.names()), ['Acme', 'Beta'])
@@ -0,0 +1,130 @@
+# inventory/tests/test_snapshot.py
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.db.models.signals import post_delete
+
+from inventory.archive import archive_batch
+from inventory.models import (
+    ArchivedTransaction, ChangeLog, DraftTransaction, Party, PartyBalanceCheckpoint, Payment, PaymentAllocation, Stock,
+    Transaction
+)
+from inventory.reports import balance_checkpoint
+from inventory.snapshot import IdMap, clear_tenant, dump_tenant, restore_tenant
+from inventory.summaries import build_financial_summary, party_financial_totals
+
+from .utils import TenantTestCase, make_admin, make_party, make_sale, make_stock
+
+
+def summary(party):
+    return build_financial_summary(party_financial_totals(Party.objects.select_related('carry_forward').get(pk=party.pk)))
+
+
+class SnapshotTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.party = make_party(self.admin)
+        self.stock = make_stock(self.admin, quantity=40)
+        # Paid in full long ago and archived, then an open sale paid in part
+        make_sale(self.party, self.stock, 10, date(2020, 1, 1), paid=Decimal('100.00'))
+        archive_batch(self.admin.pk, date(2021, 1, 1))
+        self.open_sale = make_sale(self.party, self.stock, 5, date(2026, 1, 1))
+        Payment.objects.allocate(self.party, 'received', Decimal('20.00'), self.admin)
+        DraftTransaction.objects.create(
+            party=self.party, user=self.admin, type='sale', total_amount=0, due_amount=0
+        )
+        handle, self.path = tempfile.mkstemp(suffix='.jsonl.gz')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def test_round_trip_keeps_balances(self):
+        before = summary(self.party)
+        self.assertEqual(before['total_sales'], Decimal('150.00'))
+
+        dump_tenant(self.admin.pk, self.path, chunk_size=1)
+        clone = make_admin('clone')
+        counts = restore_tenant(self.path, clone.pk)
+
+        self.assertEqual(counts['archived_transaction'], 1)
+        self.assertEqual(counts['payment'], 1)
+        self.assertEqual(counts['carry_forward'], 1)
+        party = Party.objects.get(user=clone)
+        self.assertEqual(summary(party), before)
+
+        archived = ArchivedTransaction.objects.get(user=clone)
+        self.assertEqual((archived.date_at, archived.items.get().quantity), (date(2020, 1, 1), 10))
+        self.assertFalse(Transaction.objects.filter(pk=archived.pk).exists())
+
+        sale = Transaction.objects.get(user=clone)
+        self.assertEqual((sale.date_at, sale.due_amount), (date(2026, 1, 1), Decimal('30.00')))
+        allocation = PaymentAllocation.objects.get(payment__user=clone)
+        self.assertEqual((allocation.transaction_id, allocation.amount), (sale.pk, Decimal('20.00')))
+        self.assertEqual(DraftTransaction.objects.filter(user=clone).count(), 1)
+
+    def test_restore_logs_changes_for_sync(self):
+        dump_tenant(self.admin.pk, self.path)
+        clone = make_admin('clone')
+        restore_tenant(self.path, clone.pk)
+
+        logged = set(ChangeLog.objects.filter(tenant=clone).values_list('model', 'object_id'))
+        self.assertEqual(logged, {
+            ('party', Party.objects.get(user=clone).pk),
+            ('stock', clone.stock_set.get().pk),
+            ('transaction', Transaction.objects.get(user=clone).pk),
+        })
+
+    def test_replace_deletes_then_upserts(self):
+        dump_tenant(self.admin.pk, self.path)
+        old_party = self.party.pk
+        restore_tenant(self.path, self.admin.pk, replace=True)
+
+        party = Party.objects.get(user=self.admin)
+        operations = list(
+            ChangeLog.objects.filter(tenant=self.admin, model='party', object_id__in=[old_party, party.pk])
+            .order_by('id').values_list('object_id', 'operation')
+        )
+        self.assertEqual(operations[-2:], [(old_party, ChangeLog.DELETE), (party.pk, ChangeLog.UPSERT)])
+        self.assertEqual(summary(party)['total_sales'], Decimal('150.00'))
+        self.assertEqual(ArchivedTransaction.objects.filter(user=self.admin).count(), 1)
+
+    def test_restore_into_tenant_with_data_fails(self):
+        dump_tenant(self.admin.pk, self.path)
+        with self.assertRaises(ValueError):
+            restore_tenant(self.path, self.admin.pk)
+
+    def test_clear_logs_deletes_without_row_signals(self):
+        balance_checkpoint(self.party, date(2026, 1, 31))
+        self.assertTrue(PartyBalanceCheckpoint.objects.exists())
+        ids = {
+            'party': [self.party.pk], 'stock': [self.stock.pk],
+            'transaction': list(Transaction.objects.filter(user=self.admin).values_list('pk', flat=True)),
+        }
+        receiver = mock.Mock()
+        post_delete.connect(receiver)
+        self.addCleanup(post_delete.disconnect, receiver)
+        clear_tenant(self.admin.pk, chunk_size=1)
+
+        receiver.assert_not_called()
+        self.assertFalse(PartyBalanceCheckpoint.objects.exists())
+        self.assertFalse(Stock.objects.filter(user=self.admin).exists())
+        deletes = ChangeLog.objects.filter(tenant=self.admin, operation=ChangeLog.DELETE)
+        for model, object_ids in ids.items():
+            self.assertEqual(sorted(deletes.filter(model=model).values_list('object_id', flat=True)), object_ids)
+
+    def test_id_map(self):
+        with mock.patch.object(IdMap, 'lookup_batch_size', 2):
+            ids = IdMap()
+            ids.add('party', [1, 2, 3], [11, 12, 13])
+            ids.add('stock', [1], [21])
+            self.assertEqual(ids.get('party', [3, 1, 2, 3]), {1: 11, 2: 12, 3: 13})
+            self.assertEqual(ids.get('stock', [1, 2]), {1: 21})
+            ids.drop()
+
+    def test_restores_drop_their_id_map(self):
+        dump_tenant(self.admin.pk, self.path)
+        for name in ('clone', 'second'):
+            restore_tenant(self.path, make_admin(name).pk)
+        self.assertEqual(Party.objects.filter(user__username='second').count(), 1)
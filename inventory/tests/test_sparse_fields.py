@@ -0,0 +1,51 @@
+# inventory/tests/test_sparse_fields.py
+from django.utils import timezone
+
+from .utils import TenantTestCase, make_party, make_sale, make_stock
+
+
+class SparseFieldsTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.party = make_party(self.admin)
+        self.stock = make_stock(self.admin)
+
+    def test_fields_limit_the_response(self):
+        response = self.client.get('/api/me/parties/', {'fields': 'id,name'})
+        self.assertEqual(response.data, [{'id': self.party.pk, 'name': 'Party'}])
+
+    def test_costly_fields_are_opt_in_on_selected_lists(self):
+        # Without a selection lists keep every field, in one query
+        with self.assertNumQueries(1):
+            row = self.client.get('/api/me/parties/').data[0]
+        self.assertEqual(row['financial_summary']['total_sales'], 0)
+        row = self.client.get('/api/me/parties/', {'fields': 'id,name,email'}).data[0]
+        self.assertEqual(set(row), {'id', 'name', 'email'})
+        row = self.client.get('/api/me/parties/', {'expand': 'financial_summary'}).data[0]
+        self.assertEqual(row['financial_summary']['total_sales'], 0)
+        detail = self.client.get(f'/api/me/parties/{self.party.pk}/', {'fields': 'id,name'}).data
+        self.assertEqual(set(detail), {'id', 'name'})
+
+    def test_transactions_keep_their_items(self):
+        make_sale(self.party, self.stock, 2, timezone.localdate())
+        self.assertEqual(len(self.client.get('/api/me/transactions/').data[0]['items']), 1)
+        self.assertNotIn('items', self.client.get('/api/me/transactions/', {'fields': 'id,total_amount'}).data[0])
+        self.assertNotIn('items', self.client.get('/api/me/transactions/', {'expand': 'party'}).data[0])
+        self.assertIn('items', self.client.get('/api/me/transactions/', {'fields': 'id,items'}).data[0])
+
+    def test_expand_replaces_an_id_with_the_object(self):
+        row = self.client.get('/api/stock/').data[0]
+        self.assertEqual(row['product'], self.stock.product_id)
+        with self.assertNumQueries(1):
+            row = self.client.get('/api/stock/', {'expand': 'product', 'fields': 'id,product'}).data[0]
+        self.assertEqual(row, {'id': self.stock.pk, 'product': {
+            'id': self.stock.product_id, 'medicine_name': 'Napa', 'ml': '', 'price': '10.00',
+            'unit_price': '10.00', 'company': 'Beximco', 'min_sale': 1,
+        }})
+
+    def test_writes_ignore_the_selection(self):
+        response = self.client.post('/api/me/parties/?fields=id', {
+            'name': 'Acme', 'email': 'a@example.com', 'phone': '017', 'address': 'Dhaka'
+        })
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertIn('email', response.data)
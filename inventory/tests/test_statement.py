@@ -0,0 +1,112 @@
+# inventory/tests/test_statement.py
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from inventory.archive import archive_batch
+from inventory.models import PartyBalanceCheckpoint, Payment, Transaction
+
+from .utils import TenantTestCase, make_party, make_sale, make_stock
+
+
+class PartyStatementTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate()
+        self.party = make_party(self.admin)
+        self.stock = make_stock(self.admin)
+        self.url = f'/api/me/parties/{self.party.pk}/statement/'
+
+    def entries(self, **params):
+        rows, params = [], {'page_size': 2, **params}
+        response = self.client.get(self.url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            rows += response.data['results']
+            if not response.data['next']:
+                return rows
+            response = self.client.get(response.data['next'])
+
+    def summary(self, rows):
+        return [(row['entry'], row['date'], row['amount'], row['balance']) for row in rows]
+
+    def test_payments_are_dated_entries(self):
+        make_sale(self.party, self.stock, 10, self.today - timedelta(days=5))
+        make_sale(self.party, self.stock, 4, self.today - timedelta(days=3), paid='10.00', type='purchase')
+        before = self.summary(self.entries())
+        Payment.objects.allocate(self.party, 'received', Decimal('60.00'), self.admin)
+        make_sale(self.party, self.stock, 2, self.today)
+
+        rows = self.entries()
+        # Earlier balances stay as they were, the payment follows the same day's sale
+        self.assertEqual(self.summary(rows[:2]), before)
+        self.assertEqual(self.summary(rows), [
+            ('transaction', str(self.today - timedelta(days=5)), '100.00', '100.00'),
+            ('transaction', str(self.today - timedelta(days=3)), '-30.00', '70.00'),
+            ('transaction', str(self.today), '20.00', '90.00'),
+            ('payment', str(self.today), '-60.00', '30.00'),
+        ])
+        self.assertEqual((rows[0]['payment_in'], rows[3]['type'], rows[3]['payment_status']), ('0.00', 'received', None))
+
+    def test_opening_balance_counts_earlier_payments(self):
+        make_sale(self.party, self.stock, 10, self.today - timedelta(days=5))
+        Payment.objects.allocate(self.party, 'received', Decimal('25.00'), self.admin)
+        make_sale(self.party, self.stock, 1, self.today + timedelta(days=1))
+
+        response = self.client.get(self.url, {'start': str(self.today + timedelta(days=1))})
+        self.assertEqual(response.data['opening_balance'], '75.00')
+        self.assertEqual(response.data['closing_balance'], '85.00')
+
+    def test_archived_invoices_paid_later(self):
+        old = make_sale(self.party, self.stock, 10, date(2020, 1, 1))
+        Payment.objects.allocate(self.party, 'received', Decimal('100.00'), self.admin, transactions=[old.pk])
+        make_sale(self.party, self.stock, 3, self.today - timedelta(days=1))
+        archive_batch(self.admin.pk, date(2021, 1, 1))
+
+        everything = self.entries()
+        self.assertEqual(self.summary(everything)[0], ('transaction', '2020-01-01', '100.00', '100.00'))
+        self.assertEqual(everything[-1]['balance'], '30.00')
+
+        # Starting after the archive uses the carry-forward, the payment recorded today stays on its day
+        response = self.client.get(self.url, {'start': str(self.today - timedelta(days=1))})
+        self.assertEqual(response.data['opening_balance'], '100.00')
+        self.assertEqual(response.data['closing_balance'], '30.00')
+
+    def test_cursor_of_another_party_is_rejected(self):
+        for day in range(3):
+            make_sale(self.party, self.stock, 1, self.today - timedelta(days=day))
+        cursor = self.client.get(self.url, {'page_size': 1}).data['next'].split('cursor=')[1]
+        other = make_party(self.admin, 'Other')
+        response = self.client.get(f'/api/me/parties/{other.pk}/statement/', {'cursor': cursor})
+        self.assertEqual(response.status_code, 400)
+
+    def test_running_balance_is_a_window_sum(self):
+        make_sale(self.party, self.stock, 1, self.today)
+        with CaptureQueriesContext(connection) as queries:
+            self.entries()
+        self.assertTrue(any(' OVER ' in query['sql'] for query in queries.captured_queries))
+
+    def test_opening_balance_starts_from_a_checkpoint(self):
+        month_start = self.today.replace(day=1)
+        old = make_sale(self.party, self.stock, 10, month_start - timedelta(days=40))
+        make_sale(self.party, self.stock, 1, month_start - timedelta(days=1))
+
+        response = self.client.get(self.url, {'start': str(self.today + timedelta(days=1))})
+        self.assertEqual(response.data['opening_balance'], '110.00')
+        checkpoint = PartyBalanceCheckpoint.objects.get(party=self.party)
+        self.assertEqual((checkpoint.through, checkpoint.balance), (month_start - timedelta(days=1), Decimal('110.00')))
+
+        # Later statements don't read the entries the checkpoint covers
+        Transaction.objects.filter(pk=old.pk).update(total_amount=Decimal('0.00'))
+        response = self.client.get(self.url, {'start': str(self.today + timedelta(days=1))})
+        self.assertEqual(response.data['opening_balance'], '110.00')
+
+        # Changing an entry on or before a checkpoint drops it
+        old.total_amount = Decimal('50.00')
+        old.save()
+        self.assertFalse(PartyBalanceCheckpoint.objects.exists())
+        response = self.client.get(self.url, {'start': str(self.today + timedelta(days=1))})
+        self.assertEqual(response.data['opening_balance'], '60.00')
@@ -0,0 +1,129 @@
+# inventory/tests/test_stock.py
+from inventory.models import ChangeLog, DraftTransaction, DraftTransactionItem, Stock, Transaction
+from inventory.reservations import InsufficientStock, consume_draft, reserve_draft
+
+from .utils import TenantTestCase, client_for, make_admin, make_party, make_stock
+
+
+class SaleStockTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.party = make_party(self.admin)
+        self.stock = make_stock(self.admin, quantity=10)
+
+    def sell(self, quantity, type='sale'):
+        return self.client.post('/api/transactions/', {
+            'party': self.party.pk, 'type': type, 'payment_in': '0.00', 'total_amount': '0.00',
+            'due_amount': '0.00', 'payment_status': 'pending',
+            'items': [{'stock': self.stock.pk, 'quantity': quantity}],
+        }, format='json')
+
+    def reserve(self, quantity):
+        draft = DraftTransaction.objects.create(party=self.party, user=self.admin, type='sale', total_amount=0, due_amount=0)
+        DraftTransactionItem.objects.create(draft_transaction=draft, stock=self.stock, quantity=quantity, price=10, subtotal=0)
+        reserve_draft(draft)
+
+    def quantities(self):
+        return Stock.objects.values_list('quantity', 'reserved_quantity').get(pk=self.stock.pk)
+
+    def test_sale_takes_available_stock(self):
+        response = self.sell(4)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(self.quantities(), (6, 0))
+        self.assertEqual(self.sell(2, type='purchase').status_code, 201)
+        self.assertEqual(self.quantities(), (8, 0))
+
+    def test_sale_cannot_take_reserved_stock(self):
+        self.reserve(7)
+        response = self.sell(4)
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('Only 3 of Napa available', response.data['error'])
+        self.assertEqual(self.quantities(), (10, 7))
+        self.assertFalse(Transaction.objects.exists())
+
+        self.assertEqual(self.sell(3).status_code, 201)
+        self.assertEqual(self.quantities(), (7, 7))
+
+    def test_editing_a_sale_beyond_the_stock(self):
+        sale = self.sell(4).data
+        response = self.client.patch(f'/api/transactions/{sale["id"]}/', {
+            'party': self.party.pk, 'items': [{'stock': self.stock.pk, 'quantity': 11}]
+        }, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.quantities(), (6, 0))
+
+    def test_drafts_cannot_reserve_another_tenants_stock(self):
+        other = make_admin('other')
+        client = client_for(other)
+        draft = {'party': make_party(other).pk, 'type': 'sale', 'items': [{'stock': self.stock.pk, 'quantity': 10}]}
+        response = client.post('/api/draft-transactions/', draft, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.data)
+
+        own = make_stock(other, medicine_name='Ace')
+        response = client.post('/api/draft-transactions/', {**draft, 'party': self.party.pk, 'items': [
+            {'stock': own.pk, 'quantity': 1}
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('party', response.data)
+
+        draft_id = client.post('/api/draft-transactions/', {**draft, 'items': [{'stock': own.pk, 'quantity': 1}]}, format='json').data['id']
+        response = client.patch(f'/api/draft-transactions/{draft_id}/', {'items': [{'stock': self.stock.pk, 'quantity': 10}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.quantities(), (10, 0))
+
+    def test_reservations_stay_within_the_drafts_tenant(self):
+        other = make_admin('other')
+        draft = DraftTransaction.objects.create(party=make_party(other), user=other, type='sale', total_amount=0, due_amount=0)
+        DraftTransactionItem.objects.create(draft_transaction=draft, stock=self.stock, quantity=1, price=10, subtotal=0)
+        with self.assertRaises(InsufficientStock):
+            reserve_draft(draft)
+        with self.assertRaises(InsufficientStock):
+            consume_draft(draft)
+        self.assertEqual(self.quantities(), (10, 0))
+
+
+class StockTakeTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.napa = make_stock(self.admin, quantity=10)
+        self.ace = make_stock(self.admin, quantity=4, medicine_name='Ace')
+        self.fexo = make_stock(make_admin('other'), quantity=0, medicine_name='Fexo').product
+
+    def take(self, *items):
+        return client_for(self.staff).post('/api/stock/bulk/', {'items': list(items)}, format='json')
+
+    def test_counts_and_deltas(self):
+        response = self.take(
+            {'product': self.napa.product_id, 'quantity': 7},
+            {'product': self.ace.product_id, 'delta': -9},
+            {'product': self.fexo.pk, 'quantity': 3},
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['unchanged']), (1, 2, 0))
+        variances = {row['product']: (row['previous_quantity'], row['quantity']) for row in response.data['variances']}
+        # Deltas stop at zero
+        self.assertEqual(variances, {self.napa.product_id: (10, 7), self.ace.product_id: (4, 0), self.fexo.pk: (0, 3)})
+        self.assertEqual(Stock.objects.get(user=self.admin, product=self.fexo).quantity, 3)
+        self.assertEqual(
+            set(ChangeLog.objects.filter(tenant=self.admin, model='stock').values_list('object_id', flat=True)),
+            set(Stock.objects.filter(user=self.admin).values_list('pk', flat=True))
+        )
+
+    def test_unchanged_rows_are_not_written(self):
+        response = self.take({'product': self.napa.product_id, 'quantity': 10}, {'product': self.ace.product_id, 'delta': 0})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['unchanged'], 2)
+        self.assertEqual(response.data['variances'], [])
+
+    def test_invalid_items(self):
+        for items in (
+            [{'product': self.napa.product_id}],
+            [{'product': self.napa.product_id, 'quantity': 1, 'delta': 1}],
+            [{'product': self.napa.product_id, 'quantity': -1}],
+            [{'product': self.napa.product_id, 'quantity': 1}, {'product': self.napa.product_id, 'delta': 1}],
+            [{'product': 999, 'quantity': 1}],
+            [],
+        ):
+            self.assertEqual(self.take(*items).status_code, 400, items)
+        self.assertEqual(Stock.objects.get(pk=self.napa.pk).quantity, 10)
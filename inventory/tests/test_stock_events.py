@@ -0,0 +1,89 @@
+# inventory/tests/test_stock_events.py
+import asyncio
+import json
+
+from django.test import override_settings
+
+from inventory import events
+from inventory.async_views import event_stream
+from inventory.models import Stock
+
+from .test_async_views import bearer
+from .utils import TenantTestCase, client_for, make_admin, make_stock
+
+
+class StockEventTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.stock = make_stock(self.admin, quantity=5)
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def await_(self, awaitable, timeout=1):
+        return self.loop.run_until_complete(asyncio.wait_for(awaitable, timeout))
+
+    def subscribe(self, tenant):
+        async def subscribe():
+            return events.hub.subscribe(tenant.pk)
+        subscription = self.await_(subscribe())
+        self.addCleanup(events.hub.unsubscribe, subscription)
+        return subscription
+
+    def test_committed_stock_writes_reach_the_tenants_streams(self):
+        mine, theirs = self.subscribe(self.admin), self.subscribe(make_admin('other'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Stock.objects.filter(pk=self.stock.pk).stock_take(self.admin.pk, {self.stock.product_id: ('adjust', -2)})
+
+        name, data = self.await_(mine.queue.get())
+        self.assertEqual(name, 'stock')
+        self.assertEqual(json.loads(data), [{
+            'id': self.stock.pk, 'product': self.stock.product_id, 'quantity': 3, 'reserved_quantity': 0, 'available': 3
+        }])
+        self.assertTrue(theirs.queue.empty())
+
+    def test_no_event_before_the_commit(self):
+        subscription = self.subscribe(self.admin)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Stock.objects.filter(pk=self.stock.pk).stock_take(self.admin.pk, {self.stock.product_id: ('adjust', -2)})
+        self.await_(asyncio.sleep(0))
+        self.assertTrue(subscription.queue.empty())
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.await_(subscription.queue.get())[0], 'stock')
+
+    @override_settings(STOCK_EVENTS_QUEUE_SIZE=2)
+    def test_a_stalled_stream_is_told_to_resync(self):
+        subscription = self.subscribe(self.admin)
+        for quantity in range(3):
+            events.hub.dispatch(self.admin.pk, ('stock', b'[]'))
+        self.await_(asyncio.sleep(0))
+        self.assertEqual(self.await_(subscription.queue.get()), events.RESYNC)
+        self.assertTrue(subscription.queue.empty())
+
+    @override_settings(STOCK_EVENTS_KEEPALIVE=0.01)
+    def test_event_stream(self):
+        stream = event_stream(self.admin.pk)
+        self.assertEqual(self.await_(stream.__anext__()), b'retry: 5000\n\n')
+        self.assertEqual(self.await_(stream.__anext__()), b': keepalive\n\n')
+        events.hub.dispatch(self.admin.pk, ('stock', b'[1]'))
+        self.assertEqual(self.await_(stream.__anext__()), b'event: stock\ndata: [1]\n\n')
+
+        self.await_(stream.aclose())
+        self.assertFalse(events.hub.has_subscribers(self.admin.pk))
+
+    def test_endpoint(self):
+        async def get(**headers):
+            response = await self.async_client.get('/api/stock/events/', headers=headers)
+            if response.streaming:
+                await response.streaming_content.aclose()
+            return response
+
+        headers = bearer(self.staff)
+        response = self.await_(get(**headers))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['X-Accel-Buffering'], 'no')
+        self.assertEqual(self.await_(get()).status_code, 401)
+        # Served over WSGI the stream would never end
+        self.assertEqual(client_for(self.staff).get('/api/stock/events/').status_code, 501)
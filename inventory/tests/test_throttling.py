@@ -0,0 +1,71 @@
+# inventory/tests/test_throttling.py
+from django.test import SimpleTestCase, override_settings
+
+from inventory import metrics
+from inventory.throttling import LocalTokenBuckets, parse_rate, refill
+
+from .test_async_views import bearer
+from .utils import TenantTestCase, client_for, make_admin
+
+RATES = {
+    'standard': {'read': '2/min', 'write': '1/min', 'bulk': '1/min'},
+    'premium': {'read': '4/min', 'write': '1/min', 'bulk': '1/min'},
+}
+
+
+class TokenBucketTests(SimpleTestCase):
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('120/min'), (120, 60))
+        self.assertEqual(parse_rate('5/s'), (5, 1))
+
+    def test_refill(self):
+        self.assertEqual(refill(None, 1, 10, 100), 10)
+        self.assertEqual(refill((2, 100), 0.5, 10, 104), 4)
+        self.assertEqual(refill((2, 100), 0.5, 10, 200), 10)
+
+    def test_local_buckets(self):
+        buckets = LocalTokenBuckets()
+        self.assertEqual(buckets.take('a', 0.001, 1), 0)
+        self.assertGreater(buckets.take('a', 0.001, 1), 900)
+        self.assertEqual(buckets.take('b', 0.001, 1), 0)
+
+
+@override_settings(TENANT_THROTTLE_RATES=RATES)
+class TenantThrottleTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.headers = bearer(self.admin)
+
+    def test_staff_share_their_admins_read_budget(self):
+        staff = client_for(self.staff)
+        self.assertEqual(self.client.get('/api/stock/').status_code, 200)
+        self.assertEqual(staff.get('/api/stock/').status_code, 200)
+
+        response = staff.get('/api/stock/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(int(response['Retry-After']), 30)
+        self.assertEqual(metrics.snapshot()['requests_throttled'], 1)
+        # Another tenant has its own
+        self.assertEqual(client_for(make_admin('other')).get('/api/stock/').status_code, 200)
+
+    def test_scopes_have_separate_budgets(self):
+        for _ in range(2):
+            self.client.get('/api/stock/')
+        self.assertEqual(self.client.get('/api/stock/').status_code, 429)
+        self.assertEqual(self.client.post('/api/stock/bulk/', {'items': []}, format='json').status_code, 400)
+        self.assertEqual(self.client.post('/api/stock/bulk/', {'items': []}, format='json').status_code, 429)
+        self.assertEqual(self.client.post('/api/me/parties/', {}, format='json').status_code, 400)
+
+    def test_premium_tenants_get_the_premium_rates(self):
+        client = client_for(make_admin('premium', premium=True))
+        self.assertEqual([client.get('/api/stock/').status_code for _ in range(5)], [200] * 4 + [429])
+
+    async def test_async_reads_take_from_the_read_budget(self):
+        statuses = [(await self.async_client.get('/api/async/stock/', headers=self.headers)).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+
+
+@override_settings(TENANT_THROTTLE_RATES=RATES, TENANT_THROTTLE_CACHE=None)
+class LocalBucketThrottleTests(TenantTestCase):
+    def test_buckets_in_process_memory(self):
+        self.assertEqual([self.client.get('/api/stock/').status_code for _ in range(3)], [200, 200, 429])
@@ -0,0 +1,80 @@
+# inventory/tests/test_transaction_filters.py
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.utils import timezone
+
+from inventory.hot_queries import HOT_QUERIES
+
+from .utils import TenantTestCase, client_for, make_party, make_sale, make_stock
+
+URL = '/api/transactions/'
+
+
+class TransactionFilterTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        today = timezone.localdate()
+        self.party, self.other = make_party(self.admin), make_party(self.admin, 'Other')
+        stock = make_stock(self.admin)
+        self.old = make_sale(self.party, stock, 1, today - timedelta(days=40))
+        self.paid = make_sale(self.party, stock, 2, today - timedelta(days=5), paid='20.00')
+        self.purchase = make_sale(self.other, stock, 3, today, type='purchase')
+        self.staff_sale = make_sale(self.other, stock, 4, today - timedelta(days=1))
+        self.staff_sale.created_by = self.staff
+        self.staff_sale.save(update_fields=['created_by'])
+        self.today = today
+
+    def ids(self, **params):
+        response = self.client.get(URL, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row['id'] for row in response.data]
+
+    def test_filters(self):
+        self.assertEqual(
+            set(self.ids(start=str(self.today - timedelta(days=7)))),
+            {self.paid.pk, self.purchase.pk, self.staff_sale.pk}
+        )
+        self.assertEqual(set(self.ids(end=str(self.today - timedelta(days=7)))), {self.old.pk})
+        self.assertEqual(set(self.ids(party=self.party.pk)), {self.old.pk, self.paid.pk})
+        self.assertEqual(self.ids(type='purchase'), [self.purchase.pk])
+        self.assertEqual(self.ids(payment_status='completed'), [self.paid.pk])
+        self.assertEqual(self.ids(created_by=self.staff.pk), [self.staff_sale.pk])
+        self.assertEqual(self.ids(type='sale', payment_status='pending', party=self.party.pk), [self.old.pk])
+
+    def test_ordering(self):
+        self.assertEqual(self.ids(ordering='-date_at'), [self.purchase.pk, self.staff_sale.pk, self.paid.pk, self.old.pk])
+        self.assertEqual(self.ids(ordering='id'), sorted(self.ids()))
+
+    def test_invalid_values_are_rejected(self):
+        for params in (
+            {'start': '05/01/2026'}, {'party': 'abc'}, {'type': 'refund'},
+            {'payment_status': 'late'}, {'ordering': 'total_amount'}, {'ordering': '-due_amount'},
+        ):
+            self.assertEqual(self.client.get(URL, params).status_code, 400, params)
+
+    def test_staff_see_their_admins_transactions(self):
+        response = client_for(self.staff).get(URL, {'created_by': self.staff.pk})
+        self.assertEqual([row['id'] for row in response.data], [self.staff_sale.pk])
+
+    def test_filtered_list_queries(self):
+        params = {'party': self.other.pk, 'start': str(self.today - timedelta(days=7))}
+        # The list and one prefetch of all of its items
+        with self.assertNumQueries(2):
+            response = self.client.get(URL, params)
+        self.assertEqual(len(response.data), 2)
+        with self.assertNumQueries(1):
+            response = self.client.get(URL, {**params, 'fields': 'id,total_amount'})
+        self.assertEqual(len(response.data), 2)
+
+
+class TransactionFilterPlanTests(TenantTestCase):
+    def test_filters_use_indexes(self):
+        make_party(self.admin)
+        names = [name for name in HOT_QUERIES if name.startswith('transaction-filter-')]
+        self.assertGreaterEqual(len(names), 6)
+        out = StringIO()
+        arguments = [arg for name in names for arg in ('--query', name)]
+        call_command('index_advisor', '--fail-on-scan', '--tenant', self.admin.pk, *arguments, stdout=out)
+        self.assertNotIn('SORT', out.getvalue())
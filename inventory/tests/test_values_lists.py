@@ -0,0 +1,59 @@
+# inventory/tests/test_values_lists.py
+import datetime
+from decimal import Decimal
+
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from inventory.models import Party, Product, Stock, Transaction
+from inventory.renderers import FastJSONRenderer
+from inventory.serializers import (
+    PartySerializer, ProductSerializer, StockSerializer, TransactionSerializer, values_plan, values_representation
+)
+
+from .utils import TenantTestCase, make_party, make_sale, make_stock
+
+
+class ValuesListTests(TenantTestCase):
+    def setUp(self):
+        super().setUp()
+        self.stocks = [make_stock(self.admin, medicine_name=name) for name in ('Napa', 'Ace', 'Fexo')]
+        party = make_party(self.admin)
+        for stock in self.stocks:
+            make_sale(party, stock, 2, datetime.date(2026, 1, 1), paid='5.00')
+
+    def assert_same_as_serializer(self, serializer_class, queryset):
+        serializer = serializer_class(queryset, many=True)
+        plan = values_plan(serializer.child)
+        self.assertIsNotNone(plan)
+        self.assertEqual(values_representation(queryset, plan), serializer.data)
+
+    def test_rows_match_the_serializer(self):
+        self.assert_same_as_serializer(StockSerializer, Stock.objects.order_by('id'))
+        self.assert_same_as_serializer(ProductSerializer, Product.objects.order_by('id'))
+
+    def test_list_is_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/stock/')
+        self.assertEqual(len(response.data), 3)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_nested_fields_fall_back_to_the_serializer(self):
+        # Transaction items are a nested serializer, the financial summary a computed field
+        self.assertIsNone(values_plan(TransactionSerializer(Transaction.objects.all(), many=True).child))
+        self.assertIsNone(values_plan(PartySerializer(Party.objects.all(), many=True).child))
+        response = self.client.get('/api/stock/', {'expand': 'product'})
+        self.assertEqual(response.data[0]['product']['medicine_name'], 'Napa')
+
+
+class FastJSONRendererTests(TenantTestCase):
+    def test_output_matches_json_renderer(self):
+        data = {
+            'amount': Decimal('10.50'),
+            'at': datetime.datetime(2026, 1, 1, 12, 30, tzinfo=datetime.timezone.utc),
+            'day': datetime.date(2026, 1, 1),
+            'label': gettext_lazy('Sale'),
+            'note': 'line break',
+            'items': [1, None, True],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
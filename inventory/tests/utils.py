@@ -0,0 +1,70 @@
+# inventory/tests/utils.py
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from inventory.authentication import TenantRefreshToken
+from inventory.models import Party, Product, Stock, Transaction, TransactionItem, UserProfile
+
+
+def make_admin(username='admin', premium=False):
+    user = User.objects.create_user(username, password='pw12345!')
+    UserProfile.objects.create(user=user, user_type='admin', is_premium=premium)
+    return user
+
+
+def make_staff(admin, username='staff'):
+    user = User.objects.create_user(username, password='pw12345!')
+    UserProfile.objects.create(user=user, user_type='staff', admin=admin)
+    return user
+
+
+def make_party(tenant, name='Party', **fields):
+    fields = {'email': f'{name.lower()}@example.com', 'phone': '01700000000', 'address': 'Dhaka', **fields}
+    return Party.objects.create(user=tenant, name=name, **fields)
+
+
+def make_stock(tenant, quantity=100, medicine_name='Napa', price='10.00', **fields):
+    product, _ = Product.objects.get_or_create(
+        medicine_name=medicine_name, ml=fields.pop('ml', ''), company=fields.pop('company', 'Beximco'),
+        defaults={'price': Decimal(price), 'unit_price': Decimal(price), 'min_sale': 1}
+    )
+    return Stock.objects.create(product=product, user=tenant, quantity=quantity, **fields)
+
+
+def make_sale(party, stock, quantity, day, paid=Decimal('0'), type='sale'):
+    """A transaction of ``party`` dated ``day`` with one item, written past the serializer's stock handling"""
+    total = stock.product.price * quantity
+    paid = Decimal(paid)
+    sale = Transaction.objects.create(
+        party=party, user=party.user, created_by=party.user, type=type, total_amount=total, payment_in=paid,
+        due_amount=total - paid, payment_status='completed' if paid == total else 'partial' if paid else 'pending'
+    )
+    Transaction.objects.filter(pk=sale.pk).update(date_at=day)
+    TransactionItem.objects.create(transaction=sale, stock=stock, quantity=quantity, price=stock.product.price)
+    sale.date_at = day
+    return sale
+
+
+def client_for(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {TenantRefreshToken.for_user(user).access_token}')
+    return client
+
+
+@override_settings(SINGLE_FLIGHT_TTL=0, TENANT_THROTTLE_CACHE='default', PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class TenantTestCase(TestCase):
+    """
+    An admin with a staff member. Ids repeat between tests, so the cache
+    (throttle buckets, replica pins, metrics) starts empty and computed
+    results are not shared past their computation.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.admin = make_admin()
+        self.staff = make_staff(self.admin)
+        self.client = client_for(self.admin)
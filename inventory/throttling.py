@@ -0,0 +1,135 @@
+# inventory/throttling.py
+"""
+Per-tenant token buckets: every request of an admin or their staff takes a
+token from the tenant's bucket for its scope (read, write or bulk), refilled
+at the rate of the tenant's tier in TENANT_THROTTLE_RATES.
+
+Buckets live in process memory, so each worker enforces the limits on its
+own. Set TENANT_THROTTLE_CACHE to a cache alias to share them between the
+workers instead, at the cost of a cache round trip per request.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+from . import metrics
+from .permissions import get_tenant_id
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """'120/min' -> (120, 60), like DRF's rate strings"""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+def refill(state, rate, capacity, now):
+    """Tokens in a bucket last seen as ``state`` (tokens, time), ``now``"""
+    if state is None:
+        return capacity
+    tokens, updated = state
+    return min(capacity, tokens + (now - updated) * rate)
+
+
+class LocalTokenBuckets:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+
+    def take(self, key, rate, capacity):
+        """Take a token, returns 0 or the seconds until one is available"""
+        now = time.monotonic()
+        with self.lock:
+            tokens = refill(self.buckets.get(key), rate, capacity, now)
+            if tokens >= 1:
+                self.buckets[key] = (tokens - 1, now)
+                return 0
+            self.buckets[key] = (tokens, now)
+        return (1 - tokens) / rate
+
+
+class CacheTokenBuckets:
+    """
+    Buckets in a shared cache. Reads and writes are not atomic, concurrent
+    requests may now and then get a token too many.
+    """
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def take(self, key, rate, capacity):
+        now = time.time()
+        key = f'throttle:{key}'
+        tokens = refill(self.cache.get(key), rate, capacity, now)
+        # A bucket left alone for capacity / rate seconds is full again
+        timeout = int(capacity / rate) + 1
+        if tokens >= 1:
+            self.cache.set(key, (tokens - 1, now), timeout)
+            return 0
+        self.cache.set(key, (tokens, now), timeout)
+        return (1 - tokens) / rate
+
+
+_buckets = None
+
+
+def get_buckets():
+    global _buckets
+    if _buckets is None:
+        alias = settings.TENANT_THROTTLE_CACHE
+        _buckets = CacheTokenBuckets(alias) if alias else LocalTokenBuckets()
+    return _buckets
+
+
+def reset_buckets(*, setting, **kwargs):
+    # Tests switch TENANT_THROTTLE_CACHE with override_settings
+    global _buckets
+    if setting == 'TENANT_THROTTLE_CACHE':
+        _buckets = None
+
+
+setting_changed.connect(reset_buckets)
+
+
+def throttle_wait(tenant_id, scope, premium=False):
+    """
+    Take a token for a request of the tenant. Returns 0 when the request may
+    go ahead, otherwise the seconds to wait.
+    """
+    tier = 'premium' if premium else 'standard'
+    # Bursts of up to one period's worth of requests, refilled evenly
+    capacity, period = parse_rate(settings.TENANT_THROTTLE_RATES[tier][scope])
+    wait = get_buckets().take(f'{tenant_id}:{scope}', capacity / period, capacity)
+    if wait:
+        metrics.increment('requests_throttled')
+    return wait
+
+
+class TenantRateThrottle(BaseThrottle):
+    """
+    Throttles by the owning admin, staff requests count against their admin.
+    Safe methods use the read budget and other methods the write budget,
+    unless the view sets ``throttle_scope`` (e.g. 'bulk').
+    """
+    wait_seconds = None
+
+    def allow_request(self, request, view):
+        user = request.user
+        if not user or not user.is_authenticated:
+            return True
+        tenant_id = get_tenant_id(user)
+        if tenant_id is None:
+            return True
+
+        scope = getattr(view, 'throttle_scope', None) or ('read' if request.method in SAFE_METHODS else 'write')
+        self.wait_seconds = throttle_wait(tenant_id, scope, user.userprofile.is_premium)
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
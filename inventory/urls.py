@@ -1,17 +1,21 @@
 # inventory/urls.py
 from django.urls import path
-from .views import ProductListCreate, PartyListCreate, TransactionListCreate, CompletePayment, StockListCreate, StockUpdateView, ProductBulkCreateView, ProductCSVUploadView, DraftTransactionListCreate, ExecuteDraftTransaction, TransactionDetailView, UserProfileView, LogoutView, ChangePasswordView, PartyDetailView
+from . import async_views
+from .views import ProductListCreate, PartyListCreate, TransactionListCreate, CompletePayment, StockListCreate, StockUpdateView, StockTakeView, ProductBulkCreateView, ProductCSVUploadView, PartyImportView, DraftTransactionListCreate, DraftTransactionDetailView, ExecuteDraftTransaction, TransactionDetailView, UserProfileView, LogoutView, ChangePasswordView, PartyDetailView, PartyStatementView, PartyPaymentListCreate, AgingReportView, ProductRankingView, SyncView, metrics_view
 
 urlpatterns = [
     path('products/', ProductListCreate.as_view(), name='product-list-create'),
     path('parties/', PartyListCreate.as_view(), name='party-list-create'),
+    path('parties/import/', PartyImportView.as_view(), name='party-import'),
     path('transactions/', TransactionListCreate.as_view(), name='transaction-list-create'),
     path('transactions/<int:transaction_id>/complete-payment/', CompletePayment.as_view(), name='complete-payment'),
     path('stock/', StockListCreate.as_view(), name='stock-list-create'),
     path('stock/<int:pk>/', StockUpdateView.as_view(), name='stock-update'),
+    path('stock/bulk/', StockTakeView.as_view(), name='stock-take'),
     path('products/bulk/', ProductBulkCreateView.as_view(), name='product-bulk-create'),
     path('products/csv-upload/', ProductCSVUploadView.as_view(), name='product-csv-upload'),
     path('draft-transactions/', DraftTransactionListCreate.as_view(), name='draft-transaction-list-create'),
+    path('draft-transactions/<int:pk>/', DraftTransactionDetailView.as_view(), name='draft-transaction-detail'),
     path('draft-transactions/<int:draft_id>/execute/', ExecuteDraftTransaction.as_view(), name='execute-draft-transaction'),
     path('transactions/<int:pk>/', TransactionDetailView.as_view(), name='transaction-detail'),
     path('me/', UserProfileView.as_view(), name='user-profile'),
@@ -21,4 +25,16 @@ urlpatterns = [
     path('me/parties/', PartyListCreate.as_view(), name='user-parties'),
     path('me/staff/', UserProfileView.as_view(), name='admin-staff'),
     path('me/parties/<int:pk>/', PartyDetailView.as_view(), name='party-detail'),
+    path('me/parties/<int:pk>/statement/', PartyStatementView.as_view(), name='party-statement'),
+    path('me/parties/<int:pk>/payments/', PartyPaymentListCreate.as_view(), name='party-payments'),
+    path('me/reports/aging/', AgingReportView.as_view(), name='aging-report'),
+    path('me/reports/product-ranking/', ProductRankingView.as_view(), name='product-ranking'),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('metrics/', metrics_view, name='metrics'),
+    # Async read-only endpoints, served best by an ASGI server
+    path('async/products/', async_views.product_catalogue, name='async-product-list'),
+    path('async/stock/', async_views.stock_list, name='async-stock-list'),
+    path('stock/events/', async_views.stock_events, name='stock-events'),
+    path('async/parties/<int:pk>/', async_views.party_detail, name='async-party-detail'),
+    path('async/me/', async_views.dashboard, name='async-user-profile'),
 ]
@@ -0,0 +1,9 @@
+# inventory/utils.py
+from itertools import islice
+
+
+def batched(iterable, size):
+    """Yield lists of up to ``size`` items from ``iterable``."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
@@ -1,19 +1,34 @@
 # inventory/views.py
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.utils.urls import replace_query_param
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
-from .models import Product, Party, Transaction,Stock, UserProfile, DraftTransaction,TransactionItem
+from django.core import signing
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_date
+from .models import RANKING_WINDOWS, Product, Party, Transaction,Stock, UserProfile, DraftTransaction,TransactionItem, Payment
 from django.db import transaction
-from .serializers import ProductSerializer, PartySerializer, TransactionSerializer, RegisterSerializer,StockSerializer, DraftTransactionSerializer,UserProfileSerializer
-from .permissions import IsAdminOrStaffPermission
+from .serializers import ProductSerializer, PartySerializer, TransactionSerializer, RegisterSerializer,StockSerializer, StockTakeSerializer, PaymentSerializer, PartyStatementSerializer, AgingReportSerializer, ProductRankingSerializer, DraftTransactionSerializer,UserProfileSerializer, values_plan, values_representation
+from .changefeed import SYNC_MODELS, changes_since, cursor_expired, latest_cursor
+from .party_import import csv_rows, import_parties, ndjson_rows
+from .permissions import IsAdminOrStaffPermission, get_tenant_id
+from .mixins import BatchGetMixin, ReplicaReadMixin, SingleFlightListMixin, SparseFieldsMixin, ValuesListMixin
+from .reports import RANKING_METRICS, aging_report, party_statement, product_ranking
+from .reservations import InsufficientStock, consume_draft, release
+from .singleflight import coalesce
+from .summaries import dashboard_statistics
+from .utils import batched
+from . import metrics
 from rest_framework.parsers import MultiPartParser, FormParser
+import codecs
 import csv
-import io
 from rest_framework.generics import RetrieveUpdateDestroyAPIView
 from django.db import transaction as db_transaction
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -21,8 +36,18 @@ from django.contrib.auth import logout
 
 User = get_user_model()
 
+
+class StockConflict(APIException):
+    """409 for a sale whose stock is gone or held by draft reservations"""
+    status_code = status.HTTP_409_CONFLICT
+    default_code = 'insufficient_stock'
+
+    def __init__(self, stock_id):
+        stock = Stock.objects.select_related('product').get(pk=stock_id)
+        super().__init__({'error': f'Only {stock.available} of {stock.product.medicine_name} available'})
+
 # Product View: Handles product listing and creation
-class ProductListCreate(generics.ListCreateAPIView):
+class ProductListCreate(ReplicaReadMixin, BatchGetMixin, SparseFieldsMixin, ValuesListMixin, generics.ListCreateAPIView):
     serializer_class = ProductSerializer
     permission_classes = [IsAdminOrStaffPermission]
     queryset = Product.objects.all()
@@ -40,7 +65,8 @@ class ProductListCreate(generics.ListCreateAPIView):
 
 # Party View: Handles customer listing and creation
 
-class PartyListCreate(generics.ListCreateAPIView):
+class PartyListCreate(ReplicaReadMixin, SingleFlightListMixin, BatchGetMixin, SparseFieldsMixin, ValuesListMixin,
+                      generics.ListCreateAPIView):
     serializer_class = PartySerializer
     permission_classes = [IsAuthenticated]
 
@@ -63,9 +89,21 @@ class PartyListCreate(generics.ListCreateAPIView):
         serializer.save(user=user)
 
 # Transaction View: Handles transaction listing and creation
-class TransactionListCreate(generics.ListCreateAPIView):
+class TransactionListCreate(ReplicaReadMixin, SparseFieldsMixin, ValuesListMixin, generics.ListCreateAPIView):
+    """
+    Lists filter on ``start``/``end`` (date_at), ``party``, ``type``,
+    ``payment_status`` and ``created_by``, and sort with ``ordering``.
+    The filters have composite indexes on Transaction, checked by the
+    ``transaction-filter-*`` hot queries.
+    """
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
+    filter_choices = {
+        'type': {'sale', 'purchase'},
+        'payment_status': {'pending', 'partial', 'completed'},
+    }
+    # Only orderings an index serves: amounts would sort the tenant's whole history
+    ordering_fields = ('date_at', 'id')
 
     def get_queryset(self):
         try:
@@ -81,6 +119,44 @@ class TransactionListCreate(generics.ListCreateAPIView):
         except UserProfile.DoesNotExist:
             return Transaction.objects.none()
 
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method != 'GET':
+            return queryset
+        params = self.request.query_params
+
+        for name in ('start', 'end'):
+            if params.get(name):
+                try:
+                    day = parse_date(params[name])
+                except ValueError:
+                    day = None
+                if day is None:
+                    raise ValidationError({name: 'Dates must be given as YYYY-MM-DD'})
+                queryset = queryset.filter(**{'date_at__gte' if name == 'start' else 'date_at__lte': day})
+
+        for name in ('party', 'created_by'):
+            if params.get(name):
+                try:
+                    queryset = queryset.filter(**{f'{name}_id': int(params[name])})
+                except ValueError:
+                    raise ValidationError({name: 'Must be an id.'})
+
+        for name, choices in self.filter_choices.items():
+            if params.get(name):
+                if params[name] not in choices:
+                    raise ValidationError({name: f'Must be one of {", ".join(sorted(choices))}.'})
+                queryset = queryset.filter(**{name: params[name]})
+
+        ordering = params.get('ordering')
+        if ordering:
+            if ordering.lstrip('-') not in self.ordering_fields:
+                raise ValidationError({
+                    'ordering': f'Must be one of {", ".join(self.ordering_fields)}, with a leading - to reverse.'
+                })
+            queryset = queryset.order_by(ordering)
+        return queryset
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['request'] = self.request
@@ -93,6 +169,8 @@ class TransactionListCreate(generics.ListCreateAPIView):
                 if user.userprofile.user_type == 'staff':
                     user = user.userprofile.admin
                 serializer.save(user=user)
+        except InsufficientStock as e:
+            raise StockConflict(e.stock_id)
         except Exception as e:
             raise ValidationError(str(e))
 
@@ -113,24 +191,59 @@ class TransactionListCreate(generics.ListCreateAPIView):
                 )
 
 # Complete Payment View: Handles updating the payment information for a transaction
-class CompletePayment(APIView):
+class CompletePayment(ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, transaction_id):
         try:
-            # Retrieve the transaction and update the payment details
-            transaction = Transaction.objects.get(id=transaction_id, user=request.user)
-            additional_payment = Decimal(request.data.get('additional_payment', 0))
-            transaction.payment_in += additional_payment
-            transaction.update_balance()
-            serializer = TransactionSerializer(transaction)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            # Staff complete payments on their admin's transactions
+            transaction = Transaction.objects.select_related('party').get(
+                id=transaction_id,
+                user_id=get_tenant_id(request.user)
+            )
         except Transaction.DoesNotExist:
             return Response({"error": "Transaction not found"}, status=status.HTTP_404_NOT_FOUND)
 
+        try:
+            additional_payment = Decimal(str(request.data.get('additional_payment', 0)))
+        except InvalidOperation:
+            additional_payment = Decimal(0)
+        if additional_payment <= 0:
+            return Response({"error": "additional_payment must be a positive amount"},
+                          status=status.HTTP_400_BAD_REQUEST)
+        if transaction.due_amount <= 0:
+            return Response({"error": "Transaction is already paid in full"},
+                          status=status.HTTP_400_BAD_REQUEST)
+        if additional_payment > transaction.due_amount:
+            return Response({"error": f"additional_payment exceeds the due amount of {transaction.due_amount}"},
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        Payment.objects.allocate(
+            transaction.party,
+            Payment.PAYMENT_TYPES[transaction.type],
+            additional_payment,
+            request.user,
+            transactions=[transaction.pk]
+        )
+        transaction.refresh_from_db()
+        serializer = TransactionSerializer(transaction, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+class PartyPaymentListCreate(ReplicaReadMixin, generics.ListCreateAPIView):
+    serializer_class = PaymentSerializer
+    permission_classes = [IsAdminOrStaffPermission]
+
+    def get_party(self):
+        return get_object_or_404(Party, pk=self.kwargs['pk'], user_id=get_tenant_id(self.request.user))
+
+    def get_queryset(self):
+        return Payment.objects.filter(party=self.get_party()).prefetch_related('allocations').order_by('-created_at')
+
+    def perform_create(self, serializer):
+        serializer.save(party=self.get_party(), created_by=self.request.user)
 
 
-class StockListCreate(generics.ListCreateAPIView):
+class StockListCreate(ReplicaReadMixin, BatchGetMixin, SparseFieldsMixin, ValuesListMixin, generics.ListCreateAPIView):
     serializer_class = StockSerializer
     permission_classes = [IsAdminOrStaffPermission]
 
@@ -178,7 +291,34 @@ class StockListCreate(generics.ListCreateAPIView):
             }
             return Response(response_data, status=status.HTTP_201_CREATED)
 
-class StockUpdateView(generics.UpdateAPIView):
+class StockTakeView(ReplicaReadMixin, generics.GenericAPIView):
+    serializer_class = StockTakeSerializer
+    throttle_scope = 'bulk'
+    permission_classes = [IsAdminOrStaffPermission]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        user_id = get_tenant_id(request.user)
+        if user_id is None:
+            return Response({'error': 'Staff user does not have an associated admin.'},
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        variances, counts = serializer.save(user_id)
+        return Response({
+            'message': 'Stock-take applied: {created} created, {updated} updated, {unchanged} unchanged'.format(**counts),
+            **counts,
+            'variances': [{
+                'stock': stock.id,
+                'product': stock.product_id,
+                'previous_quantity': previous,
+                'quantity': stock.quantity,
+                'variance': stock.quantity - previous
+            } for stock, previous in variances]
+        }, status=status.HTTP_200_OK)
+
+class StockUpdateView(ReplicaReadMixin, generics.UpdateAPIView):
     serializer_class = StockSerializer
     permission_classes = [IsAuthenticated]
 
@@ -209,36 +349,30 @@ class RegisterView(generics.CreateAPIView):
                 return Response({'error': 'Invalid user type'}, 
                               status=status.HTTP_400_BAD_REQUEST)
             
+            admin = None
+            if user_type == 'staff':
+                admin_id = request.data.get('admin_id')
+                if not admin_id:
+                    return Response({'error': 'Staff must be assigned to an admin'}, 
+                                  status=status.HTTP_400_BAD_REQUEST)
+                try:
+                    admin = UserProfile.objects.select_related('user').get(user_id=admin_id, user_type='admin').user
+                except (ValueError, UserProfile.DoesNotExist):
+                    return Response({'error': 'Invalid admin ID'}, 
+                                  status=status.HTTP_400_BAD_REQUEST)
+
             try:
                 with transaction.atomic():
                     user, is_premium = serializer.save()
                     
-                    if user_type == 'staff':
-                        admin_id = request.data.get('admin_id')
-                        if not admin_id:
-                            return Response({'error': 'Staff must be assigned to an admin'}, 
-                                          status=status.HTTP_400_BAD_REQUEST)
-                        try:
-                            admin = User.objects.get(id=admin_id)
-                            admin_profile = UserProfile.objects.get(user=admin, user_type='admin')
-                            # Staff inherits premium status from admin
-                            is_premium = admin_profile.is_premium
-                        except (User.DoesNotExist, UserProfile.DoesNotExist):
-                            return Response({'error': 'Invalid admin ID'}, 
-                                          status=status.HTTP_400_BAD_REQUEST)
-                    
-                    # Create user profile
+                    # Create user profile, staff inherit premium status from their admin on save
                     profile = UserProfile.objects.create(
                         user=user,
                         user_type=user_type,
+                        admin=admin,
                         is_premium=is_premium
                     )
                     
-                    # If staff, associate with admin
-                    if user_type == 'staff':
-                        profile.admin = admin
-                        profile.save()
-                    
                     return Response({
                         'message': f'User registered successfully as {user_type}',
                         'user': {
@@ -256,8 +390,9 @@ class RegisterView(generics.CreateAPIView):
                 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class ProductBulkCreateView(generics.CreateAPIView):
+class ProductBulkCreateView(ReplicaReadMixin, generics.CreateAPIView):
     serializer_class = ProductSerializer
+    throttle_scope = 'bulk'
     permission_classes = [IsAdminOrStaffPermission]
 
     def get_serializer(self, *args, **kwargs):
@@ -270,9 +405,17 @@ class ProductBulkCreateView(generics.CreateAPIView):
             serializer = self.get_serializer(data=request.data)
             serializer.is_valid(raise_exception=True)
             products = serializer.save()
-            
+            counts = getattr(serializer, 'sync_counts', None)
+
+            if counts is None:
+                return Response({
+                    'message': 'Successfully saved 1 product',
+                    'products': ProductSerializer([products], many=True).data
+                }, status=status.HTTP_201_CREATED)
+
             return Response({
-                'message': f'Successfully created {len(products)} products',
+                'message': 'Catalogue synced: {inserted} inserted, {updated} updated, {unchanged} unchanged'.format(**counts),
+                **counts,
                 'products': ProductSerializer(products, many=True).data
             }, status=status.HTTP_201_CREATED)
             
@@ -281,11 +424,17 @@ class ProductBulkCreateView(generics.CreateAPIView):
                 'error': str(e)
             }, status=status.HTTP_400_BAD_REQUEST)
 
-class ProductCSVUploadView(generics.CreateAPIView):
+class ProductCSVUploadView(ReplicaReadMixin, generics.CreateAPIView):
     parser_classes = (MultiPartParser, FormParser)
     permission_classes = [IsAdminOrStaffPermission]
+    throttle_scope = 'bulk'
+
+    # Rows validated and upserted per round trip
+    batch_size = 1000
 
     def post(self, request, *args, **kwargs):
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+        products = []
         try:
             csv_file = request.FILES.get('file')
             if not csv_file:
@@ -298,36 +447,91 @@ class ProductCSVUploadView(generics.CreateAPIView):
                     'error': 'File must be a CSV'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            decoded_file = csv_file.read().decode('utf-8')
-            csv_data = csv.DictReader(io.StringIO(decoded_file))
-            products_data = []
+            # Stream the upload instead of decoding it into memory at once
+            csv_data = csv.DictReader(codecs.iterdecode(csv_file, 'utf-8-sig'))
 
-            for row in csv_data:
-                product_data = {
+            for batch in batched(csv_data, self.batch_size):
+                products_data = [{
                     'medicine_name': row['medicine_name'],
-                    'ml': row.get('ml', None),
-                    'price': float(row['price']),
-                    'unit_price': float(row['unit_price']),
+                    'ml': row.get('ml') or '',
+                    'price': row['price'],
+                    'unit_price': row['unit_price'],
                     'company': row['company'],
-                    'min_sale': int(row['min_sale'])
-                }
-                products_data.append(product_data)
+                    'min_sale': row['min_sale']
+                } for row in batch]
 
-            serializer = ProductSerializer(data=products_data, many=True)
-            serializer.is_valid(raise_exception=True)
-            products = serializer.save()
+                # One short transaction per batch, so a large upload holds no locks for its whole length
+                with transaction.atomic():
+                    serializer = ProductSerializer(data=products_data, many=True)
+                    serializer.is_valid(raise_exception=True)
+                    products += serializer.save()
+                for key, value in serializer.sync_counts.items():
+                    counts[key] += value
 
             return Response({
-                'message': f'Successfully created {len(products)} products',
+                'message': 'Catalogue synced: {inserted} inserted, {updated} updated, {unchanged} unchanged'.format(**counts),
+                **counts,
                 'products': ProductSerializer(products, many=True).data
             }, status=status.HTTP_201_CREATED)
 
         except Exception as e:
+            # The batches before the failing one stay committed
             return Response({
-                'error': str(e)
+                'error': str(e),
+                **counts
             }, status=status.HTTP_400_BAD_REQUEST)
 
-class DraftTransactionListCreate(generics.ListCreateAPIView):
+class PartyImportView(ReplicaReadMixin, APIView):
+    """Import parties from a CSV or NDJSON upload, see inventory/party_import.py"""
+    parser_classes = (MultiPartParser, FormParser)
+    permission_classes = [IsAdminOrStaffPermission]
+    throttle_scope = 'bulk'
+
+    # Rows validated and inserted per transaction
+    batch_size = 1000
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+
+        user_id = get_tenant_id(request.user)
+        if user_id is None:
+            return Response({'error': 'Staff user does not have an associated admin.'},
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        name = upload.name.lower()
+        try:
+            if name.endswith('.csv'):
+                rows = csv_rows(upload)
+            elif name.endswith(('.ndjson', '.jsonl')):
+                rows = ndjson_rows(upload)
+            else:
+                return Response({'error': 'File must be a CSV or NDJSON (.ndjson, .jsonl)'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            counts, errors, failure = import_parties(user_id, rows, self.batch_size)
+        except (ValueError, csv.Error) as e:
+            # The header could not be read, nothing was imported
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        message = 'Parties imported: {created} created, {duplicates} duplicates, {invalid} invalid'.format(**counts)
+        if failure:
+            # The rows before the broken line stay imported
+            return Response({
+                'error': f"Row {failure['row']} could not be read: {failure['error']}",
+                'failed_row': failure['row'],
+                'message': message,
+                **counts,
+                'errors': errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'message': message,
+            **counts,
+            'errors': errors
+        }, status=status.HTTP_201_CREATED)
+
+class DraftTransactionListCreate(ReplicaReadMixin, generics.ListCreateAPIView):
     serializer_class = DraftTransactionSerializer
     permission_classes = [IsAuthenticated]
 
@@ -338,48 +542,68 @@ class DraftTransactionListCreate(generics.ListCreateAPIView):
         serializer.save()  # Just save the serializer, user is handled in the serializer
 
 
-class ExecuteDraftTransaction(APIView):
+class DraftTransactionDetailView(ReplicaReadMixin, RetrieveUpdateDestroyAPIView):
+    serializer_class = DraftTransactionSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return DraftTransaction.objects.filter(user_id=get_tenant_id(self.request.user))
+
+    def perform_destroy(self, instance):
+        with db_transaction.atomic():
+            release(instance.reservations.all())
+            instance.delete()
+
+class ExecuteDraftTransaction(ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, draft_id):
         try:
-            # Retrieve the draft transaction
-            if request.user.userprofile.user_type == 'staff':
-                draft_transaction = DraftTransaction.objects.get(id=draft_id, user=request.user.userprofile.admin)
-            else:
-                draft_transaction = DraftTransaction.objects.get(id=draft_id, user=request.user)
-            # Create a new transaction from the draft
-            transaction = Transaction.objects.create(
-                user=draft_transaction.user,  # Set the user to the admin
-                party=draft_transaction.party,
-                total_amount=draft_transaction.total_amount,
-                payment_in=draft_transaction.payment_in,
-                due_amount=draft_transaction.due_amount,
-                payment_status=draft_transaction.payment_status,
-                type=draft_transaction.type,
-            )
-
-            # Create transaction items from the draft
-            for item in draft_transaction.items.all():
-                TransactionItem.objects.create(
-                    transaction=transaction,
-                    stock=item.stock,
-                    quantity=item.quantity,
-                    price=item.price,
-                    subtotal=item.subtotal
+            with db_transaction.atomic():
+                # Retrieve the draft transaction
+                if request.user.userprofile.user_type == 'staff':
+                    draft_transaction = DraftTransaction.objects.select_for_update().get(id=draft_id, user=request.user.userprofile.admin)
+                else:
+                    draft_transaction = DraftTransaction.objects.select_for_update().get(id=draft_id, user=request.user)
+                # Create a new transaction from the draft
+                transaction = Transaction.objects.create(
+                    user=draft_transaction.user,  # Set the user to the admin
+                    party=draft_transaction.party,
+                    total_amount=draft_transaction.total_amount,
+                    payment_in=draft_transaction.payment_in,
+                    due_amount=draft_transaction.due_amount,
+                    payment_status=draft_transaction.payment_status,
+                    type=draft_transaction.type,
                 )
 
-            # Update stock quantities using the existing logic
-            transaction.update_stock()
+                # Create transaction items from the draft
+                for item in draft_transaction.items.all():
+                    TransactionItem.objects.create(
+                        transaction=transaction,
+                        stock=item.stock,
+                        quantity=item.quantity,
+                        price=item.price,
+                        subtotal=item.subtotal
+                    )
+
+                if draft_transaction.type == 'sale':
+                    # Turn the reservation into a stock deduction
+                    consume_draft(draft_transaction)
+                    transaction.record_sales()
+                else:
+                    # Update stock quantities using the existing logic
+                    transaction.update_stock()
 
-            # Optionally, delete the draft after execution
-            draft_transaction.delete()
+                # Optionally, delete the draft after execution
+                draft_transaction.delete()
 
             return Response({"message": "Draft transaction executed successfully.", "transaction_id": transaction.id}, status=status.HTTP_201_CREATED)
         except DraftTransaction.DoesNotExist:
             return Response({"error": "Draft transaction not found."}, status=status.HTTP_404_NOT_FOUND)
+        except InsufficientStock as e:
+            raise StockConflict(e.stock_id)
 
-class TransactionDetailView(RetrieveUpdateDestroyAPIView):
+class TransactionDetailView(ReplicaReadMixin, SparseFieldsMixin, RetrieveUpdateDestroyAPIView):
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
 
@@ -392,6 +616,7 @@ class TransactionDetailView(RetrieveUpdateDestroyAPIView):
     def perform_update(self, serializer):
         with db_transaction.atomic():
             old_transaction = self.get_object()
+            old_transaction.record_sales(-1)
             
             for item in old_transaction.items.all():
                 if old_transaction.type == 'sale':
@@ -401,7 +626,11 @@ class TransactionDetailView(RetrieveUpdateDestroyAPIView):
                 item.stock.save()
             
             transaction = serializer.save()
-            transaction.update_stock()
+            try:
+                transaction.update_stock()
+            except InsufficientStock as e:
+                raise StockConflict(e.stock_id)
+            transaction.record_sales()
 
     def get_serializer(self, *args, **kwargs):
         kwargs['partial'] = True
@@ -409,6 +638,7 @@ class TransactionDetailView(RetrieveUpdateDestroyAPIView):
 
     def perform_destroy(self, instance):
         with db_transaction.atomic():
+            instance.record_sales(-1)
             # Reverse the stock changes before deleting
             for item in instance.items.all():
                 if instance.type == 'sale':
@@ -419,42 +649,31 @@ class TransactionDetailView(RetrieveUpdateDestroyAPIView):
             
             instance.delete()
 
-class UserProfileView(generics.RetrieveUpdateAPIView):
+class UserProfileView(ReplicaReadMixin, generics.RetrieveUpdateAPIView):
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        return self.request.user.userprofile
+        # request.user may be built from the token claims, load the real profile
+        return self.get_queryset().get()
 
     def get_queryset(self):
-        return UserProfile.objects.filter(user=self.request.user)
+        return UserProfile.objects.select_related('user', 'admin').filter(user=self.request.user)
 
     def get(self, request, *args, **kwargs):
         profile = self.get_object()
         serializer = self.get_serializer(profile)
         data = serializer.data
         
-        if profile.user_type == 'admin':
-            data['statistics'] = {
-                'total_products': Product.objects.count(),
-                'total_parties': Party.objects.filter(user=request.user).count(),
-                'total_transactions': Transaction.objects.filter(user=request.user).count(),
-                'total_staff': UserProfile.objects.filter(admin=request.user).count()
-            }
-            # Add staff list if requested
-            if request.path.endswith('/me/staff/'):
-                staff_serializer = UserProfileSerializer(
-                    UserProfile.objects.filter(admin=request.user),
-                    many=True
-                )
-                data['staff'] = staff_serializer.data
-        else:  # staff
-            data['statistics'] = {
-                'transactions_created': Transaction.objects.filter(
-                    user=profile.admin,
-                    created_by=request.user
-                ).count()
-            }
+        data['statistics'] = dashboard_statistics(profile)
+
+        # Add staff list if requested
+        if profile.user_type == 'admin' and request.path.endswith('/me/staff/'):
+            staff_serializer = UserProfileSerializer(
+                UserProfile.objects.filter(admin=request.user),
+                many=True
+            )
+            data['staff'] = staff_serializer.data
         
         return Response(data)
 
@@ -501,7 +720,7 @@ class ChangePasswordView(APIView):
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-class PartyDetailView(generics.RetrieveAPIView):
+class PartyDetailView(ReplicaReadMixin, SparseFieldsMixin, generics.RetrieveAPIView):
     serializer_class = PartySerializer
     permission_classes = [IsAuthenticated]
 
@@ -514,3 +733,151 @@ class PartyDetailView(generics.RetrieveAPIView):
             return Party.objects.filter(user=user.userprofile.admin)
         except UserProfile.DoesNotExist:
             return Party.objects.none()
+
+class PartyStatementView(ReplicaReadMixin, generics.GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    default_page_size = 50
+    max_page_size = 500
+
+    def get_queryset(self):
+        return Party.objects.select_related('carry_forward').filter(user_id=get_tenant_id(self.request.user))
+
+    def get(self, request, *args, **kwargs):
+        party = self.get_object()
+
+        try:
+            start = parse_date(request.query_params.get('start', ''))
+            end = parse_date(request.query_params.get('end', ''))
+        except ValueError:
+            start = end = None
+        if (request.query_params.get('start') and not start) or (request.query_params.get('end') and not end):
+            return Response({'error': 'Dates must be given as YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            page_size = int(request.query_params.get('page_size', self.default_page_size))
+        except ValueError:
+            return Response({'error': 'page_size must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        page_size = min(max(page_size, 1), self.max_page_size)
+
+        try:
+            opening, balance_forward, rows, next_cursor = party_statement(
+                party, start, end, request.query_params.get('cursor'), page_size
+            )
+        except signing.BadSignature:
+            return Response({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+        next_url = None
+        if next_cursor:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+
+        return Response(PartyStatementSerializer({
+            'party': {'id': party.id, 'name': party.name},
+            'start': start,
+            'end': end,
+            'opening_balance': opening,
+            'balance_forward': balance_forward,
+            'closing_balance': rows[-1]['balance'] if rows else balance_forward,
+            'next': next_url,
+            'results': rows
+        }).data)
+
+class AgingReportView(ReplicaReadMixin, APIView):
+    permission_classes = [IsAdminOrStaffPermission]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            as_of = parse_date(request.query_params.get('as_of', ''))
+        except ValueError:
+            as_of = None
+        if request.query_params.get('as_of') and not as_of:
+            return Response({'error': 'Dates must be given as YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+        tenant_id = get_tenant_id(request.user)
+        return Response(coalesce(
+            tenant_id, ('aging-report', as_of),
+            lambda: AgingReportSerializer(aging_report(tenant_id, as_of)).data
+        ))
+
+
+class ProductRankingView(ReplicaReadMixin, APIView):
+    permission_classes = [IsAdminOrStaffPermission]
+    default_limit = 10
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        try:
+            window = int(request.query_params.get('window', 30))
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            return Response({'error': 'window and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        metric = request.query_params.get('metric', 'quantity')
+        if window not in RANKING_WINDOWS:
+            return Response({'error': f'window must be one of {", ".join(map(str, RANKING_WINDOWS))}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if metric not in RANKING_METRICS:
+            return Response({'error': f'metric must be one of {", ".join(RANKING_METRICS)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({'error': 'limit must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+
+        tenant_id = get_tenant_id(request.user)
+        return Response(coalesce(
+            tenant_id, ('product-ranking', window, metric, limit),
+            lambda: ProductRankingSerializer(product_ranking(tenant_id, window, metric, limit)).data
+        ))
+
+
+class SyncView(ReplicaReadMixin, APIView):
+    """
+    Changes since a cursor from the change feed. Without ``since`` only the
+    current cursor is returned, for clients starting from a full load.
+    """
+    permission_classes = [IsAdminOrStaffPermission]
+    serializers = {
+        'product': ProductSerializer,
+        'stock': StockSerializer,
+        'party': PartySerializer,
+        'transaction': TransactionSerializer,
+    }
+
+    def get_queryset(self, name, tenant_id):
+        model = SYNC_MODELS[name]
+        if model is Product:
+            return model.objects.all()
+        return model.objects.filter(user_id=tenant_id)
+
+    def serialize(self, name, queryset):
+        serializer_class = self.serializers[name]
+        queryset = serializer_class.prepare_queryset(queryset, self.request, True)
+        serializer = serializer_class(queryset, many=True, context={'request': self.request})
+        plan = values_plan(serializer.child)
+        if plan is None:
+            return serializer.data
+        return values_representation(queryset, plan)
+
+    def get(self, request, *args, **kwargs):
+        if 'since' not in request.query_params:
+            return Response({'cursor': latest_cursor()})
+        try:
+            since = int(request.query_params['since'])
+            limit = min(int(request.query_params.get('limit', 500)), 1000)
+        except ValueError:
+            return Response({'error': 'since and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        if since < 0 or limit < 1:
+            return Response({'error': 'since and limit must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+        if cursor_expired(since):
+            return Response({'error': 'Cursor is too old, reload everything and sync from a new cursor'},
+                            status=status.HTTP_410_GONE)
+
+        tenant_id = get_tenant_id(request.user)
+        changes, cursor, has_more = changes_since(tenant_id, since, limit)
+        for name, change in changes.items():
+            if change['upserts']:
+                queryset = self.get_queryset(name, tenant_id).filter(pk__in=change['upserts']).order_by('pk')
+                change['upserts'] = self.serialize(name, queryset)
+        return Response({'cursor': cursor, 'has_more': has_more, 'changes': changes})
+
+
+@staff_member_required
+def metrics_view(request):
+    return JsonResponse(metrics.snapshot())
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'inventory.middleware.LargeResponseGZipMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -85,6 +87,27 @@ DATABASES = {
     }
 }
 
+# Read replicas: safe list/summary/report requests are routed to these aliases
+# by inventory.routers.PrimaryReplicaRouter. To try it locally, copy
+# db.sqlite3 and point MIMS_REPLICA_DB at the copy.
+REPLICA_DATABASES = []
+
+if os.environ.get('MIMS_REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['MIMS_REPLICA_DB'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append('replica')
+
+DATABASE_ROUTERS = ['inventory.routers.PrimaryReplicaRouter']
+
+# Seconds a tenant's reads stay on the primary after it wrote something
+REPLICA_PIN_SECONDS = 5
+
+# Seconds a dashboard, financial summary or report result is shared with identical requests of the tenant
+SINGLE_FLIGHT_TTL = 2
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -129,10 +152,59 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'inventory.authentication.TenantJWTAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'inventory.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'inventory.throttling.TenantRateThrottle',
     ],
 }
 
+# Requests per tenant (an admin and their staff together) by tier and scope.
+# Bulk covers the bulk product, CSV upload and stock-take endpoints.
+TENANT_THROTTLE_RATES = {
+    'standard': {'read': '600/min', 'write': '120/min', 'bulk': '10/min'},
+    'premium': {'read': '3000/min', 'write': '600/min', 'bulk': '60/min'},
+}
+# Cache alias holding the buckets, to share them between workers; None keeps them per process
+TENANT_THROTTLE_CACHE = os.environ.get('MIMS_THROTTLE_CACHE') or None
+
+# Responses smaller than this are not worth compressing
+GZIP_MIN_LENGTH = 1024
+
+# Admin changelists count rows exactly up to this many, beyond it they show
+# the planner's estimate (PostgreSQL only)
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+# Most ids one ?ids= batch-get on products, parties or stock may ask for
+BATCH_GET_MAX_IDS = 200
+
+# Days of changes kept for /api/sync/, older cursors must reload in full
+SYNC_RETENTION_DAYS = 30
+
+# Live stock events (GET /api/stock/events/): events a slow client may fall behind by before it
+# is told to reload, and seconds between keep-alive comments on an idle stream
+STOCK_EVENTS_QUEUE_SIZE = 100
+STOCK_EVENTS_KEEPALIVE = 15
+# Relays stock events between worker processes, e.g. 'inventory.events.CacheBroker' with a shared
+# cache. Without a broker a stream only sees changes made by its own process.
+STOCK_EVENTS_BROKER = os.environ.get('MIMS_STOCK_EVENTS_BROKER') or None
+# Seconds between CacheBroker polls, and how long it keeps each event
+STOCK_EVENTS_POLL_INTERVAL = 0.5
+STOCK_EVENTS_TTL = 60
+
+# Drafts untouched for this many days are deleted, unless the admin's profile sets its own expiry
+DRAFT_EXPIRY_DAYS = 30
+# Hours a draft sale holds its stock after it was last saved
+STOCK_RESERVATION_HOURS = 24
+# Drafts deleted per transaction by the cleanup
+DRAFT_CLEANUP_BATCH_SIZE = 500
+# Seconds between in-process cleanups, None to rely on `manage.py purge_expired_drafts` from cron
+DRAFT_CLEANUP_INTERVAL = int(os.environ['MIMS_DRAFT_CLEANUP_INTERVAL']) if os.environ.get('MIMS_DRAFT_CLEANUP_INTERVAL') else None
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),  # Increase access token lifetime to 1 day
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),  # Increase refresh token lifetime to 7 days
@@ -140,4 +212,7 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
     'UPDATE_LAST_LOGIN': False,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    # Tokens carry user_type, admin_id and is_premium (see inventory.authentication)
+    'TOKEN_OBTAIN_SERIALIZER': 'inventory.serializers.TenantTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'inventory.serializers.TenantTokenRefreshSerializer',
 }
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medicine_inventory.settings')
 
 application = get_wsgi_application()
+
+# Expired draft cleanup, when DRAFT_CLEANUP_INTERVAL is set
+from inventory.maintenance import start_draft_cleaner  # noqa: E402
+
+start_draft_cleaner()